@@ -0,0 +1,94 @@
+"""
+Benchmark: native text extraction backends on a local PDF corpus.
+
+For each installed backend, measures throughput (pages/s, MB/s) and text
+quality as seen by the OCR decision heuristics: how many pages would be sent
+to OCR (`page_ocr_decisions`) and how many look like gibberish.
+
+Uso (na raiz do repo):
+    python -m benchmarks.bench_native_backends caminho/dos/pdfs [--backends pypdf2,pdfium]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from src.application.pdf_processor.service import PdfProcessConfig
+from src.infrastructure.services import native_text
+from src.infrastructure.services import pdf_ocr as ocr
+
+
+def run_backend(name: str, corpus: List[bytes], cfg: PdfProcessConfig) -> Dict[str, float]:
+    pages = chars = ocr_pages = gibberish = 0
+    elapsed = 0.0
+    for pdf_bytes in corpus:
+        t0 = time.perf_counter()
+        texts = native_text.extract_pages_text(pdf_bytes, backend=name)
+        elapsed += time.perf_counter() - t0
+        pages += len(texts)
+        chars += sum(len(t) for t in texts)
+        ocr_pages += sum(
+            ocr.page_ocr_decisions(
+                texts,
+                min_tokens=cfg.min_tokens,
+                repeat_threshold=cfg.repeat_th,
+                repeat_pages_frac=cfg.repeat_pages,
+            )
+        )
+        gibberish += sum(
+            ocr._is_gibberish(*ocr._quality_from_features([ocr.page_features(t)]))
+            for t in texts
+        )
+    mbytes = sum(map(len, corpus)) / (1024 * 1024)
+    return {
+        "seconds": elapsed,
+        "pages": pages,
+        "pages_per_s": pages / elapsed if elapsed else 0.0,
+        "mb_per_s": mbytes / elapsed if elapsed else 0.0,
+        "chars": chars,
+        "ocr_pages_pct": 100.0 * ocr_pages / max(1, pages),
+        "gibberish_pct": 100.0 * gibberish / max(1, pages),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("corpus", help="diretório com PDFs (busca recursiva)")
+    parser.add_argument(
+        "--backends",
+        default=",".join(native_text.available_backends()),
+        help="lista separada por vírgula (padrão: todos os instalados)",
+    )
+    args = parser.parse_args()
+
+    files = sorted(Path(args.corpus).rglob("*.pdf"))
+    if not files:
+        raise SystemExit(f"Nenhum PDF encontrado em {args.corpus}")
+    corpus = [f.read_bytes() for f in files]
+    cfg = PdfProcessConfig(pdfs_dir="")
+
+    print(f"files={len(files)} size={sum(map(len, corpus)) / (1024 * 1024):.1f} MiB")
+    print(f"{'backend':<10}{'pages/s':>10}{'MB/s':>8}{'chars':>12}{'ocr%':>8}{'gibberish%':>12}")
+    results = {}
+    for name in args.backends.split(","):
+        name = native_text.resolve_backend(name.strip())
+        r = results[name] = run_backend(name, corpus, cfg)
+        print(
+            f"{name:<10}{r['pages_per_s']:>10.1f}{r['mb_per_s']:>8.2f}{r['chars']:>12d}"
+            f"{r['ocr_pages_pct']:>8.1f}{r['gibberish_pct']:>12.1f}"
+        )
+
+    # Sugestão: o mais rápido entre os que não mandam mais páginas ao OCR que o padrão
+    base = results.get(native_text.DEFAULT_BACKEND)
+    eligible = [
+        n for n, r in results.items() if base is None or r["ocr_pages_pct"] <= base["ocr_pages_pct"]
+    ]
+    if eligible:
+        best = max(eligible, key=lambda n: results[n]["pages_per_s"])
+        print(f"sugestão: native_backend={best!r}")
+
+
+if __name__ == "__main__":
+    main()
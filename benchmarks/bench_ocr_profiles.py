@@ -0,0 +1,147 @@
+"""
+Benchmark: latency and accuracy of each OCR profile on a local PDF corpus.
+
+Every page is OCRed with each profile in `OCR_PROFILES` (no native text).
+Latency is reported as seconds per page. Accuracy is the word-level
+similarity with a reference text: `<nome>.txt` next to `<nome>.pdf` when it
+exists (ground truth), otherwise the output of the "accurate" profile (in
+which case the column measures agreement with "accurate", not accuracy).
+
+Uso (na raiz do repo; requer tesseract e poppler):
+    python -m benchmarks.bench_ocr_profiles caminho/dos/pdfs [--profiles fast,balanced] [--workers 1]
+
+`--prepare-only` mede só a preparação da página (binarização/pré-processamento)
+de cada perfil numa página A4 sintética, sem tesseract nem poppler:
+    python -m benchmarks.bench_ocr_profiles --prepare-only [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import difflib
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from src.infrastructure.services import pdf_ocr as ocr
+
+_PAGE_HEADER_RE = re.compile(r"^---- página \d+ ----$", flags=re.M)
+
+
+def words(text: str) -> List[str]:
+    """Tokens comparáveis: sem marcadores de página, minúsculos."""
+    return _PAGE_HEADER_RE.sub(" ", text).lower().split()
+
+
+def word_accuracy(reference: List[str], hypothesis: List[str]) -> float:
+    """2·acertos / (palavras da referência + palavras do OCR): penaliza omissões e lixo."""
+    if not reference and not hypothesis:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference, hypothesis, autojunk=False).ratio()
+
+
+def run_profile(
+    name: str, corpus: Dict[Path, bytes], workers: int
+) -> Dict[str, object]:
+    texts: Dict[Path, str] = {}
+    pages = 0
+    t0 = time.perf_counter()
+    for path, pdf_bytes in corpus.items():
+        texts[path] = ocr.ocr_all_pages_from_bytes(pdf_bytes, workers=workers, ocr_profile=name)
+        pages += ocr._pdf_page_count(pdf_bytes)
+    elapsed = time.perf_counter() - t0
+    return {"seconds": elapsed, "pages": pages, "texts": texts}
+
+
+def synthetic_page(dpi: int, angle: float = 1.5, noise: float = 6.0) -> np.ndarray:
+    """Página A4 em cinza com linhas de texto, levemente inclinada e com ruído de scanner."""
+    w, h = int(8.27 * dpi), int(11.69 * dpi)
+    scale = dpi / 100.0
+    page = np.full((h, w), 235, np.uint8)
+    for y in range(int(60 * scale), h - int(40 * scale), int(18 * scale)):
+        cv2.putText(page, "Clausula 5 - da remuneracao das debentures e garantias", (int(40 * scale), y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45 * scale, 30, max(1, int(scale)))
+    m = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    page = cv2.warpAffine(page, m, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    rng = np.random.default_rng(0)
+    return np.clip(page + rng.normal(0, noise, page.shape), 0, 255).astype(np.uint8)
+
+
+def prepare_only(names: List[str], repeat: int) -> None:
+    """Tempo de preparação por página de cada perfil (sem o reconhecimento)."""
+    print(f"{'profile':<10}{'dpi':>6}{'preprocess':>12}{'ms/page':>10}")
+    for name in names:
+        profile = ocr.OCR_PROFILES[name]
+        page = synthetic_page(profile.dpi)
+        prepare = ocr._prepare_full if profile.preprocess else ocr._prepare_threshold
+        prepare(page, "por", profile.preprocess or "")
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            prepare(page, "por", profile.preprocess or "")
+        ms = (time.perf_counter() - t0) / repeat * 1000
+        print(f"{name:<10}{profile.dpi:>6}{profile.preprocess or 'threshold':>12}{ms:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("corpus", nargs="?", help="diretório com PDFs (busca recursiva)")
+    parser.add_argument(
+        "--profiles",
+        default=",".join(ocr.OCR_PROFILES),
+        help="lista separada por vírgula (padrão: todos)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="ocr_workers por documento")
+    parser.add_argument("--prepare-only", action="store_true", help="só a preparação da página, em página sintética")
+    parser.add_argument("--repeat", type=int, default=5, help="repetições por perfil com --prepare-only")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.profiles.split(",")]
+    for name in names:
+        ocr.resolve_ocr_profile(name, 0, None)
+    if args.prepare_only:
+        prepare_only(names, args.repeat)
+        return
+    if not args.corpus:
+        parser.error("informe o diretório do corpus (ou --prepare-only)")
+
+    files = sorted(Path(args.corpus).rglob("*.pdf"))
+    if not files:
+        raise SystemExit(f"Nenhum PDF encontrado em {args.corpus}")
+    corpus = {f: f.read_bytes() for f in files}
+    truth: Dict[Path, Optional[str]] = {
+        f: f.with_suffix(".txt").read_text(encoding="utf-8") if f.with_suffix(".txt").exists() else None
+        for f in files
+    }
+
+    # Sem ground truth, a referência é o perfil "accurate" (roda mesmo fora da lista)
+    results = {name: run_profile(name, corpus, args.workers) for name in names}
+    if any(t is None for t in truth.values()) and "accurate" not in results:
+        results["accurate"] = run_profile("accurate", corpus, args.workers)
+    references = {
+        f: words(truth[f] if truth[f] is not None else results["accurate"]["texts"][f])
+        for f in files
+    }
+    with_truth = sum(t is not None for t in truth.values())
+
+    print(f"files={len(files)} ground_truth={with_truth} workers={args.workers}")
+    print(f"{'profile':<10}{'dpi':>6}{'preprocess':>12}{'s/page':>10}{'pages/s':>10}{'word_acc':>10}")
+    for name in names:
+        r = results[name]
+        profile = ocr.OCR_PROFILES[name]
+        acc = sum(
+            word_accuracy(references[f], words(r["texts"][f])) for f in files
+        ) / len(files)
+        print(
+            f"{name:<10}{profile.dpi:>6}{profile.preprocess or 'threshold':>12}"
+            f"{r['seconds'] / max(1, r['pages']):>10.3f}"
+            f"{r['pages'] / r['seconds'] if r['seconds'] else 0.0:>10.2f}{acc:>10.3f}"
+        )
+    if with_truth < len(files):
+        print("word_acc: concordância com 'accurate' nos arquivos sem <nome>.txt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: decision heuristics (text quality metrics and repetition coverage).
+
+Compares the original implementations (one regex fullmatch per character,
+repeated tokenization, uncompiled line normalization and a full sort of the
+repeated lines) with the current ones, and checks that both return identical
+values.
+
+Uso (na raiz do repo):
+    python -m benchmarks.bench_text_metrics --pages 1000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from typing import List, Tuple
+
+from src.infrastructure.services import pdf_ocr as ocr
+
+
+def legacy_metrics(pages: List[str]) -> Tuple[float, Tuple[float, float, float, float, int]]:
+    """Implementação anterior, mantida aqui como referência."""
+    counts = [len(ocr.tokenize(p or "")) for p in pages]
+    avg_tok = sum(counts) / max(1, len(counts)) if counts else 0.0
+    printable, alpha, mean_wlen, slashf = [], [], [], []
+    for p in pages:
+        p = p or ""
+        printable.append(ocr._printable_ratio(p))
+        alpha.append(ocr._alpha_num_ratio(p))
+        toks = re.findall(r"\w+", p, flags=re.UNICODE)
+        mean_wlen.append(ocr._mean_word_len(toks))
+        slashf.append(ocr._slash_seq_frac(p))
+    quality = (
+        sum(printable) / len(printable),
+        sum(alpha) / len(alpha),
+        sum(mean_wlen) / len(mean_wlen),
+        sum(slashf) / len(slashf),
+        ocr._unique_chars("".join(pages)),
+    )
+    return avg_tok, quality
+
+
+def _legacy_normalize_line(s: str) -> str:
+    s = re.sub(r"\s+", " ", s.strip())
+    s = re.sub(r"\b([A-Z0-9]{16,})\b", "", s)
+    s = re.sub(r"\bP(?:ag\.?|ágina)\s*\d+\s*/\s*\d+\b", "", s, flags=re.I)
+    return s.strip()
+
+
+def legacy_repetition(pages: List[str], min_line_len: int = 6, top_k: int = 12,
+                      repeat_pages_frac: float = 0.6) -> float:
+    n_pages = max(1, len(pages))
+    line_to_pages = {}
+    total_chars = 0
+    for p in pages:
+        lines = [_legacy_normalize_line(l) for l in (p or "").splitlines()]
+        lines = [l for l in lines if len(l) >= min_line_len]
+        total_chars += sum(len(l) for l in lines)
+        for l in set(lines):
+            line_to_pages[l] = line_to_pages.get(l, 0) + 1
+    if total_chars == 0 or not line_to_pages:
+        return 0.0
+    min_pages = max(1, int(repeat_pages_frac * n_pages))
+    repeated = [(l, c) for l, c in line_to_pages.items() if c >= min_pages]
+    if not repeated:
+        return 0.0
+    repeated.sort(key=lambda x: (x[1], len(x[0])), reverse=True)
+    rep_chars = sum(len(l) for l, _ in repeated[:top_k]) * n_pages
+    return min(1.0, rep_chars / max(1, total_chars))
+
+
+def engine_repetition(pages: List[str]) -> float:
+    return ocr.repetition_coverage(pages, min_line_len=6, top_k=12, repeat_pages_frac=0.6)
+
+
+def engine_metrics(pages: List[str]) -> Tuple[float, Tuple[float, float, float, float, int]]:
+    features = [ocr.page_features(p) for p in pages]
+    return ocr._avg_tokens(features), ocr._quality_from_features(features)
+
+
+def synthetic_pages(n_pages: int, seed: int = 7) -> List[str]:
+    rnd = random.Random(seed)
+    words = (
+        "cláusula emissão debêntures remuneração vencimento garantia fiduciária "
+        "escritura agente Valor Total R$ 1.000.000,00 CDI spread § ª º /12 /3 — "
+    ).split()
+    pages = []
+    for i in range(n_pages):
+        lines = [f"Página {i + 1} / {n_pages}", "CONFIDENCIAL - USO INTERNO"]
+        for _ in range(45):
+            lines.append(" ".join(rnd.choice(words) for _ in range(rnd.randint(6, 14))))
+        pages.append("\n".join(lines))
+    return pages
+
+
+def _time(fn, pages, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(pages)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages)
+    assert legacy_metrics(pages) == engine_metrics(pages), "resultados divergentes"
+    assert legacy_repetition(pages) == engine_repetition(pages), "cobertura divergente"
+
+    chars = sum(map(len, pages))
+    print(f"pages={args.pages} chars={chars}")
+    for name, old, new in (
+        ("quality", legacy_metrics, engine_metrics),
+        ("repetition", legacy_repetition, engine_repetition),
+    ):
+        legacy = _time(old, pages, args.repeat)
+        engine = _time(new, pages, args.repeat)
+        print(f"{name:<10} legacy {legacy * 1000:9.1f} ms  current {engine * 1000:9.1f} ms"
+              f"  ({legacy / engine:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,34 @@
-from multiprocessing import cpu_count
+import os
+import tempfile
 
 bind = "0.0.0.0:8000"
-workers = cpu_count() * 2 + 1
\ No newline at end of file
+# Workers HTTP só orquestram (I/O); o OCR CPU-bound roda no pool de cada worker
+# (src/infrastructure/services/ocr_pool.py), dimensionado como
+# núcleos físicos // WEB_CONCURRENCY para não sobrecarregar a máquina.
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# /metrics agrega todos os workers: cada um grava o seu registro neste diretório
+# (src/infrastructure/services/metrics.py) e qualquer worker responde pelo servidor.
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "pdf-metrics"))
+
+
+def on_starting(server):
+    from src.infrastructure.services import metrics
+
+    metrics.clear_multiproc_dir()
+
+
+def post_fork(server, worker):
+    from src.infrastructure.services import metrics
+
+    # Valores herdados do master seriam somados uma vez por worker
+    metrics.reset()
+    metrics.start_flusher()
+
+
+def worker_exit(server, worker):
+    from src.infrastructure.services import metrics
+
+    metrics.flush()
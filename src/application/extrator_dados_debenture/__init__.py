@@ -2,7 +2,8 @@ from atomic import Resource, request
 
 from src.controller.app import app  
 from src.infrastructure.database.database_in_memory import extrator_dados_debenture
-from src.application.pdf_processor.service import PdfProcessConfig, process_pdfs
+from src.application.pdf_processor.jobs import get_job_runner
+from src.application.pdf_processor.service import config_from_payload, parse_bool, process_pdfs
 
 
 class ResourceExtratorDadosDebenture(Resource):
@@ -13,19 +14,14 @@ class ResourceExtratorDadosDebenture(Resource):
         arguments = request.get_json(force=True) or {}
         # Se payload contiver campos do pipeline de PDFs, aciona o processamento
         if "pdfs_dir" in arguments:
-            cfg = PdfProcessConfig(
-                pdfs_dir=arguments.get("pdfs_dir"),
-                auth_header=arguments.get("auth_header"),
-                file_names=arguments.get("file_names"),
-                patterns=arguments.get("patterns"),
-                dpi=int(arguments.get("dpi", 300)),
-                lang=str(arguments.get("lang", "por+eng")),
-                min_tokens=int(arguments.get("min_tokens", 120)),
-                repeat_th=float(arguments.get("repeat_th", 0.30)),
-                repeat_pages=float(arguments.get("repeat_pages", 0.6)),
-                timeout=float(arguments.get("timeout", 60.0)),
-                retries=int(arguments.get("retries", 3)),
-            )
+            try:
+                cfg = config_from_payload(arguments)
+                run_async = parse_bool(arguments.get("async", False), "async")
+            except ValueError as exc:
+                return {"error": str(exc)}, 400
+            # "async": true -> devolve o job imediatamente; status via GET .../jobs/<job_id>
+            if run_async:
+                return get_job_runner().submit(cfg), 202
             body, status = process_pdfs(cfg)
             return body, status
 
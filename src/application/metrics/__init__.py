@@ -0,0 +1,13 @@
+from atomic import Resource
+from flask import Response
+
+from src.infrastructure.services import metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class ResourceMetrics(Resource):
+    def get(self):
+        # Com METRICS_MULTIPROC_DIR (padrão no gunicorn.py), soma todos os workers;
+        # sem ele, só o processo que atende a requisição
+        return Response(metrics.render_prometheus(), status=200, content_type=PROMETHEUS_CONTENT_TYPE)
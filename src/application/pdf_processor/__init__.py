@@ -1,23 +1,26 @@
 from atomic import Resource, request
 
-from .service import PdfProcessConfig, process_pdfs
+from .jobs import get_job_runner
+from .service import config_from_payload, parse_bool, process_pdfs
 
 
 class ResourcePdfProcessor(Resource):
     def post(self):
         data = request.get_json(force=True) or {}
-        cfg = PdfProcessConfig(
-            pdfs_dir=data.get("pdfs_dir"),
-            auth_header=data.get("auth_header"),
-            file_names=data.get("file_names"),
-            patterns=data.get("patterns"),
-            dpi=int(data.get("dpi", 300)),
-            lang=str(data.get("lang", "por+eng")),
-            min_tokens=int(data.get("min_tokens", 120)),
-            repeat_th=float(data.get("repeat_th", 0.30)),
-            repeat_pages=float(data.get("repeat_pages", 0.6)),
-            timeout=float(data.get("timeout", 60.0)),
-            retries=int(data.get("retries", 3)),
-        )
+        try:
+            cfg = config_from_payload(data)
+            run_async = parse_bool(data.get("async", False), "async")
+        except ValueError as exc:
+            return {"error": str(exc)}, 400
+        if run_async:
+            return get_job_runner().submit(cfg), 202
         body, status = process_pdfs(cfg)
         return body, status
+
+
+class ResourcePdfJob(Resource):
+    def get(self, job_id):
+        job = get_job_runner().store.get(job_id)
+        if job is None:
+            return {"message": "Job não encontrado"}, 404
+        return job, 200
@@ -0,0 +1,266 @@
+"""
+Asynchronous execution of the PDF pipeline.
+
+POST handlers submit a `PdfProcessConfig` and get a job id back immediately;
+a background executor runs `process_pdfs` and records progress in a pluggable
+`JobStore` (in-process dict or sqlite file shared by the gunicorn workers).
+
+Jobs not updated for `JOB_TTL` seconds are purged, and jobs left queued/running
+by a process that no longer exists are marked failed when a runner starts.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional
+
+from .service import PdfProcessConfig, process_pdfs
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Jobs sem atualização há mais que isso são removidos do store
+JOB_TTL = float(os.environ.get("JOB_TTL", str(24 * 3600)))
+# Sqlite usado quando há mais de um worker HTTP e JOB_STORE_PATH não foi definido
+DEFAULT_SQLITE_PATH = os.path.join(tempfile.gettempdir(), "pdf-jobs.sqlite3")
+
+
+def _process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Se o processo dono do job ainda existe (donos de outra máquina contam como vivos)."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """Interface de persistência do estado dos jobs (dicts JSON-serializáveis)."""
+
+    def create(self, job: Dict[str, Any]) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields: Any) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def unfinished(self) -> List[Dict[str, Any]]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def fail_orphans(self, is_alive: Callable[[Optional[str]], bool] = _owner_alive) -> int:
+        """Marca como falhos os jobs queued/running cujo processo dono não existe mais."""
+        orphans = [job for job in self.unfinished() if not is_alive(job.get("owner"))]
+        for job in orphans:
+            self.update(
+                job["job_id"],
+                status=JOB_FAILED,
+                error="Processo encerrado antes do fim do job",
+                finished_at=time.time(),
+            )
+        if orphans:
+            logger.warning("[jobs] orphaned jobs marked failed count=%d", len(orphans))
+        return len(orphans)
+
+
+class InMemoryJobStore(JobStore):
+    """Estado no próprio processo; suficiente com um único worker HTTP."""
+
+    def __init__(self, ttl: float = JOB_TTL) -> None:
+        self.ttl = ttl
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._updated: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            for job_id in [j for j, at in self._updated.items() if now - at > self.ttl]:
+                del self._jobs[job_id], self._updated[job_id]
+            self._jobs[job["job_id"]] = dict(job)
+            self._updated[job["job_id"]] = now
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            self._updated[job_id] = time.time()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(j) for j in self._jobs.values() if j.get("status") in (JOB_QUEUED, JOB_RUNNING)]
+
+
+class SqliteJobStore(JobStore):
+    """Estado em arquivo sqlite, visível para todos os workers da mesma máquina."""
+
+    def __init__(self, path: str, ttl: float = JOB_TTL) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def create(self, job: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+            conn.execute(
+                "INSERT INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+                (job["job_id"], json.dumps(job, ensure_ascii=False), now),
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock, closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                raise KeyError(job_id)
+            job = json.loads(row[0])
+            job.update(fields)
+            conn.execute(
+                "UPDATE jobs SET data = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(job, ensure_ascii=False), time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT data FROM jobs").fetchall()
+        jobs = [json.loads(data) for (data,) in rows]
+        return [j for j in jobs if j.get("status") in (JOB_QUEUED, JOB_RUNNING)]
+
+
+class JobRunner:
+    """Executa `process_pdfs` em background e publica o progresso no `store`."""
+
+    def __init__(self, store: JobStore, max_workers: int = 2) -> None:
+        self.store = store
+        # Jobs de processos que morreram (restart, OOM) nunca terminariam sozinhos
+        store.fail_orphans()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-job")
+
+    def submit(self, cfg: PdfProcessConfig) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": JOB_QUEUED,
+            "stage": None,
+            "pdfs_dir": cfg.pdfs_dir,
+            "owner": _process_owner(),
+            "files_total": None,
+            "files_done": 0,
+            "pages_done": 0,
+            "eta_seconds": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "txt_uri": None,
+            "result": None,
+            "http_status": None,
+            "error": None,
+        }
+        self.store.create(job)
+        self._executor.submit(self._run, job_id, cfg)
+        logger.info("[jobs] submitted job_id=%s pdfs_dir=%s", job_id, cfg.pdfs_dir)
+        return job
+
+    def _run(self, job_id: str, cfg: PdfProcessConfig) -> None:
+        started = time.time()
+        self.store.update(job_id, status=JOB_RUNNING, started_at=started)
+        state: Dict[str, Any] = {}
+
+        def on_progress(update: Dict[str, Any]) -> None:
+            state.update(update)
+            fields = dict(update)
+            total, done = state.get("files_total"), state.get("files_done") or 0
+            if total and done:
+                per_file = (time.time() - started) / done
+                fields["eta_seconds"] = round(per_file * (total - done), 1)
+            self.store.update(job_id, **fields)
+
+        try:
+            body, status = process_pdfs(cfg, progress=on_progress)
+        except Exception as exc:
+            logger.exception("[jobs] job failed job_id=%s", job_id)
+            self.store.update(
+                job_id, status=JOB_FAILED, error=str(exc), finished_at=time.time()
+            )
+            return
+        self.store.update(
+            job_id,
+            status=JOB_SUCCEEDED if status < 400 else JOB_FAILED,
+            stage="done",
+            eta_seconds=0.0,
+            http_status=status,
+            result=body,
+            txt_uri=body.get("txt_uri"),
+            error=body.get("error") if status >= 400 else None,
+            finished_at=time.time(),
+        )
+        logger.info("[jobs] finished job_id=%s status=%s", job_id, status)
+
+
+def job_store_from_env() -> JobStore:
+    """`JOB_STORE_PATH` aponta um sqlite compartilhado; sem ele, memória do processo.
+
+    Com mais de um worker HTTP (`WEB_CONCURRENCY`), o status de um job pode ser
+    consultado em outro worker, então o padrão passa a ser `DEFAULT_SQLITE_PATH`.
+    """
+    path = os.environ.get("JOB_STORE_PATH")
+    if not path and int(os.environ.get("WEB_CONCURRENCY", "1")) > 1:
+        path = DEFAULT_SQLITE_PATH
+    return SqliteJobStore(path) if path else InMemoryJobStore()
+
+
+_runner: Optional[JobRunner] = None
+_runner_pid: Optional[int] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Runner do processo (recriado após fork, pois threads não sobrevivem ao fork)."""
+    global _runner, _runner_pid
+    with _runner_lock:
+        if _runner is None or _runner_pid != os.getpid():
+            workers = int(os.environ.get("JOB_WORKERS", "2"))
+            _runner = JobRunner(job_store_from_env(), max_workers=workers)
+            _runner_pid = os.getpid()
+        return _runner
@@ -1,9 +1,24 @@
 from __future__ import annotations
 
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from src.infrastructure.services import metrics, native_text
 from src.infrastructure.services import pdf_ocr as ocr
+from src.infrastructure.services.prefix_manifest import (
+    ConcatParts,
+    Manifest,
+    ManifestStore,
+    open_manifest_store,
+)
+from src.infrastructure.services.text_cache import cache_key, text_cache_from_env
+
+logger = logging.getLogger(__name__)
 
 # API externa removida neste fluxo
 
@@ -14,6 +29,18 @@ PATTERN_DEFAULTS: List[str] = [
     "manual",
 ]
 
+# Vocabulário das seções usadas pelo extrator de debêntures (modo `targeted_ocr`).
+# Procurado só em títulos de seção (`ocr.match_sections`), por palavra inteira e
+# sem acento/caixa; termos comuns no corpo da escritura (spread, aval, taxa DI)
+# ficam de fora para não selecionar quase todas as páginas.
+SECTION_KEYWORDS_DEFAULTS: Dict[str, List[str]] = {
+    "emissora": ["emissora", "companhia emissora"],
+    "valor_emissao": ["valor total da emissao", "valor nominal unitario", "montante total"],
+    "remuneracao": ["remuneracao", "juros remuneratorios"],
+    "vencimento": ["data de vencimento", "prazo de vencimento", "vencimento das debentures"],
+    "garantias": ["garantia", "alienacao fiduciaria", "cessao fiduciaria", "fianca"],
+}
+
 
 @dataclass
 class PdfProcessConfig:
@@ -29,49 +56,418 @@ class PdfProcessConfig:
     repeat_pages: float = 0.6
     timeout: float = 60.0
     retries: int = 3
+    # Paralelismo do OCR por página (1 = sequencial, como antes)
+    ocr_workers: int = 1
+    # Decisão nativo/OCR por página em vez de por arquivo
+    hybrid_ocr: bool = False
+    # Páginas rasterizadas por vez no OCR (0 = documento inteiro de uma vez)
+    raster_window: int = 0
+    # Cache de texto extraído; o local vem da configuração do servidor (TEXT_CACHE_DIR)
+    text_cache: bool = False
+    # Cache de OCR por página (páginas idênticas reconhecidas uma vez); local em PAGE_CACHE_DIR
+    page_cache: bool = False
+    # Downloads antecipados enquanto o arquivo atual é extraído (0 = sequencial)
+    prefetch: int = 0
+    prefetch_max_bytes: int = ocr.PREFETCH_MAX_BYTES
+    # Remove da saída cabeçalhos/rodapés repetidos e contadores de página
+    strip_boilerplate: bool = False
+    # Biblioteca da leitura nativa: pypdf2 (padrão), pdfium, pdfminer ou auto
+    native_backend: str = native_text.DEFAULT_BACKEND
+    # Pré-processamento das páginas com OCR: None (binarização simples),
+    # "fast", "balanced" (pula denoise/deskew em páginas limpas) ou "accurate"
+    preprocess_profile: Optional[str] = None
+    # Rasterização para OCR: "pdf2image" (PIL) ou "pgm" (pdftoppm -gray direto para numpy)
+    raster_backend: str = ocr.DEFAULT_RASTER_BACKEND
+    # Perfil de OCR (fast/balanced/accurate): define dpi e pré-processamento juntos,
+    # substituindo `dpi` e `preprocess_profile`; None mantém os campos individuais
+    ocr_profile: Optional[str] = None
+    # DPI adaptativo: OCR primeiro neste dpi (ex.: 150-200) e refaz no dpi final
+    # só as páginas com confiança média abaixo de `adaptive_min_conf` (None = desligado)
+    adaptive_dpi: Optional[int] = None
+    adaptive_min_conf: float = ocr.ADAPTIVE_MIN_CONF
+    # OCR só das imagens sem texto nativo sobreposto nas páginas lidas nativamente
+    region_ocr: bool = False
+    # OCR em duas passadas: passada rápida em todas as páginas e OCR completo só
+    # nas que citam o vocabulário de seções (None = SECTION_KEYWORDS_DEFAULTS)
+    targeted_ocr: bool = False
+    section_keywords: Optional[List[str]] = None
+    # Reprocessamento incremental: manifesto em `pdfs_dir/_manifest` com o
+    # fingerprint, os parâmetros e o texto de cada PDF; só arquivos novos ou
+    # alterados são extraídos e o TXT concatenado é remontado dos textos guardados
+    incremental: bool = False
+    # Busca por `patterns` com listagem nova do prefixo (ignora índice e cache de listagem)
+    refresh_listing: bool = False
+
+    def extract_options(self) -> ocr.ExtractOptions:
+        """Opções de extração de cada PDF desta execução."""
+        return ocr.ExtractOptions(
+            dpi=self.dpi,
+            lang=self.lang,
+            min_tokens=self.min_tokens,
+            repeat_th=self.repeat_th,
+            repeat_pages_frac=self.repeat_pages,
+            ocr_workers=self.ocr_workers,
+            hybrid=self.hybrid_ocr,
+            raster_window=self.raster_window,
+            page_cache_dir=ocr.page_cache_dir_from_env() if self.page_cache else None,
+            strip_boilerplate=self.strip_boilerplate,
+            native_backend=self.native_backend,
+            preprocess_profile=self.preprocess_profile,
+            raster_backend=self.raster_backend,
+            ocr_profile=self.ocr_profile,
+            adaptive_dpi=self.adaptive_dpi,
+            adaptive_min_conf=self.adaptive_min_conf,
+            region_ocr=self.region_ocr,
+            section_keywords=_section_keywords(self),
+        )
+
+
+_TRUE_STRINGS = ("true", "1")
+_FALSE_STRINGS = ("false", "0")
+
+
+def parse_bool(value: Any, name: str) -> bool:
+    """Flag do payload: booleano JSON, 0/1 ou "true"/"false"/"1"/"0" (ValueError nos demais)."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE_STRINGS:
+            return True
+        if text in _FALSE_STRINGS:
+            return False
+    raise ValueError(f"'{name}' deve ser booleano (true/false), recebido: {value!r}")
+
+
+def _payload_value(data: Dict[str, Any], name: str, convert: Callable[[Any], Any], default: Any) -> Any:
+    value = data.get(name)
+    if value is None:
+        return default
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' inválido: {value!r}") from None
+
+
+def _payload_text(data: Dict[str, Any], name: str) -> Optional[str]:
+    """Texto opcional do payload (ValueError para outros tipos JSON)."""
+    value = data.get(name)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"'{name}' deve ser texto, recebido: {value!r}")
+    return value
+
 
+def config_from_payload(data: Dict[str, Any]) -> PdfProcessConfig:
+    """`PdfProcessConfig` a partir do JSON da requisição (ValueError para valores inválidos)."""
+
+    def flag(name: str) -> bool:
+        return parse_bool(data.get(name, False), name)
+
+    if "cache_dir" in data:
+        # O local do cache é configuração do servidor, nunca do payload
+        raise ValueError("'cache_dir' não é aceito; use 'text_cache': true (local em TEXT_CACHE_DIR)")
+    if "page_cache_dir" in data:
+        raise ValueError("'page_cache_dir' não é aceito; use 'page_cache': true (local em PAGE_CACHE_DIR)")
+
+    return PdfProcessConfig(
+        pdfs_dir=data.get("pdfs_dir"),
+        auth_header=data.get("auth_header"),
+        file_names=data.get("file_names"),
+        patterns=data.get("patterns"),
+        dpi=_payload_value(data, "dpi", int, 300),
+        lang=_payload_value(data, "lang", str, "por+eng"),
+        min_tokens=_payload_value(data, "min_tokens", int, 120),
+        repeat_th=_payload_value(data, "repeat_th", float, 0.30),
+        repeat_pages=_payload_value(data, "repeat_pages", float, 0.6),
+        timeout=_payload_value(data, "timeout", float, 60.0),
+        retries=_payload_value(data, "retries", int, 3),
+        ocr_workers=_payload_value(data, "ocr_workers", int, 1),
+        hybrid_ocr=flag("hybrid_ocr"),
+        raster_window=_payload_value(data, "raster_window", int, 0),
+        text_cache=flag("text_cache"),
+        page_cache=flag("page_cache"),
+        prefetch=_payload_value(data, "prefetch", int, 0),
+        strip_boilerplate=flag("strip_boilerplate"),
+        native_backend=_payload_value(data, "native_backend", str, native_text.DEFAULT_BACKEND),
+        preprocess_profile=_payload_text(data, "preprocess_profile"),
+        raster_backend=_payload_value(data, "raster_backend", str, ocr.DEFAULT_RASTER_BACKEND),
+        ocr_profile=_payload_text(data, "ocr_profile"),
+        adaptive_dpi=_payload_value(data, "adaptive_dpi", int, None),
+        adaptive_min_conf=_payload_value(data, "adaptive_min_conf", float, ocr.ADAPTIVE_MIN_CONF),
+        region_ocr=flag("region_ocr"),
+        targeted_ocr=flag("targeted_ocr"),
+        section_keywords=data.get("section_keywords"),
+        incremental=flag("incremental"),
+        refresh_listing=flag("refresh_listing"),
+    )
+
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def process_pdfs(
+    cfg: PdfProcessConfig, progress: Optional[ProgressCallback] = None
+) -> Tuple[Dict[str, Any], int]:
+    """Executa o pipeline completo (listar → extrair → gravar TXT).
+
+    `progress`, se informado, recebe atualizações parciais com `stage`
+    (listing/extracting/uploading), `files_total`, `files_done` e `pages_done`.
+    """
+    notify = progress or (lambda _update: None)
+    started = time.perf_counter()
 
-def process_pdfs(cfg: PdfProcessConfig) -> Tuple[Dict[str, Any], int]:
     # 1) Lista PDFs
     if not (isinstance(cfg.pdfs_dir, str) and cfg.pdfs_dir.startswith("gs://")):
         return {"error": "'pdfs_dir' deve ser uma URI gs://bucket/prefix"}, 400
+    try:
+        native_text.resolve_backend(cfg.native_backend)
+    except (ValueError, RuntimeError) as exc:
+        return {"error": str(exc)}, 400
+    if cfg.preprocess_profile is not None and cfg.preprocess_profile not in ocr.PREPROCESS_PROFILES:
+        return {
+            "error": f"'preprocess_profile' deve ser um de: {', '.join(ocr.PREPROCESS_PROFILES)}"
+        }, 400
+    if cfg.raster_backend not in ocr.RASTER_BACKENDS:
+        return {"error": f"'raster_backend' deve ser um de: {', '.join(ocr.RASTER_BACKENDS)}"}, 400
+    if cfg.ocr_profile is not None and cfg.ocr_profile not in ocr.OCR_PROFILES:
+        return {"error": f"'ocr_profile' deve ser um de: {', '.join(ocr.OCR_PROFILES)}"}, 400
+    if cfg.adaptive_dpi is not None and cfg.adaptive_dpi <= 0:
+        return {"error": "'adaptive_dpi' deve ser um inteiro positivo"}, 400
+    if not 0 <= cfg.adaptive_min_conf <= 100:
+        return {"error": "'adaptive_min_conf' deve estar entre 0 e 100"}, 400
+    if cfg.section_keywords is not None and (
+        not isinstance(cfg.section_keywords, list)
+        or not cfg.section_keywords
+        or not all(isinstance(k, str) and k.strip() for k in cfg.section_keywords)
+    ):
+        return {"error": "'section_keywords' deve ser uma lista não vazia de textos"}, 400
+    cache = text_cache_from_env() if cfg.text_cache else None
+    if cfg.text_cache and cache is None:
+        return {"error": "'text_cache' requer TEXT_CACHE_DIR configurado no servidor"}, 400
+    if cfg.page_cache and ocr.page_cache_dir_from_env() is None:
+        return {"error": "'page_cache' requer PAGE_CACHE_DIR configurado no servidor"}, 400
     # Não há mais necessidade de 'payload_dir' nem de API externa
+    notify({"stage": "listing"})
 
-    if cfg.file_names:
-        # Quando nomes exatos são fornecidos, respeitamos isso acima de padrões
-        pdfs = ocr.gcs_list_pdfs(cfg.pdfs_dir, recursive=True, file_names=cfg.file_names)
-    else:
-        # Se patterns for omitido, usamos os padrões default
-        use_patterns = cfg.patterns if cfg.patterns is not None else PATTERN_DEFAULTS
-        pdfs = ocr.find_pdfs_by_patterns(cfg.pdfs_dir, use_patterns, recursive=True)
+    with ocr.stage_timer("list"):
+        if cfg.file_names:
+            # Quando nomes exatos são fornecidos, respeitamos isso acima de padrões
+            pdfs = ocr.gcs_list_pdfs(cfg.pdfs_dir, recursive=True, file_names=cfg.file_names)
+        else:
+            # Se patterns for omitido, usamos os padrões default
+            use_patterns = cfg.patterns if cfg.patterns is not None else PATTERN_DEFAULTS
+            pdfs = ocr.find_pdfs_by_patterns(
+                cfg.pdfs_dir, use_patterns, recursive=True, refresh=cfg.refresh_listing
+            )
+    listed = time.perf_counter()
     if not pdfs:
         return {"message": "Nenhum PDF encontrado no prefixo informado."}, 404
 
     # 2) Extrai e concatena texto
-    text = ocr.concat_many_pdfs_to_text(
-        pdf_identifiers=pdfs,
-        dpi=cfg.dpi,
-        lang=cfg.lang,
-        min_tokens=cfg.min_tokens,
-        repeat_th=cfg.repeat_th,
-        repeat_pages_frac=cfg.repeat_pages,
+    reports: Dict[str, Dict[str, Any]] = {}
+    done = {"files_done": 0, "pages_done": 0}
+
+    def on_file_done(_ident: str, report: Dict[str, Any]) -> None:
+        done["files_done"] += 1
+        done["pages_done"] += len(report.get("pages") or [])
+        notify(dict(done))
+
+    notify({"stage": "extracting", "files_total": len(pdfs), **done})
+    options = cfg.extract_options()
+    run_kw: Dict[str, Any] = dict(
+        reports=reports,
+        cache=cache,
+        prefetch=cfg.prefetch,
+        prefetch_max_bytes=cfg.prefetch_max_bytes,
+        on_file_done=on_file_done,
     )
+    incremental: Optional[Dict[str, Any]] = None
+    if cfg.incremental:
+        store = open_manifest_store(cfg.pdfs_dir)
+        manifest = store.load()
+        text, parts, incremental = _extract_incremental(pdfs, store, manifest, options, run_kw, done, notify)
+        txt_uri = manifest.concat_uri(parts) if not incremental["files_extracted"] else None
+    else:
+        text = ocr.concat_many_pdfs_to_text(pdf_identifiers=pdfs, options=options, **run_kw)
+        txt_uri = None
+
+    extracted = time.perf_counter()
+
+    # 3) Grava TXT (no modo incremental, só se algum texto mudou)
+    notify({"stage": "uploading"})
+    if txt_uri is None:
+        now = datetime.now()
+        # Tempo de processamento (listagem + extração) até aqui
+        elapsed_str = f"{extracted - started:.2f}s"
+        txt_name = f"concat-text-{now:%Y%m%d}-{now:%H%M%S}-{elapsed_str}.txt"
+        txt_uri = ocr.gcs_write_text(cfg.pdfs_dir, txt_name, text)
+        if incremental is not None:
+            manifest.set_concat(txt_uri, parts)
+            store.save(manifest)
+    elif incremental is not None:
+        incremental["txt_reused"] = True
 
-    # 3) Grava TXT
-    from datetime import datetime
-    import time
-    start = time.perf_counter()
-    date_str = datetime.now().strftime("%Y%m%d")
-    time_str = datetime.now().strftime("%H%M%S")
-    elapsed = time.perf_counter() - start
-    elapsed_str = f"{elapsed:.2f}s"
-    txt_name = f"concat-text-{date_str}-{time_str}-{elapsed_str}.txt"
-    txt_uri = ocr.gcs_write_text(cfg.pdfs_dir, txt_name, text)
+    finished = time.perf_counter()
 
     result = {
         "message": "Processamento concluído",
         "pdfs_count": len(pdfs),
         "txt_uri": txt_uri,
+        "timings": _run_timings(reports, started, listed, extracted, finished),
     }
+    if cfg.hybrid_ocr or cfg.adaptive_dpi is not None or cfg.region_ocr:
+        result["files"] = _summarize_reports(reports)
+    if cfg.targeted_ocr:
+        result["targeted_ocr"] = _summarize_targeted(reports)
+    if cache is not None:
+        result["cache"] = cache.stats()
+    if incremental is not None:
+        result["incremental"] = incremental
+    if cfg.strip_boilerplate:
+        result["boilerplate_bytes_saved"] = sum(
+            rep.get("boilerplate_bytes_saved", 0) for rep in reports.values()
+        )
 
     return result, 200
+
+
+def _extract_incremental(
+    pdfs: List[str],
+    store: ManifestStore,
+    manifest: Manifest,
+    options: ocr.ExtractOptions,
+    run_kw: Dict[str, Any],
+    done: Dict[str, int],
+    notify: ProgressCallback,
+) -> Tuple[str, ConcatParts, Dict[str, Any]]:
+    """Extrai só os PDFs novos/alterados desde o manifesto e remonta o TXT.
+
+    Um PDF é reaproveitado quando fingerprint e parâmetros batem com o manifesto
+    e o texto guardado ainda existe; arquivos com erro não entram no manifesto.
+    """
+    params = options.key_params()
+    fingerprints = ocr.gcs_generation_fingerprints(pdfs)
+    text_uris = {ident: manifest.text_uri(ident, fingerprints[ident], params) for ident in pdfs}
+    texts: Dict[str, str] = {}
+    stale = [ident for ident in pdfs if text_uris[ident] is None]
+    concat_uri = manifest.concat_uri([(ident, text_uris[ident]) for ident in pdfs])
+    if not stale and concat_uri:
+        if store.exists(concat_uri):
+            # Nada mudou: o TXT da última execução continua válido
+            return "", [(ident, text_uris[ident]) for ident in pdfs], _incremental_summary(pdfs, stale)
+        # TXT anterior removido: remonta a partir dos textos guardados
+        logger.info("[pdf_processor] previous txt missing, rebuilding uri=%s", concat_uri)
+        manifest.concat = None
+
+    reused = [ident for ident in pdfs if text_uris[ident] is not None]
+    with ThreadPoolExecutor(max_workers=max(1, min(ocr.GCS_LOOKUP_WORKERS, len(reused)))) as ex:
+        for ident, txt in zip(reused, ex.map(lambda i: store.read_text(text_uris[i]), reused)):
+            if txt is None:
+                text_uris[ident] = None  # texto guardado sumiu: extrai de novo
+            else:
+                texts[ident] = txt
+    stale = [ident for ident in pdfs if text_uris[ident] is None]
+
+    done["files_done"] = len(pdfs) - len(stale)
+    notify(dict(done))
+    if stale:
+        extracted: Dict[str, str] = {}
+        ocr.concat_many_pdfs_to_text(pdf_identifiers=stale, options=options, texts=extracted, **run_kw)
+        for ident, txt in extracted.items():
+            texts[ident] = txt
+            if fingerprints[ident] is None:
+                continue
+            uri = store.write_text(cache_key(fingerprints[ident], params), txt)
+            manifest.record(ident, fingerprints[ident], params, uri, len(txt))
+            text_uris[ident] = uri
+
+    reports = run_kw["reports"]
+    pieces = [
+        ocr.concat_part(
+            ident,
+            texts[ident] if ident in texts else f"[erro] {ident}: {reports.get(ident, {}).get('error')}",
+        )
+        for ident in pdfs
+    ]
+    # Arquivos com erro entram nas partes sem URI: o TXT não é reaproveitado depois
+    parts = [(ident, text_uris[ident] or "") for ident in pdfs]
+    return "\n\n".join(pieces).strip(), parts, _incremental_summary(pdfs, stale)
+
+
+def _incremental_summary(pdfs: List[str], stale: List[str]) -> Dict[str, Any]:
+    return {
+        "files_reused": len(pdfs) - len(stale),
+        "files_extracted": len(stale),
+        "txt_reused": False,
+    }
+
+
+def _run_timings(
+    reports: Dict[str, Dict[str, Any]], started: float, listed: float, extracted: float, finished: float
+) -> Dict[str, Any]:
+    """Tempos por etapa e vazão desta execução (também publicados em `metrics`)."""
+    extract_seconds = extracted - listed
+    pages = sum(len(rep.get("pages") or []) for rep in reports.values())
+    size = sum(rep.get("bytes", 0) for rep in reports.values())
+    modes = [rep["mode"] for rep in reports.values() if rep.get("mode") in ("ocr", "native", "hybrid")]
+    timings = {
+        "list_seconds": round(listed - started, 3),
+        "extract_seconds": round(extract_seconds, 3),
+        "upload_seconds": round(finished - extracted, 3),
+        "total_seconds": round(finished - started, 3),
+        "pages": pages,
+        "pages_per_second": round(pages / extract_seconds, 3) if extract_seconds > 0 else None,
+        "bytes_per_second": round(size / extract_seconds, 1) if extract_seconds > 0 else None,
+        "ocr_forced_ratio": round(modes.count("ocr") / len(modes), 3) if modes else None,
+    }
+    metrics.observe("pdf_process_seconds", finished - started)
+    if timings["pages_per_second"] is not None:
+        metrics.set_gauge("pdf_last_run_pages_per_second", timings["pages_per_second"])
+        metrics.set_gauge("pdf_last_run_bytes_per_second", timings["bytes_per_second"])
+    return timings
+
+
+def _section_keywords(cfg: PdfProcessConfig) -> Optional[List[str]]:
+    if not cfg.targeted_ocr:
+        return None
+    if cfg.section_keywords is not None:
+        return cfg.section_keywords
+    return [kw for kws in SECTION_KEYWORDS_DEFAULTS.values() for kw in kws]
+
+
+def _summarize_targeted(reports: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Totais do OCR em duas passadas: páginas puladas e tempo economizado (estimado)."""
+    targeted = [rep["targeted"] for rep in reports.values() if "targeted" in rep]
+    saved = [t["seconds_saved"] for t in targeted if t["seconds_saved"] is not None]
+    return {
+        "files": len(targeted),
+        "pages_full": sum(len(t["pages_full"]) for t in targeted),
+        "pages_skipped": sum(len(t["pages_skipped"]) for t in targeted),
+        "seconds_saved": round(sum(saved), 3) if saved else None,
+    }
+
+
+def _summarize_reports(reports: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Resumo por arquivo do caminho (nativo/OCR) tomado por cada página.
+
+    `ocr_dpi` mapeia cada página com OCR ao dpi em que foi reconhecida e
+    `ocr_regions` cada página nativa às regiões de imagem que passaram por OCR.
+    """
+    files: List[Dict[str, Any]] = []
+    for ident, rep in reports.items():
+        pages = rep.get("pages") or []
+        files.append(
+            {
+                "file": os.path.basename(ident),
+                "mode": rep.get("mode"),
+                "ocr_pages": [p["page"] for p in pages if p.get("path") == "ocr"],
+                "native_pages": [p["page"] for p in pages if p.get("path") == "native"],
+                "ocr_dpi": {str(p["page"]): p["dpi"] for p in pages if "dpi" in p},
+                "ocr_regions": {
+                    str(p["page"]): p["ocr_regions"] for p in pages if "ocr_regions" in p
+                },
+            }
+        )
+    return files
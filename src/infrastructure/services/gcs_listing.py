@@ -0,0 +1,126 @@
+"""
+Short-lived, per-process cache of GCS prefix listings.
+
+Entries hold the `(name, generation)` pairs of the PDFs under a prefix and
+expire after `GCS_LIST_TTL` seconds. They are dropped early when this process
+writes under the prefix, or when a metadata lookup sees a generation the
+listing does not know (object replaced or created since it was listed).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.infrastructure.services import metrics
+
+DEFAULT_TTL = float(os.environ.get("GCS_LIST_TTL", "30"))
+
+# (bucket, prefix com "/" final ou "", recursivo)
+ListingKey = Tuple[str, str, bool]
+Listing = List[Tuple[str, int]]
+
+
+def _covers(key: ListingKey, bucket: str, name: str) -> bool:
+    """Se o objeto `name` aparece (ou apareceria) na listagem `key`."""
+    k_bucket, prefix, recursive = key
+    if k_bucket != bucket or not name.startswith(prefix):
+        return False
+    return recursive or "/" not in name[len(prefix):]
+
+
+class _Entry(NamedTuple):
+    expires: float
+    listing: Listing
+    # name -> generation, montado uma vez no `put` para o `observe` ser O(1)
+    generations: Dict[str, int]
+
+
+class ListingCache:
+    def __init__(self, ttl: float = DEFAULT_TTL, clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[ListingKey, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: ListingKey) -> Optional[Listing]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= self._clock():
+                del self._entries[key]
+                entry = None
+        metrics.inc("gcs_list_cache_total", result="hit" if entry is not None else "miss")
+        return list(entry.listing) if entry is not None else None
+
+    def put(self, key: ListingKey, listing: Listing) -> None:
+        if self.ttl <= 0:
+            return
+        entry = _Entry(self._clock() + self.ttl, list(listing), dict(listing))
+        with self._lock:
+            self._entries[key] = entry
+
+    def generation(self, bucket: str, name: str) -> Optional[int]:
+        """Generation de `name` numa listagem válida em cache (None se nenhuma o tiver)."""
+        now = self._clock()
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry.expires > now and _covers(key, bucket, name) and name in entry.generations:
+                    return entry.generations[name]
+        return None
+
+    def invalidate(self, bucket: str, name: str) -> int:
+        """Descarta as listagens que incluem `name` (escrita/remoção no prefixo).
+
+        As listagens só guardam PDFs, então outros objetos não as invalidam.
+        """
+        if not name.lower().endswith(".pdf"):
+            return 0
+        with self._lock:
+            stale = [k for k in self._entries if _covers(k, bucket, name)]
+            for k in stale:
+                del self._entries[k]
+        if stale:
+            metrics.inc("gcs_list_cache_invalidations_total", len(stale))
+        return len(stale)
+
+    def observe(self, bucket: str, name: str, generation: Optional[int]) -> None:
+        """Confere a generation vista num lookup direto com as listagens em cache.
+
+        Objeto ausente da listagem ou com outra generation invalida a entrada;
+        `generation=None` (objeto não existe) invalida se a listagem o tiver.
+        """
+        if not name.lower().endswith(".pdf"):
+            return
+        with self._lock:
+            stale = [
+                k
+                for k, entry in self._entries.items()
+                if _covers(k, bucket, name) and entry.generations.get(name) != generation
+            ]
+            for k in stale:
+                del self._entries[k]
+        if stale:
+            metrics.inc("gcs_list_cache_invalidations_total", len(stale))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = ListingCache()
+
+
+def _reset_after_fork() -> None:
+    global _cache
+    # O lock pode ter sido copiado adquirido por outra thread do pai
+    _cache = ListingCache(ttl=_cache.ttl)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_cache() -> ListingCache:
+    """Cache de listagens do processo (vazio em cada worker após o fork)."""
+    return _cache
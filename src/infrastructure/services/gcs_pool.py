@@ -0,0 +1,95 @@
+"""
+Process-wide Google Cloud Storage client shared by pdf_ocr and txt_to_api.
+
+A single `storage.Client` per process reuses auth tokens and keep-alive
+connections through a sized HTTP connection pool. The client is dropped
+after `fork()` (gunicorn workers) and rebuilt lazily in the child.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+from src.infrastructure.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Optional GCS
+try:
+    from google.cloud import storage  # type: ignore
+except Exception:  # pragma: no cover - optional
+    storage = None  # type: ignore
+
+POOL_SIZE = int(os.environ.get("GCS_HTTP_POOL_SIZE", "32"))
+MAX_RETRIES = int(os.environ.get("GCS_HTTP_MAX_RETRIES", "3"))
+
+_client: Optional[Any] = None
+_client_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    # O lock pode ter sido copiado adquirido por outra thread do pai
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _counting_adapter():  # pragma: no cover - runtime only
+    from requests.adapters import HTTPAdapter
+
+    class _CountingAdapter(HTTPAdapter):
+        """HTTPAdapter que publica requisições e conexões abertas nas métricas."""
+
+        def send(self, request, *args, **kwargs):
+            resp = super().send(request, *args, **kwargs)
+            metrics.inc("gcs_http_requests_total")
+            opened = 0
+            pools = self.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                opened += getattr(pool, "num_connections", 0) if pool is not None else 0
+            metrics.set_gauge("gcs_http_connections_opened", opened)
+            return resp
+
+    return _CountingAdapter(
+        pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=MAX_RETRIES
+    )
+
+
+def _build_client():  # pragma: no cover - runtime only
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+
+    credentials, project = google.auth.default(
+        scopes=["https://www.googleapis.com/auth/devstorage.read_write"]
+    )
+    session = AuthorizedSession(credentials)
+    session.mount("https://", _counting_adapter())
+    return storage.Client(project=project, credentials=credentials, _http=session)
+
+
+def get_client():
+    """Cliente GCS do processo; criado na primeira chamada (e de novo após fork)."""
+    global _client, _client_pid
+    if storage is None:
+        raise RuntimeError(
+            "google-cloud-storage não instalado. pip install google-cloud-storage"
+        )
+    pid = os.getpid()
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = _build_client()
+            _client_pid = pid
+            metrics.inc("gcs_client_created_total")
+            logger.info("[gcs_pool] client created pid=%d pool_size=%d", pid, POOL_SIZE)
+        else:
+            metrics.inc("gcs_client_reused_total")
+        return _client
@@ -0,0 +1,303 @@
+"""
+Process-wide counters, gauges and histograms for the OCR/GCS services.
+
+Thread-safe and dependency-free; values are kept per process (each gunicorn
+worker has its own registry). Histograms are stored as cumulative counters
+(`<nome>_bucket{le=...}`, `<nome>_sum`, `<nome>_count`), so they travel with
+`drain_counters`/`merge_counters` like any counter. `render_prometheus`
+writes everything in the Prometheus text format.
+
+With `METRICS_MULTIPROC_DIR` set, each HTTP worker writes its registry to
+`<dir>/metrics-<pid>.json` (`start_flusher`, every `METRICS_FLUSH_INTERVAL`
+seconds and at exit), and `render_prometheus` serves the sum of all workers'
+counters plus every live worker's gauges labelled with its `pid`, so any
+worker answers the scrape for the whole server.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_lock = threading.Lock()
+_counters: Dict[_Key, float] = {}
+_gauges: Dict[_Key, float] = {}
+
+
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+_flusher: Optional[threading.Thread] = None
+
+
+def _reset_after_fork() -> None:
+    # O lock pode ter sido copiado adquirido por outra thread do processo pai
+    global _lock, _flusher
+    _lock = threading.Lock()
+    # A thread de gravação não sobrevive ao fork
+    _flusher = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _key(name: str, labels: Dict[str, object]) -> _Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels: object) -> None:
+    """Incrementa o contador `name` (com labels opcionais)."""
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: object) -> None:
+    k = _key(name, labels)
+    with _lock:
+        _gauges[k] = float(value)
+
+
+def add_gauge(name: str, delta: float, **labels: object) -> None:
+    k = _key(name, labels)
+    with _lock:
+        _gauges[k] = _gauges.get(k, 0.0) + delta
+
+
+# Segundos: de operações de página (ms) até documentos longos (minutos)
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+
+def _le(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else format(bound, "g")
+
+
+def observe(
+    name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels: object
+) -> None:
+    """Registra `value` no histograma `name`."""
+    # Todos os buckets existem desde a primeira observação (os acima de `value` com 0)
+    bounds = list(buckets) + [math.inf]
+    keys = [(_key(f"{name}_bucket", {**labels, "le": _le(b)}), 1.0 if value <= b else 0.0) for b in bounds]
+    sum_key, count_key = _key(f"{name}_sum", labels), _key(f"{name}_count", labels)
+    with _lock:
+        for k, hit in keys:
+            _counters[k] = _counters.get(k, 0.0) + hit
+        _counters[sum_key] = _counters.get(sum_key, 0.0) + value
+        _counters[count_key] = _counters.get(count_key, 0.0) + 1
+
+
+@contextmanager
+def timer(name: str, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels: object) -> Iterator[None]:
+    """Mede o bloco e registra a duração (segundos) no histograma `name`, inclusive com erro."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, buckets=buckets, **labels)
+
+
+def get(name: str, **labels: object) -> float:
+    k = _key(name, labels)
+    with _lock:
+        if k in _counters:
+            return _counters[k]
+        return _gauges.get(k, 0.0)
+
+
+def snapshot() -> Dict[str, float]:
+    """Cópia plana `{"nome{label=valor}": valor}` de contadores e gauges."""
+    out: Dict[str, float] = {}
+    with _lock:
+        for (name, labels), value in list(_counters.items()) + list(_gauges.items()):
+            suffix = ",".join(f"{k}={v}" for k, v in labels)
+            out[f"{name}{{{suffix}}}" if suffix else name] = value
+    return out
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _histogram_names(counters: Dict[_Key, float]) -> set:
+    return {
+        name[: -len("_bucket")]
+        for name, labels in counters
+        if name.endswith("_bucket") and any(k == "le" for k, _ in labels)
+    }
+
+
+def _bucket_order(key: _Key) -> Tuple[object, ...]:
+    name, labels = key
+    rest = tuple(kv for kv in labels if kv[0] != "le")
+    le = dict(labels).get("le")
+    return (name, rest, math.inf if le in (None, "+Inf") else float(le))
+
+
+def render_prometheus() -> str:
+    """Contadores, gauges e histogramas no formato texto do Prometheus (0.0.4).
+
+    Com `METRICS_MULTIPROC_DIR`, agrega os registros gravados por todos os workers.
+    """
+    directory = multiproc_dir()
+    if directory:
+        flush(directory)
+        counters, gauges = _collect(directory)
+    else:
+        with _lock:
+            counters = dict(_counters)
+            gauges = dict(_gauges)
+    return _render(counters, gauges)
+
+
+def _render(counters: Dict[_Key, float], gauges: Dict[_Key, float]) -> str:
+    histograms = _histogram_names(counters)
+    families: Dict[str, Tuple[str, List[Tuple[_Key, float]]]] = {}
+    for (name, labels), value in counters.items():
+        base: Optional[str] = None
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix) and name[: -len(suffix)] in histograms:
+                base = name[: -len(suffix)]
+        family = base or name
+        kind = "histogram" if base else "counter"
+        families.setdefault(family, (kind, []))[1].append(((name, labels), value))
+    for key, value in gauges.items():
+        families.setdefault(key[0], ("gauge", []))[1].append((key, value))
+
+    lines: List[str] = []
+    for family in sorted(families):
+        kind, samples = families[family]
+        lines.append(f"# TYPE {family} {kind}")
+        for (name, labels), value in sorted(samples, key=lambda s: _bucket_order(s[0])):
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def multiproc_dir() -> Optional[str]:
+    """Diretório compartilhado pelos workers (`METRICS_MULTIPROC_DIR`), se configurado."""
+    return os.environ.get("METRICS_MULTIPROC_DIR") or None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def flush(directory: Optional[str] = None) -> None:
+    """Grava o registro deste processo em `<dir>/metrics-<pid>.json` (troca atômica)."""
+    directory = directory or multiproc_dir()
+    if not directory:
+        return
+    with _lock:
+        data = {
+            "pid": os.getpid(),
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "gauges": [[name, list(labels), value] for (name, labels), value in _gauges.items()],
+        }
+    path = Path(directory) / f"metrics-{os.getpid()}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _collect(directory: str) -> Tuple[Dict[_Key, float], Dict[_Key, float]]:
+    """Soma os contadores de todos os arquivos; gauges só de processos vivos, com `pid`.
+
+    Contadores de workers encerrados continuam na soma (o total não regride).
+    """
+    counters: Dict[_Key, float] = {}
+    gauges: Dict[_Key, float] = {}
+    for path in sorted(Path(directory).glob("metrics-*.json")):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data.get("counters", []):
+            k = (name, tuple(tuple(kv) for kv in labels))
+            counters[k] = counters.get(k, 0.0) + value
+        pid = int(data.get("pid", 0))
+        if not _pid_alive(pid):
+            continue
+        for name, labels, value in data.get("gauges", []):
+            gauges[(name, tuple(sorted([*(tuple(kv) for kv in labels), ("pid", str(pid))])))] = value
+    return counters, gauges
+
+
+def clear_multiproc_dir(directory: Optional[str] = None) -> None:
+    """Remove os registros de execuções anteriores (no início do servidor)."""
+    directory = directory or multiproc_dir()
+    if not directory:
+        return
+    for path in Path(directory).glob("metrics-*.json"):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _flush_loop(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logger.exception("[metrics] flush failed")
+
+
+def start_flusher(interval: float = FLUSH_INTERVAL) -> None:
+    """Grava o registro periodicamente e na saída (workers HTTP com `METRICS_MULTIPROC_DIR`)."""
+    global _flusher
+    if not multiproc_dir() or _flusher is not None:
+        return
+    _flusher = threading.Thread(target=_flush_loop, args=(interval,), name="metrics-flush", daemon=True)
+    _flusher.start()
+    atexit.register(flush)
+
+
+def drain_counters() -> Dict[_Key, float]:
+    """Remove e devolve os contadores (processos do pool repassam ao processo pai)."""
+    with _lock:
+        out = dict(_counters)
+        _counters.clear()
+    return out
+
+
+def merge_counters(counters: Dict[_Key, float]) -> None:
+    """Soma contadores vindos de `drain_counters` de outro processo."""
+    with _lock:
+        for k, value in counters.items():
+            _counters[k] = _counters.get(k, 0.0) + value
+
+
+def reset() -> None:
+    """Zera todos os valores (uso em testes)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
@@ -0,0 +1,275 @@
+"""
+Persistent index of normalized PDF names per GCS prefix, for pattern search.
+
+Each index maps blob name -> (generation, normalized stem). A refresh diffs a
+fresh `(name, generation)` listing against the index, so only new or replaced
+objects are normalized again, and the index is only written back when
+something changed. Between refreshes (`NAME_INDEX_REFRESH` seconds) queries
+use the stored index without listing the bucket; `force=True` refreshes now.
+
+Queries run every pattern at once over a single newline-joined string of
+names. The default is a compiled regex alternation (stdlib only);
+`pyahocorasick`, an optional dependency, switches to an Aho-Corasick automaton.
+
+Refreshes of different prefixes run in parallel (one lock per key), and a
+refresh builds a new `NameIndex` that replaces the old one, so queries
+already holding the previous index never see it change.
+"""
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.infrastructure.services import gcs_pool, metrics
+
+logger = logging.getLogger(__name__)
+
+# Optional automaton
+try:
+    import ahocorasick  # type: ignore
+except Exception:  # pragma: no cover - optional
+    ahocorasick = None  # type: ignore
+
+# Incrementar quando a normalização mudar (índices antigos são reconstruídos)
+INDEX_VERSION = 1
+REFRESH_SECONDS = float(os.environ.get("NAME_INDEX_REFRESH", "60"))
+
+IndexKey = Tuple[str, str, bool]  # (bucket, prefixo, recursivo)
+Listing = List[Tuple[str, int]]
+
+
+class PatternMatcher:
+    """Todos os padrões de uma vez sobre um texto; devolve as posições finais dos acertos."""
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns = sorted({p for p in patterns if p}, key=len, reverse=True)
+        self._automaton: Any = None
+        self._regex: Optional[re.Pattern] = None
+        if not self.patterns:
+            return
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for p in self.patterns:
+                self._automaton.add_word(p, p)
+            self._automaton.make_automaton()
+        else:
+            self._regex = re.compile("|".join(map(re.escape, self.patterns)))
+
+    def iter_ends(self, text: str) -> Iterator[int]:
+        """Índice do último caractere de cada ocorrência."""
+        if self._automaton is not None:
+            for end, _ in self._automaton.iter(text):
+                yield end
+        elif self._regex is not None:
+            for m in self._regex.finditer(text):
+                yield m.end() - 1
+
+
+class NameIndex:
+    def __init__(
+        self,
+        key: IndexKey,
+        entries: Optional[Dict[str, Tuple[int, str]]] = None,
+        refreshed_at: float = 0.0,
+    ) -> None:
+        self.key = key
+        self.entries: Dict[str, Tuple[int, str]] = dict(entries or {})
+        self.refreshed_at = refreshed_at
+        self._haystack: Optional[Tuple[str, List[int], List[str]]] = None
+
+    def apply_listing(self, listing: Listing, normalize: Callable[[str], str]) -> int:
+        """Atualiza o índice a partir de uma listagem completa; devolve quantas entradas mudaram."""
+        seen = set()
+        changed = 0
+        for name, generation in listing:
+            seen.add(name)
+            current = self.entries.get(name)
+            if current is None or current[0] != generation:
+                self.entries[name] = (generation, normalize(name))
+                changed += 1
+        removed = [name for name in self.entries if name not in seen]
+        for name in removed:
+            del self.entries[name]
+        changed += len(removed)
+        if changed:
+            self._haystack = None
+        metrics.inc("name_index_changes_total", changed)
+        return changed
+
+    def _joined(self) -> Tuple[str, List[int], List[str]]:
+        """Nomes normalizados unidos por "\\n" + início de cada um (para bisect)."""
+        if self._haystack is None:
+            names = sorted(self.entries)
+            starts: List[int] = []
+            pos = 0
+            for name in names:
+                starts.append(pos)
+                pos += len(self.entries[name][1]) + 1
+            text = "\n".join(self.entries[name][1] for name in names)
+            self._haystack = (text, starts, names)
+        return self._haystack
+
+    def search(self, normalized_patterns: Iterable[str]) -> List[str]:
+        """Nomes cujo texto normalizado contém algum dos padrões (já normalizados)."""
+        patterns = [p for p in normalized_patterns if "\n" not in p]
+        text, starts, names = self._joined()
+        if any(p == "" for p in patterns):
+            return list(names)
+        hits = {names[bisect.bisect_right(starts, end) - 1] for end in PatternMatcher(patterns).iter_ends(text)}
+        return sorted(hits)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "v": INDEX_VERSION,
+            "key": list(self.key),
+            "refreshed_at": self.refreshed_at,
+            "entries": {name: list(value) for name, value in self.entries.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, key: IndexKey, data: Dict[str, Any]) -> Optional["NameIndex"]:
+        if data.get("v") != INDEX_VERSION or tuple(data.get("key") or ()) != key:
+            return None
+        entries = {name: (int(gen), str(norm)) for name, (gen, norm) in data["entries"].items()}
+        return cls(key, entries, float(data.get("refreshed_at", 0.0)))
+
+
+def _file_name(key: IndexKey) -> str:
+    digest = hashlib.sha1(json.dumps(list(key)).encode("utf-8")).hexdigest()
+    return f"name-index-{digest}.json"
+
+
+class IndexStore:
+    """Persistência dos índices (um JSON por chave)."""
+
+    def load(self, key: IndexKey) -> Optional[Dict[str, Any]]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def save(self, key: IndexKey, data: Dict[str, Any]) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+
+class LocalIndexStore(IndexStore):
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def load(self, key: IndexKey) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.root / _file_name(key)).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, key: IndexKey, data: Dict[str, Any]) -> None:
+        path = self.root / _file_name(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+class GcsIndexStore(IndexStore):  # pragma: no cover - runtime only
+    def __init__(self, dir_uri: str) -> None:
+        from src.infrastructure.services.pdf_ocr import parse_gcs_uri
+
+        self.bucket_name, self.prefix = parse_gcs_uri(dir_uri)
+
+    def _blob_name(self, key: IndexKey) -> str:
+        name = _file_name(key)
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def load(self, key: IndexKey) -> Optional[Dict[str, Any]]:
+        blob = gcs_pool.get_client().bucket(self.bucket_name).get_blob(self._blob_name(key))
+        if blob is None:
+            return None
+        return json.loads(blob.download_as_bytes().decode("utf-8"))
+
+    def save(self, key: IndexKey, data: Dict[str, Any]) -> None:
+        blob = gcs_pool.get_client().bucket(self.bucket_name).blob(self._blob_name(key))
+        blob.upload_from_string(json.dumps(data, ensure_ascii=False), content_type="application/json")
+
+
+def store_from_env() -> Optional[IndexStore]:
+    """`NAME_INDEX_DIR`: diretório local ou gs://bucket/prefix; sem ele, só memória."""
+    from src.infrastructure.services.pdf_ocr import is_gcs_uri
+
+    location = os.environ.get("NAME_INDEX_DIR")
+    if not location:
+        return None
+    return GcsIndexStore(location) if is_gcs_uri(location) else LocalIndexStore(location)
+
+
+_indexes: Dict[IndexKey, NameIndex] = {}
+_key_locks: Dict[IndexKey, threading.Lock] = {}
+_indexes_lock = threading.Lock()
+
+
+def _key_lock(key: IndexKey) -> threading.Lock:
+    with _indexes_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def get_index(
+    key: IndexKey,
+    lister: Callable[[], Listing],
+    normalize: Callable[[str], str],
+    store: Optional[IndexStore] = None,
+    refresh_after: float = REFRESH_SECONDS,
+    force: bool = False,
+) -> NameIndex:
+    """Índice atualizado de `key`: memória do processo → `store` → listagem.
+
+    A listagem (`lister`) só é chamada quando o índice tem mais de
+    `refresh_after` segundos (ou com `force`); o resultado é aplicado como delta numa cópia,
+    que substitui o índice anterior. Só chamadas para a mesma `key` esperam
+    pela listagem e pela gravação no `store`.
+    """
+    with _key_lock(key):
+        with _indexes_lock:
+            index = _indexes.get(key)
+        if index is None and store is not None:
+            data = store.load(key)
+            index = NameIndex.from_dict(key, data) if data else None
+        if index is None:
+            index = NameIndex(key)
+        if not force and time.time() - index.refreshed_at < refresh_after:
+            with _indexes_lock:
+                _indexes[key] = index
+            metrics.inc("name_index_queries_total", refreshed="false")
+            return index
+        fresh = NameIndex(key, index.entries, index.refreshed_at)
+        changed = fresh.apply_listing(lister(), normalize)
+        fresh.refreshed_at = time.time()
+        if store is not None and (changed or not fresh.entries):
+            store.save(key, fresh.to_dict())
+        with _indexes_lock:
+            _indexes[key] = fresh
+    metrics.inc("name_index_queries_total", refreshed="true")
+    logger.info(
+        "[name_index] refreshed bucket=%s prefix=%s entries=%d changed=%d",
+        key[0],
+        key[1],
+        len(fresh.entries),
+        changed,
+    )
+    return fresh
+
+
+def _reset_after_fork() -> None:
+    global _indexes_lock
+    _indexes_lock = threading.Lock()
+    _key_locks.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
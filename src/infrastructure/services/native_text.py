@@ -0,0 +1,165 @@
+"""
+Native (embedded) PDF text extraction backends.
+
+`pypdf2` is always available and remains the default. `pdfium` (pypdfium2)
+and `pdfminer` (pdfminer.six) are used when installed; `auto` picks the
+fastest installed one. Every backend returns one string per page, with an
+empty string for pages that fail to extract.
+
+pdfium is not thread-safe, so all pdfium calls in the process go through
+`_pdfium_lock`.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from io import BytesIO
+from typing import Callable, Dict, List
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# Optional backends
+try:
+    import pypdfium2 as pdfium  # type: ignore
+except Exception:  # pragma: no cover - optional
+    pdfium = None  # type: ignore
+
+try:
+    from pdfminer.converter import PDFPageAggregator  # type: ignore
+    from pdfminer.layout import LAParams, LTTextContainer  # type: ignore
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager  # type: ignore
+    from pdfminer.pdfpage import PDFPage  # type: ignore
+except Exception:  # pragma: no cover - optional
+    PDFPage = None  # type: ignore
+
+DEFAULT_BACKEND = "pypdf2"
+AUTO_BACKEND = "auto"
+# Preferência do "auto" (mais rápido primeiro, conforme benchmarks/bench_native_backends.py)
+_AUTO_ORDER = ("pdfium", "pypdf2")
+
+# O pdfium não é thread-safe: um documento por vez no processo
+_pdfium_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _pdfium_lock
+    _pdfium_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _extract_pypdf2(pdf_bytes: bytes) -> List[str]:
+    pages: List[str] = []
+    with BytesIO(pdf_bytes) as bio:
+        reader = PdfReader(bio)
+        for page in reader.pages:
+            try:
+                txt = page.extract_text() or ""
+            except Exception:
+                txt = ""
+            pages.append(txt)
+    return pages
+
+
+def _extract_pdfium(pdf_bytes: bytes) -> List[str]:
+    pages: List[str] = []
+    with _pdfium_lock:
+        doc = pdfium.PdfDocument(pdf_bytes)
+        try:
+            for i in range(len(doc)):
+                page = textpage = None
+                try:
+                    page = doc[i]
+                    textpage = page.get_textpage()
+                    # pdfium separa linhas com \r\n; as heurísticas trabalham com \n
+                    txt = textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+                except Exception:
+                    txt = ""
+                finally:
+                    if textpage is not None:
+                        textpage.close()
+                    if page is not None:
+                        page.close()
+                pages.append(txt)
+        finally:
+            doc.close()
+    return pages
+
+
+def _extract_pdfminer(pdf_bytes: bytes) -> List[str]:
+    pages: List[str] = []
+    with BytesIO(pdf_bytes) as bio:
+        # A árvore de páginas é lida antes; o layout de cada página é isolado
+        # (o gerador `extract_pages` abortaria o documento no primeiro erro)
+        pdf_pages = list(PDFPage.get_pages(bio))
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for pdf_page in pdf_pages:
+            try:
+                interpreter.process_page(pdf_page)
+                layout = device.get_result()
+                txt = "".join(
+                    el.get_text() for el in layout if isinstance(el, LTTextContainer)
+                )
+            except Exception:
+                txt = ""
+            pages.append(txt)
+    return pages
+
+
+BACKENDS: Dict[str, Callable[[bytes], List[str]]] = {
+    "pypdf2": _extract_pypdf2,
+    "pdfium": _extract_pdfium,
+    "pdfminer": _extract_pdfminer,
+}
+
+_INSTALL_HINTS = {
+    "pdfium": "pypdfium2",
+    "pdfminer": "pdfminer.six",
+}
+
+
+def is_available(name: str) -> bool:
+    if name == "pdfium":
+        return pdfium is not None
+    if name == "pdfminer":
+        return PDFPage is not None
+    return name in BACKENDS
+
+
+def available_backends() -> List[str]:
+    return [name for name in BACKENDS if is_available(name)]
+
+
+def resolve_backend(name: str) -> str:
+    """Nome efetivo do backend (`auto` → primeiro instalado de `_AUTO_ORDER`).
+
+    Levanta ValueError para nomes desconhecidos e RuntimeError quando o
+    backend pedido não está instalado.
+    """
+    if name == AUTO_BACKEND:
+        return next(n for n in _AUTO_ORDER if is_available(n))
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Backend de texto nativo desconhecido: {name!r} "
+            f"(opções: {', '.join([AUTO_BACKEND, *BACKENDS])})"
+        )
+    if not is_available(name):
+        raise RuntimeError(
+            f"Backend {name!r} não instalado. pip install {_INSTALL_HINTS[name]}"
+        )
+    return name
+
+
+def extract_pages_text(pdf_bytes: bytes, backend: str = DEFAULT_BACKEND) -> List[str]:
+    """Texto nativo de cada página usando `backend`."""
+    name = resolve_backend(backend)
+    pages = BACKENDS[name](pdf_bytes)
+    logger.debug("[native_text] backend=%s pages=%d", name, len(pages))
+    return pages
@@ -0,0 +1,291 @@
+"""
+OCR engines behind a single page API.
+
+`tesserocr` keeps initialized Tesseract instances (traineddata already loaded)
+pooled per process and recognizes in-process; `pytesseract` spawns the
+`tesseract` binary per page and remains the fallback. `OCR_ENGINE` selects
+`auto` (tesserocr when installed), `tesserocr` or `pytesseract`.
+
+`image_to_text_conf` also returns the mean word confidence (0-100) of the
+same recognition, used by the adaptive DPI mode.
+
+Each process keeps at most `OCR_ENGINE_MAX_INSTANCES` Tesseract instances
+(default: the OCR pool size); past that, recognitions wait for a free
+instance and idle instances of other configurations are closed to make room.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shlex
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from src.infrastructure.services import metrics, ocr_pool
+
+logger = logging.getLogger(__name__)
+
+# Optional in-process engine
+try:
+    import tesserocr  # type: ignore
+except Exception:  # pragma: no cover - optional
+    tesserocr = None  # type: ignore
+
+ENGINES = ("auto", "tesserocr", "pytesseract")
+
+_EngineKey = Tuple[str, int, Tuple[Tuple[str, str], ...]]
+
+
+def parse_config(lang: Optional[str], config: str) -> Tuple[str, int, int, Dict[str, str]]:
+    """Converte os argumentos do pytesseract em (lang, oem, psm, variáveis).
+
+    Mesmos defaults do binário: lang "eng", oem 3 (default) e psm 3 (auto).
+    """
+    out_lang, oem, psm = lang or "eng", 3, 3
+    variables: Dict[str, str] = {}
+    tokens = shlex.split(config or "")
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if tok == "-l":
+            out_lang, i = nxt, i + 2
+        elif tok == "--oem":
+            oem, i = int(nxt), i + 2
+        elif tok == "--psm":
+            psm, i = int(nxt), i + 2
+        elif tok == "-c":
+            name, _, value = nxt.partition("=")
+            variables[name] = value
+            i += 2
+        else:
+            i += 1
+    return out_lang, oem, psm, variables
+
+
+class OcrEngine:
+    """Interface: texto de uma imagem com a mesma assinatura do pytesseract."""
+
+    name = ""
+
+    def image_to_string(self, image: Any, **ocr_kw: Any) -> str:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def image_to_text_conf(self, image: Any, **ocr_kw: Any) -> Tuple[str, float]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+
+def _mean_conf(confs: List[float]) -> float:
+    """Confiança média das palavras; 0 quando nada foi reconhecido."""
+    return sum(confs) / len(confs) if confs else 0.0
+
+
+def text_from_data(data: Dict[str, List[Any]]) -> Tuple[str, float]:
+    """Texto e confiança média a partir da saída `Output.DICT` do `image_to_data`.
+
+    Palavras da mesma linha são unidas por espaço, linhas por quebra de linha e
+    parágrafos por linha em branco, como no `image_to_string`.
+    """
+    paragraphs: Dict[Tuple[int, int], Dict[int, List[str]]] = {}
+    confs: List[float] = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not str(word).strip():
+            continue
+        confs.append(conf)
+        par = paragraphs.setdefault((data["block_num"][i], data["par_num"][i]), {})
+        par.setdefault(data["line_num"][i], []).append(str(word))
+    text = "\n\n".join(
+        "\n".join(" ".join(words) for words in lines.values()) for lines in paragraphs.values()
+    )
+    return text, _mean_conf(confs)
+
+
+class PytesseractEngine(OcrEngine):
+    """Um processo `tesseract` por página (comportamento original)."""
+
+    name = "pytesseract"
+
+    def image_to_string(self, image: Any, **ocr_kw: Any) -> str:
+        return pytesseract.image_to_string(image, **ocr_kw)
+
+    def image_to_text_conf(self, image: Any, **ocr_kw: Any) -> Tuple[str, float]:
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, **ocr_kw)
+        return text_from_data(data)
+
+
+def max_instances() -> int:
+    env = os.environ.get("OCR_ENGINE_MAX_INSTANCES")
+    return max(1, int(env)) if env else ocr_pool.pool_size()
+
+
+class TesserocrEngine(OcrEngine):
+    """Instâncias `PyTessBaseAPI` reaproveitadas por (lang, oem, variáveis).
+
+    Cada instância atende uma página por vez. No máximo `max_instances`
+    existem ao mesmo tempo: chamadas além disso esperam uma instância livre, e
+    uma configuração nova fecha uma instância ociosa de outra para abrir a sua.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, limit: Optional[int] = None) -> None:
+        self.limit = limit or max_instances()
+        self._idle: Dict[_EngineKey, List[Any]] = {}
+        self._live = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.limit)
+
+    def _acquire(self, key: _EngineKey) -> Any:
+        self._slots.acquire()
+        try:
+            return self._take(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _take(self, key: _EngineKey) -> Any:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+            # Com a vaga garantida, atingir o limite implica instância ociosa de outra chave
+            victim = None
+            if self._live >= self.limit:
+                other = next(k for k, apis in self._idle.items() if apis)
+                victim = self._idle[other].pop()
+                self._live -= 1
+            self._live += 1
+        if victim is not None:
+            victim.End()
+            metrics.inc("ocr_engine_instances_closed_total", engine=self.name)
+        lang, oem, variables = key
+        kwargs: Dict[str, Any] = {"lang": lang, "oem": oem}
+        if os.environ.get("TESSDATA_PREFIX"):
+            kwargs["path"] = os.environ["TESSDATA_PREFIX"]
+        api = None
+        try:
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            for name, value in variables:
+                api.SetVariable(name, value)
+        except BaseException:
+            if api is not None:
+                api.End()
+            with self._lock:
+                self._live -= 1
+            raise
+        metrics.inc("ocr_engine_instances_created_total", engine=self.name)
+        logger.info("[ocr_engine] tesserocr instance created lang=%s oem=%d pid=%d", lang, oem, os.getpid())
+        return api
+
+    def _release(self, key: _EngineKey, api: Any) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(api)
+        self._slots.release()
+
+    def image_to_string(self, image: Any, **ocr_kw: Any) -> str:
+        return self._recognize(image, ocr_kw, with_conf=False)[0]
+
+    def image_to_text_conf(self, image: Any, **ocr_kw: Any) -> Tuple[str, float]:
+        return self._recognize(image, ocr_kw, with_conf=True)
+
+    def _recognize(self, image: Any, ocr_kw: Dict[str, Any], with_conf: bool) -> Tuple[str, float]:
+        lang, oem, psm, variables = parse_config(ocr_kw.get("lang"), ocr_kw.get("config", ""))
+        key = (lang, oem, tuple(sorted(variables.items())))
+        api = self._acquire(key)
+        try:
+            api.SetPageSegMode(psm)
+            if isinstance(image, np.ndarray) and image.ndim == 2 and image.dtype == np.uint8:
+                # Cinza 8 bits: bytes direto para o Tesseract, sem passar por PIL
+                height, width = image.shape
+                api.SetImageBytes(np.ascontiguousarray(image).tobytes(), width, height, 1, width)
+            else:
+                if isinstance(image, np.ndarray):
+                    image = Image.fromarray(image)
+                api.SetImage(image)
+            text = api.GetUTF8Text()
+            # Confianças vêm do mesmo reconhecimento, sem rodar o Tesseract de novo
+            return text, _mean_conf(list(api.AllWordConfidences())) if with_conf else 0.0
+        finally:
+            api.Clear()
+            self._release(key, api)
+
+    def close(self) -> None:
+        with self._lock:
+            for apis in self._idle.values():
+                for api in apis:
+                    api.End()
+                self._live -= len(apis)
+            self._idle.clear()
+
+
+_engines: Dict[str, OcrEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _engines_lock
+    # Instâncias do Tesseract não são compartilhadas entre processos
+    _engines.clear()
+    _engines_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def resolve_engine(name: Optional[str] = None) -> str:
+    """Nome efetivo do engine (`OCR_ENGINE`, padrão auto).
+
+    Levanta ValueError para nomes desconhecidos e RuntimeError quando o
+    tesserocr é pedido explicitamente sem estar instalado.
+    """
+    name = name or os.environ.get("OCR_ENGINE", "auto")
+    if name not in ENGINES:
+        raise ValueError(f"Engine de OCR desconhecido: {name!r} (opções: {', '.join(ENGINES)})")
+    if name == "auto":
+        return "tesserocr" if tesserocr is not None else "pytesseract"
+    if name == "tesserocr" and tesserocr is None:
+        raise RuntimeError("tesserocr não instalado. pip install tesserocr")
+    return name
+
+
+def get_engine(name: Optional[str] = None) -> OcrEngine:
+    """Engine do processo atual (instâncias e pools são criados uma vez por processo)."""
+    resolved = resolve_engine(name)
+    with _engines_lock:
+        engine = _engines.get(resolved)
+        if engine is None:
+            engine = TesserocrEngine() if resolved == "tesserocr" else PytesseractEngine()
+            _engines[resolved] = engine
+        return engine
+
+
+def _run(method: str, image: Any, ocr_kw: Dict[str, Any]) -> Any:
+    """Chama `method` no engine configurado; cai no pytesseract se o engine falhar."""
+    engine = get_engine()
+    try:
+        out = getattr(engine, method)(image, **ocr_kw)
+    except Exception:
+        if engine.name == PytesseractEngine.name:
+            raise
+        logger.exception("[ocr_engine] %s failed, falling back to pytesseract", engine.name)
+        metrics.inc("ocr_engine_fallbacks_total", engine=engine.name)
+        engine = get_engine("pytesseract")
+        out = getattr(engine, method)(image, **ocr_kw)
+    metrics.inc("ocr_engine_pages_total", engine=engine.name)
+    return out
+
+
+def image_to_string(image: Any, **ocr_kw: Any) -> str:
+    """OCR de uma página pelo engine configurado."""
+    return _run("image_to_string", image, ocr_kw)
+
+
+def image_to_text_conf(image: Any, **ocr_kw: Any) -> Tuple[str, float]:
+    """OCR de uma página e confiança média (0-100) das palavras reconhecidas."""
+    return _run("image_to_text_conf", image, ocr_kw)
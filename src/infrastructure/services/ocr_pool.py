@@ -0,0 +1,258 @@
+"""
+Resource-aware process pool for CPU-bound page work (rasterized OCR).
+
+One pool per HTTP worker process, sized so that all workers together use
+about one OCR process per physical core: `physical_cores // WEB_CONCURRENCY`
+(or `OCR_POOL_SIZE`). Pool processes run with OpenMP/OpenCV limited to one
+thread, so Tesseract and cv2 do not oversubscribe the cores either.
+
+OCR that runs inline in the HTTP process (`run_inline`) takes a slot from the
+same per-process budget, so concurrent request threads never run more OCR at
+once than the pool size, and applies the same one-thread limits to that
+process (and to the `tesseract` subprocesses it spawns). A pool broken by a crashed worker is replaced, and
+the tasks it lost are retried once on the new pool.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.infrastructure.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Variáveis lidas pelo OpenMP (Tesseract) e BLAS nos processos do pool
+_THREAD_ENV = {
+    "OMP_THREAD_LIMIT": "1",
+    "OMP_NUM_THREADS": "1",
+    "OPENBLAS_NUM_THREADS": "1",
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_size = 0
+_lock = threading.Lock()
+_inflight = 0
+# Vagas de OCR do processo (pool + chamadas inline), criadas com o primeiro pool
+_slots: Optional[threading.BoundedSemaphore] = None
+# Limites de threads já aplicados ao processo HTTP (OCR inline)
+_inline_limited = False
+
+
+def physical_cores() -> int:
+    """Núcleos físicos disponíveis (sem hyper-threading), limitados pela afinidade."""
+    cores: Set[tuple] = set()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as fh:
+            phys = core = None
+            for line in fh:
+                if line.startswith("physical id"):
+                    phys = line.split(":", 1)[1].strip()
+                elif line.startswith("core id"):
+                    core = line.split(":", 1)[1].strip()
+                elif not line.strip():
+                    if core is not None:
+                        cores.add((phys, core))
+                    phys = core = None
+            if core is not None:
+                cores.add((phys, core))
+    except OSError:
+        pass
+    logical = os.cpu_count() or 1
+    if hasattr(os, "sched_getaffinity"):
+        logical = len(os.sched_getaffinity(0)) or logical
+    return max(1, min(len(cores) or logical, logical))
+
+
+def pool_size() -> int:
+    env = os.environ.get("OCR_POOL_SIZE")
+    if env:
+        return max(1, int(env))
+    http_workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+    return max(1, physical_cores() // http_workers)
+
+
+def _apply_thread_limits() -> None:
+    # O subprocesso do tesseract herda o ambiente; o cv2 vale para o processo todo
+    os.environ.update(_THREAD_ENV)
+    try:
+        import cv2
+
+        cv2.setNumThreads(1)
+    except Exception:  # pragma: no cover - cv2 ausente
+        pass
+
+
+def _limit_threads() -> None:
+    _apply_thread_limits()
+    # Descarta contadores herdados do processo pai no fork (senão voltariam em dobro)
+    metrics.drain_counters()
+
+
+def _run_limited(fn: Callable[[Any], Any], item: Any) -> Tuple[Any, Dict[Any, float]]:
+    # Reaplicado por tarefa: o subprocesso do tesseract herda o ambiente atual
+    os.environ.update(_THREAD_ENV)
+    result = fn(item)
+    # Contadores gravados pela tarefa (ex.: tempos de pré-processamento) voltam
+    # junto com o resultado e são somados no registro do processo HTTP
+    return result, metrics.drain_counters()
+
+
+def _reset_after_fork() -> None:
+    global _pool, _pool_pid, _lock, _inflight, _slots, _inline_limited
+    _pool = None
+    _pool_pid = None
+    _lock = threading.Lock()
+    _inflight = 0
+    _slots = None
+    _inline_limited = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Pool do processo atual, criado sob demanda (e de novo após fork ou quebra)."""
+    global _pool, _pool_pid, _pool_size
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool_size = pool_size()
+            _pool = ProcessPoolExecutor(max_workers=_pool_size, initializer=_limit_threads)
+            _pool_pid = os.getpid()
+            metrics.set_gauge("ocr_pool_size", _pool_size)
+            logger.info("[ocr_pool] started size=%d pid=%d", _pool_size, _pool_pid)
+        return _pool
+
+
+def _discard(pool: ProcessPoolExecutor) -> None:
+    """Descarta um pool quebrado; o próximo `get_pool` cria outro."""
+    global _pool
+    with _lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    metrics.inc("ocr_pool_restarts_total")
+    logger.warning("[ocr_pool] broken pool discarded pid=%d", os.getpid())
+    pool.shutdown(wait=False)
+
+
+def _get_slots() -> threading.BoundedSemaphore:
+    global _slots, _pool_size
+    with _lock:
+        if _slots is None:
+            _pool_size = _pool_size or pool_size()
+            _slots = threading.BoundedSemaphore(_pool_size)
+        return _slots
+
+
+def _track(delta: int) -> None:
+    global _inflight
+    with _lock:
+        _inflight += delta
+        inflight = _inflight
+    metrics.set_gauge("ocr_pool_inflight", inflight)
+    metrics.set_gauge("ocr_pool_queue_depth", max(0, inflight - _pool_size))
+
+
+def run_inline(fn: Callable[[Any], Any], item: Any) -> Any:
+    """Executa `fn(item)` no próprio processo, ocupando uma vaga do orçamento de OCR.
+
+    Na primeira chamada, limita o processo a uma thread de OpenMP/BLAS/cv2 como
+    os processos do pool: as vagas já dão o paralelismo entre páginas.
+    """
+    global _inline_limited
+    if not _inline_limited:
+        _apply_thread_limits()
+        _inline_limited = True
+    slots = _get_slots()
+    _track(+1)
+    with slots:
+        try:
+            return fn(item)
+        finally:
+            _track(-1)
+
+
+def submit(fn: Callable[[Any], Any], item: Any, retries: int = 1) -> Future:
+    """Envia `fn(item)` ao pool; o Future devolvido resolve para o resultado de `fn`.
+
+    Bloqueia enquanto todas as vagas do processo estiverem ocupadas. Se o pool
+    quebrar (processo do pool morto), ele é recriado e a tarefa reenviada até
+    `retries` vezes; depois disso só esta tarefa falha.
+    """
+    slots = _get_slots()
+    slots.acquire()
+    _track(+1)
+    metrics.inc("ocr_pool_tasks_total")
+    out: Future = Future()
+
+    def _finish(result: Any = None, exc: Optional[BaseException] = None) -> None:
+        _track(-1)
+        slots.release()
+        if exc is not None:
+            out.set_exception(exc)
+        else:
+            out.set_result(result)
+
+    def _send(attempts_left: int) -> None:
+        pool = get_pool()
+        try:
+            fut = pool.submit(_run_limited, fn, item)
+        except BrokenProcessPool as exc:
+            _retry(pool, exc, attempts_left)
+            return
+        except BaseException as exc:
+            _finish(exc=exc)
+            return
+        fut.add_done_callback(lambda f: _done(pool, f, attempts_left))
+
+    def _retry(pool: ProcessPoolExecutor, exc: BaseException, attempts_left: int) -> None:
+        _discard(pool)
+        if attempts_left > 0:
+            _send(attempts_left - 1)
+        else:
+            _finish(exc=exc)
+
+    def _done(pool: ProcessPoolExecutor, fut: Future, attempts_left: int) -> None:
+        try:
+            result, counters = fut.result()
+        except BrokenProcessPool as exc:
+            _retry(pool, exc, attempts_left)
+            return
+        except BaseException as exc:
+            _finish(exc=exc)
+            return
+        metrics.merge_counters(counters)
+        _finish(result)
+
+    _send(retries)
+    return out
+
+
+def map_ordered(
+    fn: Callable[[Any], Any], items: Iterable[Any], max_in_flight: Optional[int] = None
+) -> List[Any]:
+    """Aplica `fn` no pool e devolve os resultados na ordem de `items`.
+
+    `max_in_flight` limita quantas tarefas desta chamada ficam na fila ao mesmo
+    tempo, para que uma requisição grande não monopolize o pool.
+    """
+    items = list(items)
+    get_pool()
+    limit = max(1, max_in_flight or _pool_size)
+    results: List[Any] = [None] * len(items)
+    pending: dict = {}
+    for idx, item in enumerate(items):
+        while len(pending) >= limit:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in done:
+                results[pending.pop(fut)] = fut.result()
+        pending[submit(fn, item)] = idx
+    for fut in list(pending):
+        results[pending.pop(fut)] = fut.result()
+    return results
@@ -4,30 +4,65 @@ Includes native text extraction and OCR fallback with heuristics.
 """
 from __future__ import annotations
 
+import hashlib
+import heapq
 import os
 import re
-from io import BytesIO
-from typing import Iterable, List, Tuple, Optional
+import subprocess
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Optional
 from pathlib import Path
 import unicodedata
 
-from PyPDF2 import PdfReader
-
 # OCR stack
 import numpy as np
 import cv2
-import pytesseract
 from PIL import Image
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
 import logging
 
+from src.infrastructure.services import (
+    gcs_listing,
+    gcs_pool,
+    metrics,
+    name_index,
+    native_text,
+    ocr_engine,
+    ocr_pool,
+    pdf_regions,
+)
+from src.infrastructure.services.text_cache import (
+    TextCache,
+    bytes_fingerprint,
+    cache_key,
+    open_text_cache,
+)
+
 logger = logging.getLogger(__name__)
 
-# Optional GCS
-try:
-    from google.cloud import storage  # type: ignore
-except Exception:  # pragma: no cover - optional
-    storage = None  # type: ignore
+# Etapas do pipeline medidas em `pdf_stage_seconds{stage}`:
+# list, download, native, decision, rasterize, preprocess, ocr_page, upload
+STAGE_METRIC = "pdf_stage_seconds"
+
+
+def stage_timer(stage: str) -> ContextManager[None]:
+    """Mede a duração de uma etapa do pipeline (histograma `pdf_stage_seconds`)."""
+    return metrics.timer(STAGE_METRIC, stage=stage)
+
+
+def _count_file(mode: str, ocr_pages: int, native_pages: int) -> None:
+    """Contadores de vazão por arquivo extraído e razão de arquivos com OCR forçado."""
+    metrics.inc("pdf_files_total", mode=mode)
+    metrics.inc("pdf_pages_total", ocr_pages, path="ocr")
+    metrics.inc("pdf_pages_total", native_pages, path="native")
+    files = {m: metrics.get("pdf_files_total", mode=m) for m in ("ocr", "native", "hybrid")}
+    metrics.set_gauge("pdf_ocr_forced_ratio", files["ocr"] / max(1.0, sum(files.values())))
 
 
 def is_gcs_uri(s: str) -> bool:
@@ -44,35 +79,88 @@ def parse_gcs_uri(uri: str) -> Tuple[str, str]:
 
 
 def gcs_client():  # pragma: no cover - runtime only
-    if storage is None:
-        raise RuntimeError(
-            "google-cloud-storage não instalado. pip install google-cloud-storage"
-        )
-    return storage.Client()
+    # Cliente único por processo (pool HTTP, recriado após fork)
+    return gcs_pool.get_client()
+
+
+# Lookups de metadados em paralelo para `file_names`
+GCS_LOOKUP_WORKERS = 16
 
 
-def gcs_list_pdfs(dir_uri: str, recursive: bool = True, file_names: Optional[List[str]] = None) -> List[str]:  # pragma: no cover
+def _gcs_list_pdf_blobs(
+    bucket_name: str, prefix: str, recursive: bool, use_cache: bool = True
+) -> List[Tuple[str, int]]:
+    """(nome, generation) dos PDFs sob o prefixo, via cache de listagem (`gcs_listing`).
+
+    Sem recursão, o delimitador "/" faz o próprio GCS devolver só o nível do
+    prefixo; a projeção de campos traz apenas nome e generation de cada objeto.
+    `use_cache=False` lista de novo (e atualiza o cache).
+    """
+    key = (bucket_name, prefix + "/" if prefix else "", recursive)
+    cache = gcs_listing.get_cache()
+    listing = cache.get(key) if use_cache else None
+    if listing is not None:
+        return listing
+    list_kw: Dict[str, Any] = {"prefix": key[1], "fields": "items(name,generation),nextPageToken"}
+    if not recursive:
+        list_kw["delimiter"] = "/"
+    listing = [
+        (b.name, b.generation)
+        for b in gcs_client().list_blobs(bucket_name, **list_kw)
+        if b.name.lower().endswith(".pdf")
+    ]
+    metrics.inc("gcs_list_requests_total")
+    cache.put(key, listing)
+    return listing
+
+
+def _gcs_lookup_names(bucket_name: str, prefix: str, names: List[str]) -> Dict[str, Optional[str]]:
+    """`{nome: chave do blob ou None}` para `prefix/nome`, com lookups diretos em paralelo."""
+    bucket = gcs_client().bucket(bucket_name)
+    cache = gcs_listing.get_cache()
+
+    def lookup(name: str) -> Tuple[str, Optional[str]]:
+        key = f"{prefix}/{name}" if prefix else name
+        blob = bucket.get_blob(key)
+        cache.observe(bucket_name, key, blob.generation if blob is not None else None)
+        return name, key if blob is not None else None
+
+    metrics.inc("gcs_lookup_requests_total", len(names))
+    with ThreadPoolExecutor(max_workers=max(1, min(GCS_LOOKUP_WORKERS, len(names)))) as ex:
+        return dict(ex.map(lookup, names))
+
+
+def gcs_list_pdfs(dir_uri: str, recursive: bool = True, file_names: Optional[List[str]] = None) -> List[str]:
+    """PDFs sob `dir_uri`; com `file_names`, lookup direto de cada nome antes da listagem recursiva.
+
+    Com `file_names`, o resultado segue a ordem dos nomes. Um nome encontrado em
+    `dir_uri/nome` não é procurado nas subpastas; os demais trazem todas as
+    cópias de mesmo nome nas subpastas, na ordem da listagem.
+    """
     bucket_name, prefix = parse_gcs_uri(dir_uri)
-    client = gcs_client()
-    bucket = client.bucket(bucket_name)
-    blobs = client.list_blobs(bucket, prefix=(prefix + "/" if prefix else ""))
-    pdfs: List[str] = []
-    base_depth = 0 if not prefix else prefix.count("/") + 1
-    for b in blobs:
-        if not b.name.lower().endswith(".pdf"):
-            continue
-        if not recursive and b.name.count("/") != base_depth:
-            continue
-        pdfs.append(f"gs://{bucket_name}/{b.name}")
     if file_names:
-        wanted = set(file_names)
-        before = len(pdfs)
-        pdfs = [p for p in pdfs if os.path.basename(p) in wanted]
+        names = [n for n in dict.fromkeys(file_names) if n.lower().endswith(".pdf")]
+        found = _gcs_lookup_names(bucket_name, prefix, names) if names else {}
+        missing = {n for n in names if found[n] is None}
+        nested: Dict[str, List[str]] = {}
+        if missing and recursive:
+            for name, _ in _gcs_list_pdf_blobs(bucket_name, prefix, recursive=True):
+                if os.path.basename(name) in missing:
+                    nested.setdefault(os.path.basename(name), []).append(f"gs://{bucket_name}/{name}")
+        pdfs = [
+            uri
+            for n in names
+            for uri in ([f"gs://{bucket_name}/{found[n]}"] if found[n] is not None else nested.get(n, []))
+        ]
         logger.info(
-            "[pdf_ocr] gcs_list_pdfs filtered by names before=%d after=%d",
-            before,
+            "[pdf_ocr] gcs_list_pdfs by names dir=%s requested=%d direct=%d count=%d",
+            dir_uri,
+            len(file_names),
+            len(names) - len(missing),
             len(pdfs),
         )
+        return pdfs
+    pdfs = [f"gs://{bucket_name}/{name}" for name, _ in _gcs_list_pdf_blobs(bucket_name, prefix, recursive)]
     logger.info("[pdf_ocr] gcs_list_pdfs dir=%s recursive=%s count=%d", dir_uri, recursive, len(pdfs))
     return pdfs
 
@@ -81,7 +169,67 @@ def gcs_read_bytes(gs_path: str) -> bytes:  # pragma: no cover - runtime only
     bucket_name, key = parse_gcs_uri(gs_path)
     client = gcs_client()
     blob = client.bucket(bucket_name).blob(key)
-    return blob.download_as_bytes()
+    try:
+        return blob.download_as_bytes()
+    except Exception:
+        # Objeto listado que não pode ser lido (ex.: removido): a listagem está velha
+        gcs_listing.get_cache().invalidate(bucket_name, key)
+        raise
+
+
+def _generation_fingerprint(bucket_name: str, key: str, generation: int) -> str:
+    return f"gen:{bucket_name}/{key}#{generation}"
+
+
+def gcs_blob_fingerprint(gs_path: str) -> Optional[str]:  # pragma: no cover - runtime only
+    """Identidade do conteúdo do blob sem baixá-lo: md5 (ou generation, se não houver md5)."""
+    bucket_name, key = parse_gcs_uri(gs_path)
+    blob = gcs_client().bucket(bucket_name).get_blob(key)
+    gcs_listing.get_cache().observe(bucket_name, key, blob.generation if blob is not None else None)
+    if blob is None:
+        return None
+    if blob.md5_hash:
+        return f"md5:{blob.md5_hash}"
+    return _generation_fingerprint(bucket_name, key, blob.generation)
+
+
+def _gcs_generation_lookup(gs_path: str) -> Optional[str]:
+    bucket_name, key = parse_gcs_uri(gs_path)
+    blob = gcs_client().bucket(bucket_name).get_blob(key)
+    gcs_listing.get_cache().observe(bucket_name, key, blob.generation if blob is not None else None)
+    return _generation_fingerprint(bucket_name, key, blob.generation) if blob is not None else None
+
+
+def gcs_generation_fingerprints(gs_paths: List[str]) -> Dict[str, Optional[str]]:
+    """Fingerprint por generation de vários blobs (None para os que não existem).
+
+    Usa a generation das listagens em cache (a da busca que acabou de listar o
+    prefixo); só os caminhos fora delas pedem metadados, em paralelo.
+    """
+    cache = gcs_listing.get_cache()
+    out: Dict[str, Optional[str]] = {}
+    unlisted: List[str] = []
+    for gs_path in gs_paths:
+        bucket_name, key = parse_gcs_uri(gs_path)
+        generation = cache.generation(bucket_name, key)
+        if generation is None:
+            unlisted.append(gs_path)
+        else:
+            out[gs_path] = _generation_fingerprint(bucket_name, key, generation)
+    if unlisted:
+        metrics.inc("gcs_lookup_requests_total", len(unlisted))
+        with ThreadPoolExecutor(max_workers=max(1, min(GCS_LOOKUP_WORKERS, len(unlisted)))) as ex:
+            out.update(zip(unlisted, ex.map(_gcs_generation_lookup, unlisted)))
+    return out
+
+
+def gcs_read_text(gs_path: str) -> Optional[str]:  # pragma: no cover - runtime only
+    """Conteúdo UTF-8 do blob, ou None se ele não existir."""
+    bucket_name, key = parse_gcs_uri(gs_path)
+    blob = gcs_client().bucket(bucket_name).get_blob(key)
+    if blob is None:
+        return None
+    return blob.download_as_bytes().decode("utf-8")
 
 
 def gcs_write_text(dir_uri: str, filename: str, text: str) -> str:  # pragma: no cover
@@ -89,7 +237,10 @@ def gcs_write_text(dir_uri: str, filename: str, text: str) -> str:  # pragma: no
     client = gcs_client()
     out_key = f"{prefix}/{filename}" if prefix else filename
     blob = client.bucket(bucket_name).blob(out_key)
-    blob.upload_from_string(text, content_type="text/plain; charset=utf-8")
+    with stage_timer("upload"):
+        blob.upload_from_string(text, content_type="text/plain; charset=utf-8")
+    metrics.inc("pdf_upload_bytes_total", len((text or "").encode("utf-8")))
+    gcs_listing.get_cache().invalidate(bucket_name, out_key)
     uri = f"gs://{bucket_name}/{out_key}"
     logger.info("[pdf_ocr] gcs_write_text uri=%s size=%d", uri, len(text or ""))
     return uri
@@ -102,21 +253,37 @@ def _strip_accents_lower(s: str) -> str:
     return unicodedata.normalize("NFKD", s).encode("ASCII", "ignore").decode().lower()
 
 
-def find_pdfs_by_patterns(root_dir: str, patterns: List[str], recursive: bool = True) -> List[str]:
+def find_pdfs_by_patterns(
+    root_dir: str, patterns: List[str], recursive: bool = True, refresh: bool = False
+) -> List[str]:
     """Retorna URIs/paths de PDFs cujo nome contém algum dos padrões (case/acento-insensitive).
 
     - Suporta gs://bucket/prefix (GCS) e diretórios locais.
     - Em produção usamos GCS; o modo local é útil para testes/scripts.
+    - No GCS, `refresh=True` (ou uma busca sem resultados) lista o prefixo de novo
+      em vez de usar o índice de nomes e a listagem em cache.
     """
     norm_patterns = [_strip_accents_lower(p or "") for p in patterns or []]
 
     if is_gcs_uri(root_dir):
-        candidates = gcs_list_pdfs(root_dir, recursive=recursive)
-        hits: List[str] = []
-        for uri in candidates:
-            name_norm = _strip_accents_lower(Path(uri).stem)
-            if any(pat in name_norm for pat in norm_patterns):
-                hits.append(uri)
+        # Índice persistente de nomes normalizados, atualizado por diff da listagem
+        bucket_name, prefix = parse_gcs_uri(root_dir)
+
+        def search(force: bool) -> List[str]:
+            index = name_index.get_index(
+                (bucket_name, prefix, recursive),
+                lister=lambda: _gcs_list_pdf_blobs(bucket_name, prefix, recursive, use_cache=not force),
+                normalize=lambda name: _strip_accents_lower(Path(name).stem),
+                store=name_index.store_from_env(),
+                force=force,
+            )
+            return index.search(norm_patterns)
+
+        names = search(refresh)
+        if not names and not refresh:
+            # O índice pode ser anterior ao upload do PDF procurado
+            names = search(True)
+        hits = [f"gs://{bucket_name}/{name}" for name in names]
         hits.sort(key=lambda x: _strip_accents_lower(Path(x).name))
         logger.info("[pdf_ocr] patterns filter dir=%s patterns=%s matched=%d", root_dir, patterns, len(hits))
         return hits
@@ -137,23 +304,22 @@ def find_pdfs_by_patterns(root_dir: str, patterns: List[str], recursive: bool =
 
 
 def load_pdf_bytes(identifier: str) -> bytes:
-    if is_gcs_uri(identifier):
-        return gcs_read_bytes(identifier)
-    with open(identifier, "rb") as f:
-        return f.read()
+    with stage_timer("download"):
+        if is_gcs_uri(identifier):
+            data = gcs_read_bytes(identifier)
+        else:
+            with open(identifier, "rb") as f:
+                data = f.read()
+    metrics.inc("pdf_download_bytes_total", len(data))
+    return data
 
 
-def extract_native_per_page_from_bytes(pdf_bytes: bytes) -> List[str]:
-    pages: List[str] = []
-    with BytesIO(pdf_bytes) as bio:
-        reader = PdfReader(bio)
-        for page in reader.pages:
-            try:
-                txt = page.extract_text() or ""
-            except Exception:
-                txt = ""
-            pages.append(txt)
-    return pages
+def extract_native_per_page_from_bytes(
+    pdf_bytes: bytes, backend: str = native_text.DEFAULT_BACKEND
+) -> List[str]:
+    """Texto embutido de cada página (`backend`: pypdf2, pdfium, pdfminer ou auto)."""
+    with stage_timer("native"):
+        return native_text.extract_pages_text(pdf_bytes, backend=backend)
 
 
 # -----------------------------
@@ -164,49 +330,97 @@ def tokenize(text: str) -> List[str]:
 
 
 def avg_tokens_per_page(pages: Iterable[str]) -> float:
-    counts = [len(tokenize(p or "")) for p in pages]
+    counts = [len(_TOKEN_RE.findall(p or "")) for p in pages]
     if not counts:
         return 0.0
     return sum(counts) / max(1, len(counts))
 
 
+_LONG_ID_RE = re.compile(r"\b([A-Z0-9]{16,})\b")
+_PAGE_MARK_RE = re.compile(r"\bP(?:ag\.?|ágina)\s*\d+\s*/\s*\d+\b", flags=re.I)
+
+
 def normalize_line(s: str) -> str:
-    s = re.sub(r"\s+", " ", s.strip())
-    s = re.sub(r"\b([A-Z0-9]{16,})\b", "", s)
-    s = re.sub(r"\bP(?:ag\.?|ágina)\s*\d+\s*/\s*\d+\b", "", s, flags=re.I)
+    # split()/join equivale a re.sub(r"\s+", " ", s.strip()) (mesmo conjunto de espaços)
+    s = " ".join(s.split())
+    s = _LONG_ID_RE.sub("", s)
+    s = _PAGE_MARK_RE.sub("", s)
     return s.strip()
 
 
+def _page_lines(page: str, min_line_len: int) -> List[str]:
+    """Linhas normalizadas da página com tamanho >= `min_line_len`.
+
+    A normalização nunca aumenta a linha, então linhas brutas curtas são
+    descartadas antes de passar pelas regexes.
+    """
+    out: List[str] = []
+    for raw in page.splitlines():
+        if len(raw) < min_line_len:
+            continue
+        line = normalize_line(raw)
+        if len(line) >= min_line_len:
+            out.append(line)
+    return out
+
+
+def _top_repeated_lines(
+    line_pages: Dict[int, int],
+    line_len: Dict[int, int],
+    n_pages: int,
+    top_k: int,
+    repeat_pages_frac: float,
+) -> List[int]:
+    """Hashes das `top_k` linhas presentes em pelo menos `repeat_pages_frac` das páginas.
+
+    Mesma ordem (e desempate estável) de ordenar por (páginas, tamanho) decrescente.
+    """
+    min_pages = max(1, int(repeat_pages_frac * n_pages))
+    repeated = (h for h, c in line_pages.items() if c >= min_pages)
+    return heapq.nlargest(top_k, repeated, key=lambda h: (line_pages[h], line_len[h]))
+
+
+def _sample_pages(pages: List[str], sample_pages: Optional[int]) -> List[str]:
+    if not sample_pages or len(pages) <= sample_pages:
+        return pages
+    step = len(pages) / sample_pages
+    return [pages[int(i * step)] for i in range(sample_pages)]
+
+
 def repetition_coverage(
     pages: List[str],
     min_line_len: int = 6,
     top_k: int = 10,
     repeat_pages_frac: float = 0.6,
+    sample_pages: Optional[int] = None,
 ) -> float:
+    """Fração dos caracteres do documento ocupada pelas linhas mais repetidas.
+
+    Com `sample_pages`, a estimativa usa apenas essa quantidade de páginas
+    igualmente espaçadas (para documentos muito longos).
+    """
+    pages = _sample_pages(pages, sample_pages)
     n_pages = max(1, len(pages))
-    line_to_pages = {}
+    line_pages: Dict[int, int] = {}
+    line_len: Dict[int, int] = {}
     total_chars = 0
 
     for p in pages:
-        lines = [normalize_line(l) for l in (p or "").splitlines()]
-        lines = [l for l in lines if len(l) >= min_line_len]
-        total_chars += sum(len(l) for l in lines)
-        uniq = set(lines)
-        for l in uniq:
-            line_to_pages[l] = line_to_pages.get(l, 0) + 1
-
-    if total_chars == 0 or not line_to_pages:
+        lines = _page_lines(p or "", min_line_len)
+        total_chars += sum(map(len, lines))
+        for l in set(lines):
+            h = hash(l)
+            line_pages[h] = line_pages.get(h, 0) + 1
+            line_len[h] = len(l)
+
+    if total_chars == 0 or not line_pages:
         return 0.0
 
-    min_pages = max(1, int(repeat_pages_frac * n_pages))
-    repeated_lines = [(l, c) for l, c in line_to_pages.items() if c >= min_pages]
-    if not repeated_lines:
+    top = _top_repeated_lines(line_pages, line_len, n_pages, top_k, repeat_pages_frac)
+    if not top:
         return 0.0
 
-    repeated_lines.sort(key=lambda x: (x[1], len(x[0])), reverse=True)
-    repeated_lines = repeated_lines[:top_k]
-
-    rep_chars = sum(len(l) for l, _ in repeated_lines) * n_pages
+    rep_chars = sum(line_len[h] for h in top) * n_pages
     coverage = min(1.0, rep_chars / max(1, total_chars))
     return coverage
 
@@ -247,25 +461,159 @@ def _unique_chars(s: str) -> int:
     return len(set(s))
 
 
-def text_quality_metrics(pages: List[str]) -> Tuple[float, float, float, float, int]:
-    if not pages:
+# -----------------------------
+# Motor de métricas (uma passada por página)
+# -----------------------------
+_TOKEN_RE = re.compile(r"\w+", flags=re.UNICODE)
+_SLASH_SEQ_RE = re.compile(r"(?:\s|^)/(?:\d{1,3})(?=\s|$)")
+
+# Mesmo conjunto de `_ALLOWED_CHARS_RE` caractere a caractere; `\s` do `re`
+# coincide com `str.isspace()` (lista fixa, conferida nos testes).
+_ALLOWED_WHITESPACE = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+
+
+def _char_range(first: str, last: str) -> str:
+    return "".join(chr(c) for c in range(ord(first), ord(last) + 1))
+
+
+_ALLOWED_CHARS = (
+    _char_range("A", "Z")
+    + _char_range("a", "z")
+    + _char_range("À", "Ö")
+    + _char_range("Ø", "ö")
+    + _char_range("ø", "ÿ")
+    + _char_range("0", "9")
+    + ".,;:!?()-/"
+    + _ALLOWED_WHITESPACE
+)
+# Tabela para str.translate: remove os permitidos, sobra o que não é "printable"
+_DROP_ALLOWED = dict.fromkeys(map(ord, _ALLOWED_CHARS))
+
+
+class PageFeatures(NamedTuple):
+    tokens: int
+    printable: float
+    alnum: float
+    mean_word_len: float
+    slash_frac: float
+    chars: frozenset
+
+
+def page_features(p: str) -> PageFeatures:
+    """Todas as features de decisão de uma página, com uma tokenização só."""
+    p = p or ""
+    if not p:
+        return PageFeatures(0, 0.0, 0.0, 0.0, 0.0, frozenset())
+    n = len(p)
+    toks = _TOKEN_RE.findall(p)
+    word_chars = sum(map(len, toks))
+    printable = n - len(p.translate(_DROP_ALLOWED))
+    alnum = word_chars - p.count("_")
+    slash = _SLASH_SEQ_RE.findall(p)
+    return PageFeatures(
+        tokens=len(toks),
+        printable=printable / n,
+        alnum=alnum / n,
+        mean_word_len=word_chars / len(toks) if toks else 0.0,
+        slash_frac=min(1.0, len(" ".join(slash)) / max(1, n)),
+        chars=frozenset(p),
+    )
+
+
+def _avg_tokens(features: List[PageFeatures]) -> float:
+    if not features:
+        return 0.0
+    return sum(f.tokens for f in features) / max(1, len(features))
+
+
+def _quality_from_features(
+    features: List[PageFeatures],
+) -> Tuple[float, float, float, float, int]:
+    if not features:
         return 0, 0, 0, 0, 0
-    printable, alpha, mean_wlen, slashf = [], [], [], []
-    for p in pages:
-        p = p or ""
-        printable.append(_printable_ratio(p))
-        alpha.append(_alpha_num_ratio(p))
-        toks = re.findall(r"\w+", p, flags=re.UNICODE)
-        mean_wlen.append(_mean_word_len(toks))
-        slashf.append(_slash_seq_frac(p))
-    unique_total = _unique_chars("".join(pages))
+    n = len(features)
     return (
-        sum(printable) / len(printable),
-        sum(alpha) / len(alpha),
-        sum(mean_wlen) / len(mean_wlen),
-        sum(slashf) / len(slashf),
-        unique_total,
+        sum(f.printable for f in features) / n,
+        sum(f.alnum for f in features) / n,
+        sum(f.mean_word_len for f in features) / n,
+        sum(f.slash_frac for f in features) / n,
+        len(frozenset().union(*(f.chars for f in features))),
+    )
+
+
+def text_quality_metrics(pages: List[str]) -> Tuple[float, float, float, float, int]:
+    return _quality_from_features([page_features(p) for p in pages])
+
+
+def _is_gibberish(pr: float, ar: float, mwl: float, sfrac: float, uniq: int) -> bool:
+    return pr < 0.85 or ar < 0.60 or mwl < 3.2 or sfrac > 0.02 or uniq < 15
+
+
+def page_repetition_coverage(
+    pages: List[str],
+    min_line_len: int = 6,
+    top_k: int = 10,
+    repeat_pages_frac: float = 0.6,
+) -> List[float]:
+    """Cobertura de linhas repetidas (cabeçalhos/rodapés do documento) em cada página.
+
+    As linhas repetidas são detectadas no documento inteiro, como em
+    `repetition_coverage`; a cobertura é medida sobre os caracteres da página.
+    """
+    n_pages = max(1, len(pages))
+    # Por página: total de caracteres e (hash, tamanho) das linhas distintas
+    page_lines: List[Tuple[int, List[Tuple[int, int]]]] = []
+    line_pages: Dict[int, int] = {}
+    line_len: Dict[int, int] = {}
+    for p in pages:
+        lines = _page_lines(p or "", min_line_len)
+        uniq = [(hash(l), len(l)) for l in set(lines)]
+        page_lines.append((sum(map(len, lines)), uniq))
+        for h, n in uniq:
+            line_pages[h] = line_pages.get(h, 0) + 1
+            line_len[h] = n
+
+    top = set(_top_repeated_lines(line_pages, line_len, n_pages, top_k, repeat_pages_frac))
+
+    out: List[float] = []
+    for total, uniq in page_lines:
+        if total == 0 or not top:
+            out.append(0.0)
+            continue
+        rep = sum(n for h, n in uniq if h in top)
+        out.append(min(1.0, rep / total))
+    return out
+
+
+def page_ocr_decisions(
+    pages: List[str],
+    min_tokens: int,
+    repeat_threshold: float,
+    repeat_pages_frac: float,
+) -> List[bool]:
+    """Decide, página a página, se o texto nativo deve ser substituído por OCR.
+
+    Usa os mesmos critérios de `should_force_ocr` (tokens, repetição e
+    qualidade do texto), avaliados individualmente em cada página.
+    """
+    rep_cov = page_repetition_coverage(
+        pages, min_line_len=6, top_k=12, repeat_pages_frac=repeat_pages_frac
     )
+    decisions: List[bool] = []
+    for p, cov in zip(pages, rep_cov):
+        feats = page_features(p)
+        gibberish = _is_gibberish(*_quality_from_features([feats]))
+        decisions.append((feats.tokens < min_tokens) or (cov >= repeat_threshold) or gibberish)
+    logger.info(
+        "[pdf_ocr] page decisions pages=%d ocr=%d",
+        len(decisions),
+        sum(decisions),
+    )
+    return decisions
 
 
 def should_force_ocr(
@@ -274,12 +622,12 @@ def should_force_ocr(
     repeat_threshold: float,
     repeat_pages_frac: float,
 ) -> Tuple[bool, float, float]:
-    avg_tok = avg_tokens_per_page(pages)
+    features = [page_features(p) for p in pages]
+    avg_tok = _avg_tokens(features)
     rep_cov = repetition_coverage(
         pages, min_line_len=6, top_k=12, repeat_pages_frac=repeat_pages_frac
     )
-    pr, ar, mwl, sfrac, uniq = text_quality_metrics(pages)
-    gibberish = pr < 0.85 or ar < 0.60 or mwl < 3.2 or sfrac > 0.02 or uniq < 15
+    gibberish = _is_gibberish(*_quality_from_features(features))
     force = (avg_tok < min_tokens) or (rep_cov >= repeat_threshold) or gibberish
     logger.info(
         "[pdf_ocr] decision avg_tokens=%.1f rep_cov=%.2f gibberish=%s force_ocr=%s",
@@ -291,42 +639,286 @@ def should_force_ocr(
     return force, avg_tok, rep_cov
 
 
+# Linha que contém apenas o contador de página ("Página 3 / 10", "Pág. 3 de 10", "Page 3 of 10")
+_PAGE_COUNTER_LINE_RE = re.compile(
+    r"^\s*(?:P(?:ág|ag|ágina|agina|age)\.?)\s*\d+\s*(?:/|de|of)\s*\d+\s*$", flags=re.I
+)
+
+
+def strip_boilerplate(
+    pages: List[str],
+    min_line_len: int = 6,
+    top_k: int = 12,
+    repeat_pages_frac: float = 0.6,
+) -> Tuple[List[str], int]:
+    """Remove cabeçalhos/rodapés repetidos e linhas de contador de página.
+
+    As linhas repetidas são as mesmas detectadas por `repetition_coverage`
+    (comparadas após `normalize_line`), exigindo presença em pelo menos duas
+    páginas. Devolve as páginas limpas e os bytes (UTF-8) removidos.
+    """
+    n_pages = max(1, len(pages))
+    line_pages: Dict[int, int] = {}
+    line_len: Dict[int, int] = {}
+    line_text: Dict[int, str] = {}
+    for p in pages:
+        for l in set(_page_lines(p or "", min_line_len)):
+            h = hash(l)
+            line_pages[h] = line_pages.get(h, 0) + 1
+            line_len[h] = len(l)
+            line_text[h] = l
+    top = _top_repeated_lines(line_pages, line_len, n_pages, top_k, repeat_pages_frac)
+    boilerplate = {line_text[h] for h in top if line_pages[h] >= 2}
+
+    out: List[str] = []
+    saved = 0
+    for p in pages:
+        p = p or ""
+        kept: List[str] = []
+        for raw in p.splitlines():
+            if _PAGE_COUNTER_LINE_RE.match(raw):
+                continue
+            if boilerplate and len(raw) >= min_line_len and normalize_line(raw) in boilerplate:
+                continue
+            kept.append(raw)
+        cleaned = "\n".join(kept).strip()
+        saved += len(p.strip().encode("utf-8")) - len(cleaned.encode("utf-8"))
+        out.append(cleaned)
+    return out, saved
+
+
+def _strip_pages(
+    texts: List[str], repeat_pages_frac: float, report: Optional[Dict[str, Any]]
+) -> List[str]:
+    cleaned, saved = strip_boilerplate(texts, repeat_pages_frac=repeat_pages_frac)
+    logger.info("[pdf_ocr] boilerplate stripped pages=%d bytes_saved=%d", len(texts), saved)
+    if report is not None:
+        report["boilerplate_bytes_saved"] = saved
+    return cleaned
+
+
 # -----------------------------
 # Pré-processamento e OCR
 # -----------------------------
-def _deskew(gray: np.ndarray, max_angle: float = 5.0) -> np.ndarray:
+def _estimate_skew(
+    gray: np.ndarray, max_angle: float = 5.0, near_horizontal_only: bool = False
+) -> Optional[float]:
+    """Ângulo mediano (graus) das linhas quase horizontais; None se não houver.
+
+    `near_horizontal_only` restringe o acumulador do Hough a ±`max_angle`,
+    bem mais barato que varrer todos os ângulos.
+    """
     edges = cv2.Canny(gray, 50, 150)
-    lines = cv2.HoughLines(edges, 1, np.pi / 180, 120)
+    if near_horizontal_only:
+        delta = np.deg2rad(max_angle)
+        lines = cv2.HoughLines(
+            edges, 1, np.pi / 720, 120, min_theta=np.pi / 2 - delta, max_theta=np.pi / 2 + delta
+        )
+    else:
+        lines = cv2.HoughLines(edges, 1, np.pi / 180, 120)
     if lines is None:
-        return gray
+        return None
     angles = []
     for rho, theta in lines[:, 0]:
         angle = (theta * 180.0 / np.pi) - 90.0
         if -max_angle <= angle <= max_angle:
             angles.append(angle)
     if not angles:
-        return gray
-    median = float(np.median(angles))
+        return None
+    return float(np.median(angles))
+
+
+def _rotate(gray: np.ndarray, angle: float) -> np.ndarray:
     h, w = gray.shape[:2]
-    m = cv2.getRotationMatrix2D((w // 2, h // 2), median, 1.0)
+    m = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
     return cv2.warpAffine(
         gray, m, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
     )
 
 
-def _preprocess(img_pil: Image.Image) -> np.ndarray:
-    img = np.array(img_pil.convert("L"))
-    img = cv2.equalizeHist(img)
-    img = _deskew(img)
-    img = cv2.fastNlMeansDenoising(img, h=7, templateWindowSize=7, searchWindowSize=21)
-    bin_img = cv2.adaptiveThreshold(
-        img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+def _deskew(gray: np.ndarray, max_angle: float = 5.0) -> np.ndarray:
+    angle = _estimate_skew(gray, max_angle)
+    if angle is None:
+        return gray
+    return _rotate(gray, angle)
+
+
+# Largura usada na estimativa rápida de inclinação (Hough na imagem reduzida)
+SKEW_PROBE_WIDTH = 1000
+# Inclinação mínima (graus) para girar a página no modo "auto"
+SKEW_MIN_ANGLE = 0.5
+# Desvio-padrão do ruído (na imagem original, 0-255) a partir do qual o
+# denoise roda no modo "auto"; scans limpos ficam abaixo de ~2
+NOISE_SIGMA_MIN = 3.0
+
+# Estágios opcionais do `_preprocess` por perfil: "always", "auto" (decidido
+# pelos estimadores de ruído/inclinação) ou "never". O threshold adaptativo
+# roda sempre. "accurate" reproduz o pipeline original.
+PREPROCESS_PROFILES: Dict[str, Dict[str, str]] = {
+    "fast": {"equalize": "always", "deskew": "never", "denoise": "never", "sharpen": "never", "dilate": "never"},
+    "balanced": {"equalize": "always", "deskew": "auto", "denoise": "auto", "sharpen": "always", "dilate": "never"},
+    "accurate": {"equalize": "always", "deskew": "always", "denoise": "always", "sharpen": "always", "dilate": "always"},
+}
+DEFAULT_PREPROCESS_PROFILE = "accurate"
+
+
+def _estimate_noise(gray: np.ndarray) -> float:
+    """Desvio-padrão do ruído pela mediana (MAD) da resposta a um laplaciano 3x3, em amostra 1:2."""
+    sample = gray[::2, ::2]
+    h, w = sample.shape[:2]
+    if h < 3 or w < 3:
+        return 0.0
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    resp = cv2.filter2D(sample.astype(np.float32), -1, kernel)[1:-1, 1:-1]
+    # Resposta ao ruído branco tem desvio 6σ (norma do kernel); 0.6745 = MAD/σ da normal
+    return float(np.median(np.abs(resp)) / (0.6745 * 6.0))
+
+
+def _probe_skew(gray: np.ndarray, max_angle: float = 5.0) -> Optional[float]:
+    """Estimativa de inclinação numa cópia reduzida da página."""
+    return _analyze_layout(gray, max_angle).skew
+
+
+# Análise de layout: largura da cópia reduzida e critérios de página em branco
+LAYOUT_WIDTH = SKEW_PROBE_WIDTH
+# Faixa de tons (percentis extremos) abaixo da qual a página é lisa, sem tinta
+INK_MIN_SPREAD = 16.0
+# Tinta = pixels que se afastam do fundo (mediana) mais que essa fração da
+# distância entre o fundo e o extremo do lado da tinta
+INK_CONTRAST_FRAC = 0.5
+BLANK_INK_FRAC = 0.001
+BLANK_MAX_COMPONENTS = 2
+
+
+class PageLayout(NamedTuple):
+    skew: Optional[float]  # graus, None se não houver linhas detectáveis
+    ink_frac: float  # fração de pixels de tinta
+    components: int  # manchas de tinta conectadas (≈ caracteres/palavras)
+    blank: bool
+    inverted: bool = False  # fundo escuro com tinta clara
+
+
+def _ink_mask(gray: np.ndarray) -> Tuple[np.ndarray, bool]:
+    """Máscara de tinta relativa ao contraste da própria página e se ela é invertida.
+
+    O limiar acompanha a faixa de tons da página (texto desbotado continua
+    sendo tinta) e a polaridade vem do lado da mediana onde estão os extremos.
+    """
+    if not gray.size:
+        return np.zeros_like(gray, dtype=np.uint8), False
+    lo, background, hi = (float(v) for v in np.percentile(gray, (0.05, 50, 99.95)))
+    if hi - lo < INK_MIN_SPREAD:
+        return np.zeros_like(gray, dtype=np.uint8), False
+    inverted = hi - background > background - lo
+    if inverted:
+        ink = gray > background + INK_CONTRAST_FRAC * (hi - background)
+    else:
+        ink = gray < background - INK_CONTRAST_FRAC * (background - lo)
+    return ink.astype(np.uint8), inverted
+
+
+def _analyze_layout(gray: np.ndarray, max_angle: float = 5.0) -> PageLayout:
+    """Inclinação, densidade de texto e página em branco numa cópia reduzida.
+
+    Substitui o Hough e o `connectedComponents` na resolução cheia: a página
+    é reduzida para `LAYOUT_WIDTH` de largura antes das medições. Uma página
+    que parece em branco na cópia reduzida é conferida em resolução cheia
+    (traços finos e claros somem na redução) antes de pular o OCR.
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, LAYOUT_WIDTH / max(1, w))
+    small = gray
+    if scale < 1.0:
+        small = cv2.resize(
+            gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA
+        )
+    skew = _estimate_skew(small, max_angle, near_horizontal_only=True)
+    ink, inverted = _ink_mask(small)
+    ink_frac = float(ink.mean()) if ink.size else 0.0
+    num_labels, _ = cv2.connectedComponents(ink)
+    components = max(0, int(num_labels) - 1)
+    blank = ink_frac < BLANK_INK_FRAC and components <= BLANK_MAX_COMPONENTS
+    if blank and scale < 1.0:
+        full_ink, _ = _ink_mask(gray)
+        if float(full_ink.mean()) >= BLANK_INK_FRAC:
+            metrics.inc("ocr_blank_unconfirmed_total")
+            blank = False
+    return PageLayout(skew, ink_frac, components, blank, inverted)
+
+
+def _preprocess(
+    image: Any,
+    profile: str = DEFAULT_PREPROCESS_PROFILE,
+    timings: Optional[Dict[str, float]] = None,
+    layout: Optional[PageLayout] = None,
+) -> np.ndarray:
+    """Binarização para o Tesseract com os estágios do perfil (`PREPROCESS_PROFILES`)."""
+    stages = PREPROCESS_PROFILES[profile]
+    spent: Dict[str, float] = {}
+
+    def run(stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        spent[stage] = spent.get(stage, 0.0) + time.perf_counter() - t0
+        return out
+
+    img = _gray_array(image)
+    denoise = stages["denoise"] == "always"
+    if stages["denoise"] == "auto":
+        # Medido antes da equalização, que amplifica o ruído do fundo
+        denoise = run("estimate_noise", _estimate_noise, img) >= NOISE_SIGMA_MIN
+    if stages["equalize"] != "never":
+        img = run("equalize", cv2.equalizeHist, img)
+    if stages["deskew"] == "always":
+        # Ângulo medido em resolução cheia: a estimativa da análise de layout
+        # (cópia reduzida) não tem a precisão que o perfil promete
+        img = run("deskew", _deskew, img)
+    elif layout is not None and stages["deskew"] == "auto":
+        if layout.skew is not None and abs(layout.skew) >= SKEW_MIN_ANGLE:
+            img = run("deskew", _rotate, img, layout.skew)
+    elif stages["deskew"] == "auto":
+        angle = run("estimate_skew", _probe_skew, img)
+        if angle is not None and abs(angle) >= SKEW_MIN_ANGLE:
+            img = run("deskew", _rotate, img, angle)
+    if denoise:
+        img = run(
+            "denoise",
+            cv2.fastNlMeansDenoising,
+            img,
+            h=7,
+            templateWindowSize=7,
+            searchWindowSize=21,
+        )
+    out = run(
+        "threshold",
+        cv2.adaptiveThreshold,
+        img,
+        255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        31,
+        15,
     )
-    blur = cv2.GaussianBlur(bin_img, (0, 0), sigmaX=1.0)
-    sharp = cv2.addWeighted(bin_img, 1.5, blur, -0.5, 0)
-    kernel = np.ones((1, 1), np.uint8)
-    sharp = cv2.dilate(sharp, kernel, iterations=1)
-    return sharp
+    if stages["sharpen"] != "never":
+        blur = run("sharpen", cv2.GaussianBlur, out, (0, 0), sigmaX=1.0)
+        out = run("sharpen", cv2.addWeighted, out, 1.5, blur, -0.5, 0)
+    if stages["dilate"] != "never":
+        kernel = np.ones((1, 1), np.uint8)
+        out = run("dilate", cv2.dilate, out, kernel, iterations=1)
+
+    for stage, seconds in spent.items():
+        metrics.inc("ocr_preprocess_seconds_total", seconds, stage=stage, profile=profile)
+        metrics.inc("ocr_preprocess_stage_total", stage=stage, profile=profile)
+    metrics.inc("ocr_preprocess_pages_total", profile=profile)
+    logger.debug(
+        "[pdf_ocr] preprocess profile=%s %s",
+        profile,
+        " ".join(f"{k}={v * 1000:.1f}ms" for k, v in spent.items()),
+    )
+    if timings is not None:
+        for stage, seconds in spent.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    return out
 
 
 def _choose_psm(text_density: float) -> int:
@@ -337,93 +929,1111 @@ def _choose_psm(text_density: float) -> int:
     return 6
 
 
-def ocr_all_pages_from_bytes(pdf_bytes: bytes, dpi: int = 400, lang: str = "por+eng") -> str:
-    images: List[Image.Image] = convert_from_bytes(pdf_bytes, dpi=dpi, fmt="png", thread_count=2)
-    out_pages: List[str] = []
-    for i, img in enumerate(images, start=1):
-        proc = _preprocess(img)
-        num_labels, _ = cv2.connectedComponents(proc)
-        psm = _choose_psm(num_labels)
-        config = (
-            f"--oem 1 --psm {psm} -l {lang} "
-            f"-c preserve_interword_spaces=1 -c tessedit_do_invert=0"
+def _map_pages(fn: Callable[[Any], Any], items: Iterable[Any], workers: int = 1) -> List[Any]:
+    """Aplica `fn` a cada página preservando a ordem de entrada.
+
+    Com `workers > 1` as páginas vão para o pool de OCR do processo
+    (`ocr_pool`), com no máximo `workers` páginas desta chamada em andamento;
+    `fn` precisa ser picklable (função de módulo ou `functools.partial`).
+    Com `workers <= 1` rodam no próprio processo, mas cada página ocupa uma
+    vaga do mesmo orçamento do pool (`ocr_pool.run_inline`), então as threads
+    do gunicorn não somam mais OCR simultâneo que o pool.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [ocr_pool.run_inline(fn, it) for it in items]
+    logger.debug("[pdf_ocr] page pool in_flight=%d pages=%d", workers, len(items))
+    # Cada página é serializada para o processo do pool
+    _count_copies("ipc", len(items))
+    return ocr_pool.map_ordered(fn, items, max_in_flight=workers)
+
+
+def _gray_array(img: Any) -> np.ndarray:
+    """Página em tons de cinza como numpy (sem cópia quando já vem do raster `pgm`)."""
+    if isinstance(img, np.ndarray):
+        return img
+    if img.mode != "L":
+        img = img.convert("L")
+        _count_copies("grayscale")
+    _count_copies("to_numpy")
+    return np.array(img)
+
+
+def _prepare_threshold(img: Any, lang: str, profile: str) -> Tuple[Any, Dict[str, Any]]:
+    if isinstance(img, np.ndarray):
+        # Mesmo corte do caminho PIL: x >= 200 -> branco
+        _, bw = cv2.threshold(img, 199, 255, cv2.THRESH_BINARY)
+        _count_copies("binarize")
+        return bw, {"lang": lang}
+    gray = img.convert("L")
+    if img.mode != "L":
+        _count_copies("grayscale")
+    bw = gray.point(lambda x: 0 if x < 200 else 255, "1")
+    _count_copies("binarize")
+    return bw, {"lang": lang}
+
+
+def _prepare_full(img: Any, lang: str, profile: str) -> Tuple[Any, Dict[str, Any]]:
+    gray = _gray_array(img)
+    t0 = time.perf_counter()
+    layout = _analyze_layout(gray)
+    metrics.inc("ocr_preprocess_seconds_total", time.perf_counter() - t0, stage="layout", profile=profile)
+    if layout.blank:
+        metrics.inc("ocr_blank_pages_total")
+        logger.debug("[pdf_ocr] blank page skipped ink=%.4f", layout.ink_frac)
+        return None, {}
+    if layout.inverted:
+        # O Tesseract roda com tessedit_do_invert=0: tinta clara vira escura aqui
+        gray = cv2.bitwise_not(gray)
+    proc = _preprocess(gray, profile=profile, layout=layout)
+    psm = _choose_psm(layout.components)
+    config = (
+        f"--oem 1 --psm {psm} -l {lang} "
+        f"-c preserve_interword_spaces=1 -c tessedit_do_invert=0"
+    )
+    logger.debug(
+        "[pdf_ocr] ocr psm=%d components=%d skew=%s", psm, layout.components, layout.skew
+    )
+    return proc, {"config": config}
+
+
+# Preparação da imagem da página -> (imagem final, kwargs do pytesseract).
+# O perfil de pré-processamento só é usado pelo modo "full", que também
+# devolve imagem None para páginas em branco (sem OCR).
+_PAGE_PREPARERS: Dict[str, Callable[[Image.Image, str, str], Tuple[Any, Dict[str, Any]]]] = {
+    "threshold": _prepare_threshold,
+    "full": _prepare_full,
+}
+
+# Cache de OCR por página: local em PAGE_CACHE_DIR (configuração do servidor),
+# entradas em `<dir>/pdf-page-cache/`
+PAGE_CACHE_NAMESPACE = "pdf-page-cache"
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def page_cache_dir_from_env() -> Optional[str]:
+    """Diretório do cache de OCR por página configurado no servidor (`PAGE_CACHE_DIR`)."""
+    return os.environ.get("PAGE_CACHE_DIR") or None
+
+
+def _page_digest(image: Any, ocr_kw: Dict[str, Any]) -> str:
+    """Hash dos pixels já pré-processados + parâmetros do Tesseract."""
+    if isinstance(image, np.ndarray):
+        raw, shape = np.ascontiguousarray(image).tobytes(), f"{image.shape}:{image.dtype}"
+    else:
+        raw, shape = image.tobytes(), f"{image.size}:{image.mode}"
+    h = hashlib.blake2b(digest_size=20)
+    h.update(shape.encode("ascii"))
+    h.update(raw)
+    return cache_key("page:" + h.hexdigest(), ocr_kw)
+
+
+def _ocr_page(
+    img: Image.Image,
+    lang: str,
+    mode: str = "threshold",
+    page_cache_dir: Optional[str] = None,
+    page_cache_max_bytes: int = PAGE_CACHE_MAX_BYTES,
+    profile: str = DEFAULT_PREPROCESS_PROFILE,
+    min_conf: Optional[float] = None,
+) -> Optional[str]:
+    """OCR de uma página; None quando há texto com confiança abaixo de `min_conf` (refazer em dpi maior)."""
+    with stage_timer("preprocess"):
+        image, ocr_kw = _PAGE_PREPARERS[mode](img, lang, profile)
+    if image is None:
+        return ""
+    cache: Optional[TextCache] = None
+    key = ""
+    if page_cache_dir:
+        cache = open_text_cache(page_cache_dir, page_cache_max_bytes, namespace=PAGE_CACHE_NAMESPACE)
+        key_kw = ocr_kw if min_conf is None else {**ocr_kw, "min_conf": min_conf}
+        key = _page_digest(image, key_kw)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("[pdf_ocr] page cache hit key=%s", key[:12])
+            return cached
+    _count_copies("engine")
+    with stage_timer("ocr_page"):
+        if min_conf is None:
+            txt = ocr_engine.image_to_string(image, **ocr_kw).strip()
+        else:
+            txt, conf = ocr_engine.image_to_text_conf(image, **ocr_kw)
+            txt = txt.strip()
+    # Sem palavras a confiança é 0: página sem tinta, refazer em dpi maior não ajuda
+    if min_conf is not None and txt and conf < min_conf:
+        logger.debug("[pdf_ocr] low confidence conf=%.1f min=%.1f", conf, min_conf)
+        return None
+    if cache is not None:
+        cache.put(key, txt)
+    return txt
+
+
+def _pdf_page_count(pdf_bytes: bytes) -> int:
+    return int(pdfinfo_from_bytes(pdf_bytes)["Pages"])
+
+
+def _page_runs(page_numbers: Iterable[int], window: int = 0) -> List[List[int]]:
+    """Agrupa páginas (1-based) em intervalos contíguos de no máximo `window` páginas.
+
+    `window <= 0` não limita o tamanho dos intervalos.
+    """
+    runs: List[List[int]] = []
+    for n in sorted(page_numbers):
+        if runs and n == runs[-1][-1] + 1 and (window <= 0 or len(runs[-1]) < window):
+            runs[-1].append(n)
+        else:
+            runs.append([n])
+    return runs
+
+
+RASTER_BACKENDS = ("pdf2image", "pgm")
+DEFAULT_RASTER_BACKEND = "pdf2image"
+
+# Cabeçalho P5: largura, altura e maxval separados por espaços (ou comentários "#")
+_PGM_HEADER_RE = re.compile(rb"P5(?:\s|#[^\n]*\n)+(\d+)(?:\s|#[^\n]*\n)+(\d+)(?:\s|#[^\n]*\n)+(\d+)\s")
+
+
+def _count_copies(stage: str, pages: int = 1) -> None:
+    """Contabiliza cópias de página inteira (`ocr_raster_copies_total{stage}`)."""
+    metrics.inc("ocr_raster_copies_total", pages, stage=stage)
+
+
+def _parse_pgm_stream(buf: bytes) -> List[np.ndarray]:
+    """Páginas de uma sequência de PGMs binários (P5, 8 bits) concatenados.
+
+    Cada página é uma view somente-leitura sobre `buf`, sem cópia.
+    """
+    pages: List[np.ndarray] = []
+    pos = 0
+    while pos < len(buf):
+        m = _PGM_HEADER_RE.match(buf, pos)
+        if m is None:
+            if buf[pos:].strip():
+                raise ValueError(f"Saída PGM inválida na posição {pos}")
+            break
+        width, height, maxval = (int(g) for g in m.groups())
+        if maxval > 255:
+            raise ValueError(f"PGM de 16 bits não suportado (maxval={maxval})")
+        size = width * height
+        pages.append(np.frombuffer(buf, dtype=np.uint8, count=size, offset=m.end()).reshape(height, width))
+        pos = m.end() + size
+    return pages
+
+
+@contextmanager
+def _pdf_on_disk(pdf_bytes: bytes) -> Iterator[str]:
+    """Grava o PDF uma vez num arquivo temporário para várias chamadas ao `pdftoppm`."""
+    with tempfile.TemporaryDirectory(prefix="pdf-raster-") as tmp:
+        pdf_path = os.path.join(tmp, "in.pdf")
+        with open(pdf_path, "wb") as fh:
+            fh.write(pdf_bytes)
+        yield pdf_path
+
+
+def _render_pgm(
+    pdf_bytes: bytes,
+    dpi: int,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    crop: Optional[Tuple[int, int, int, int]] = None,
+    pdf_path: Optional[str] = None,
+) -> List[np.ndarray]:
+    """Rasteriza com `pdftoppm -gray`, lendo os PGMs direto do stdout para numpy.
+
+    `crop=(x, y, largura, altura)` em pixels (origem no topo) rasteriza só
+    essa área da página. Com `pdf_path` (ver `_pdf_on_disk`) o PDF já gravado
+    é reutilizado em vez de escrever `pdf_bytes` de novo.
+    """
+    if pdf_path is None:
+        with _pdf_on_disk(pdf_bytes) as path:
+            return _render_pgm(pdf_bytes, dpi, first_page, last_page, crop, pdf_path=path)
+    cmd = ["pdftoppm", "-gray", "-r", str(dpi)]
+    if first_page is not None:
+        cmd += ["-f", str(first_page)]
+    if last_page is not None:
+        cmd += ["-l", str(last_page)]
+    if crop is not None:
+        x, y, w, h = crop
+        cmd += ["-x", str(x), "-y", str(y), "-W", str(w), "-H", str(h)]
+    cmd.append(pdf_path)
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except FileNotFoundError as exc:
+        raise RuntimeError("pdftoppm não encontrado. Instale poppler-utils") from exc
+    return _parse_pgm_stream(proc.stdout)
+
+
+def _render(
+    pdf_bytes: bytes,
+    dpi: int,
+    raster: str = DEFAULT_RASTER_BACKEND,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    **render_kw: Any,
+) -> List[Any]:
+    """Rasteriza páginas: PIL via pdf2image, ou arrays numpy em tons de cinza (`pgm`)."""
+    if raster == "pgm":
+        with stage_timer("rasterize"):
+            pages: List[Any] = _render_pgm(pdf_bytes, dpi, first_page=first_page, last_page=last_page)
+    else:
+        range_kw = {}
+        if first_page is not None:
+            range_kw = {"first_page": first_page, "last_page": last_page}
+        with stage_timer("rasterize"):
+            pages = convert_from_bytes(pdf_bytes, dpi=dpi, **range_kw, **render_kw)
+        # Arquivo do pdftoppm -> PIL (+ encode/decode quando o formato é PNG)
+        _count_copies("decode", len(pages))
+        if render_kw.get("fmt") == "png":
+            _count_copies("encode", len(pages))
+    _count_copies("pipe", len(pages))
+    metrics.inc("ocr_raster_pages_total", len(pages), backend=raster)
+    return pages
+
+
+def _iter_rendered(
+    pdf_bytes: bytes,
+    dpi: int,
+    page_numbers: Iterable[int],
+    window: int = 0,
+    raster: str = DEFAULT_RASTER_BACKEND,
+    **render_kw: Any,
+) -> Iterator[List[Tuple[int, Any]]]:
+    """Rasteriza as páginas pedidas em lotes (first_page/last_page) sob demanda.
+
+    Cada lote só é renderizado quando o anterior foi consumido, então o pico de
+    memória é limitado pelo tamanho da janela e não pelo total de páginas.
+    """
+    for run in _page_runs(page_numbers, window):
+        batch = list(
+            zip(run, _render(pdf_bytes, dpi, raster=raster, first_page=run[0], last_page=run[-1], **render_kw))
         )
-        logger.debug("[pdf_ocr] ocr page=%d psm=%d components=%d", i, psm, int(num_labels))
-        txt = pytesseract.image_to_string(proc, config=config)
-        out_pages.append(f"---- página {i} ----\n{txt.strip()}")
-    return "\n\n".join(out_pages).strip()
+        yield batch
+        # O consumidor já terminou a janela: solta as imagens antes de renderizar a próxima
+        batch.clear()
 
 
-def extract_text(
-    pdf_identifier: str,
+def _ocr_pages(
+    pdf_bytes: bytes,
     dpi: int,
+    ocr_fn: Callable[[Image.Image], str],
+    page_numbers: Optional[Iterable[int]] = None,
+    workers: int = 1,
+    window: int = 0,
+    raster: str = DEFAULT_RASTER_BACKEND,
+    **render_kw: Any,
+) -> List[Tuple[int, str]]:
+    """Rasteriza (em janelas, se `window > 0`) e aplica `ocr_fn`; devolve `(página, texto)`."""
+    if page_numbers is None and window <= 0:
+        images = _render(pdf_bytes, dpi, raster=raster, **render_kw)
+        return list(enumerate(_map_pages(ocr_fn, images, workers=workers), start=1))
+    if page_numbers is None:
+        page_numbers = range(1, _pdf_page_count(pdf_bytes) + 1)
+    out: List[Tuple[int, str]] = []
+    for batch in _iter_rendered(pdf_bytes, dpi, page_numbers, window=window, raster=raster, **render_kw):
+        nums = [n for n, _ in batch]
+        images = [img for _, img in batch]
+        del batch
+        texts = _map_pages(ocr_fn, images, workers=workers)
+        del images
+        out.extend(zip(nums, texts))
+        logger.debug("[pdf_ocr] raster window pages=%d-%d done", nums[0], nums[-1])
+    return out
+
+
+def _format_pages(texts: Iterable[str], start: int = 1) -> List[str]:
+    return [f"---- página {i} ----\n{txt}" for i, txt in enumerate(texts, start=start)]
+
+
+def _page_ocr_fn(
     lang: str,
-    min_tokens: int,
-    repeat_th: float,
-    repeat_pages_frac: float,
+    page_cache_dir: Optional[str],
+    preprocess_profile: Optional[str],
+    min_conf: Optional[float] = None,
+) -> Callable[[Image.Image], Optional[str]]:
+    """OCR por página: binarização simples, ou `_preprocess` com o perfil informado."""
+    if preprocess_profile is None:
+        return partial(_ocr_page, lang=lang, page_cache_dir=page_cache_dir, min_conf=min_conf)
+    return partial(
+        _ocr_page,
+        lang=lang,
+        mode="full",
+        page_cache_dir=page_cache_dir,
+        profile=preprocess_profile,
+        min_conf=min_conf,
+    )
+
+
+# DPI adaptativo: primeira passada em dpi baixo; páginas com confiança média
+# (0-100) abaixo do limite são refeitas no dpi pedido
+ADAPTIVE_MIN_CONF = 70.0
+
+
+def _ocr_pages_dpi(
+    pdf_bytes: bytes,
+    dpi: int,
+    lang: str,
+    page_cache_dir: Optional[str] = None,
+    preprocess_profile: Optional[str] = None,
+    page_numbers: Optional[Iterable[int]] = None,
+    workers: int = 1,
+    window: int = 0,
+    raster: str = DEFAULT_RASTER_BACKEND,
+    adaptive_dpi: Optional[int] = None,
+    adaptive_min_conf: float = ADAPTIVE_MIN_CONF,
+) -> List[Tuple[int, str, int]]:
+    """OCR das páginas devolvendo `(página, texto, dpi usado)` em ordem.
+
+    Com `adaptive_dpi` (menor que `dpi`), todas as páginas passam primeiro por
+    OCR nesse dpi e só as com confiança abaixo de `adaptive_min_conf` são
+    rasterizadas de novo em `dpi`.
+    """
+    if adaptive_dpi is None or adaptive_dpi >= dpi:
+        pages = _ocr_pages(
+            pdf_bytes,
+            dpi,
+            _page_ocr_fn(lang, page_cache_dir, preprocess_profile),
+            page_numbers=page_numbers,
+            workers=workers,
+            window=window,
+            raster=raster,
+        )
+        return [(n, txt, dpi) for n, txt in pages]
+
+    first = _ocr_pages(
+        pdf_bytes,
+        adaptive_dpi,
+        _page_ocr_fn(lang, page_cache_dir, preprocess_profile, min_conf=adaptive_min_conf),
+        page_numbers=page_numbers,
+        workers=workers,
+        window=window,
+        raster=raster,
+    )
+    out = {n: (txt, adaptive_dpi) for n, txt in first if txt is not None}
+    retry = [n for n, txt in first if txt is None]
+    metrics.inc("ocr_adaptive_pages_total", len(out), dpi=adaptive_dpi)
+    if retry:
+        logger.info(
+            "[pdf_ocr] adaptive dpi retry pages=%d/%d dpi=%d->%d",
+            len(retry),
+            len(first),
+            adaptive_dpi,
+            dpi,
+        )
+        metrics.inc("ocr_adaptive_pages_total", len(retry), dpi=dpi)
+        for n, txt in _ocr_pages(
+            pdf_bytes,
+            dpi,
+            _page_ocr_fn(lang, page_cache_dir, preprocess_profile),
+            page_numbers=retry,
+            workers=workers,
+            window=window,
+            raster=raster,
+        ):
+            out[n] = (txt, dpi)
+    return [(n, *out[n]) for n in sorted(out)]
+
+
+def _normalize_for_match(s: str) -> str:
+    return " ".join(_strip_accents_lower(s).split())
+
+
+# Linhas com cara de título: marcador de seção/numeração no início, ou caixa alta
+_HEADING_MARKER_RE = re.compile(
+    r"^(?:clausula|secao|capitulo|artigo|titulo|anexo)\b"
+    r"|^(?:\d+(?:\.\d+)*|[ivxlc]+)\s*[.)\-–—]"
+)
+# Numeração sem pontuação ("4.1 Remuneração"): vale se a palavra seguinte for maiúscula
+_NUMBERED_HEADING_RE = re.compile(r"^\d+(?:\.\d+)*\s+([^\W\d_])")
+HEADING_UPPER_FRAC = 0.7
+# Palavra-chave conta só nos primeiros caracteres do título (não no corpo que segue)
+HEADING_KEYWORD_WINDOW = 80
+
+
+def _heading_texts(text: str) -> List[str]:
+    """Títulos do texto normalizados, cada um junto com a linha seguinte (títulos quebrados)."""
+    lines = [ln.strip() for ln in text.splitlines()]
+    out: List[str] = []
+    for i, line in enumerate(lines):
+        if not line:
+            continue
+        norm = _normalize_for_match(line)
+        letters = [c for c in line if c.isalpha()]
+        upper = len(letters) >= 4 and sum(c.isupper() for c in letters) >= HEADING_UPPER_FRAC * len(letters)
+        numbered = _NUMBERED_HEADING_RE.match(line)
+        if upper or _HEADING_MARKER_RE.match(norm) or (numbered and numbered.group(1).isupper()):
+            nxt = lines[i + 1] if i + 1 < len(lines) else ""
+            out.append(_normalize_for_match(f"{line} {nxt}")[:HEADING_KEYWORD_WINDOW])
+    return out
+
+
+def match_sections(text: str, keywords: Iterable[str]) -> List[str]:
+    """Palavras-chave que aparecem em títulos de seção do texto.
+
+    Comparação sem acento/caixa, por palavra inteira (aceita plural com "s"),
+    só em linhas com cara de título (`_heading_texts`): citações no corpo do
+    texto não selecionam a página.
+    """
+    headings = _heading_texts(text)
+    found: List[str] = []
+    for kw in keywords:
+        pattern = re.compile(r"(?<!\w)" + re.escape(_normalize_for_match(kw)) + r"s?(?!\w)")
+        if any(pattern.search(h) for h in headings):
+            found.append(kw)
+    return found
+
+
+# Páginas seguintes a uma página com palavra-chave que também vão para o OCR
+# completo: a seção costuma continuar na próxima página
+SECTION_CONTEXT_PAGES = 1
+
+
+def _ocr_pages_two_pass(
+    pdf_bytes: bytes,
+    dpi: int,
+    lang: str,
+    section_keywords: List[str],
+    page_numbers: Optional[Iterable[int]] = None,
+    report: Optional[Dict[str, Any]] = None,
+    page_cache_dir: Optional[str] = None,
+    preprocess_profile: Optional[str] = None,
+    workers: int = 1,
+    window: int = 0,
+    raster: str = DEFAULT_RASTER_BACKEND,
+    adaptive_dpi: Optional[int] = None,
+    adaptive_min_conf: float = ADAPTIVE_MIN_CONF,
+) -> List[Tuple[int, str, int]]:
+    """OCR rápido em todas as páginas e completo só nas que citam `section_keywords`."""
+    fast = OCR_PROFILES["fast"]
+    t0 = time.perf_counter()
+    first = _ocr_pages_dpi(
+        pdf_bytes,
+        fast.dpi,
+        lang,
+        page_cache_dir=page_cache_dir,
+        preprocess_profile=fast.preprocess,
+        page_numbers=page_numbers,
+        workers=workers,
+        window=window,
+        raster=raster,
+    )
+    fast_seconds = time.perf_counter() - t0
+    requested = {n for n, _, _ in first}
+    hits = {n: match_sections(txt, section_keywords) for n, txt, _ in first}
+    selected = sorted(
+        {
+            n + k
+            for n, found in hits.items()
+            if found
+            for k in range(SECTION_CONTEXT_PAGES + 1)
+            if n + k in requested
+        }
+    )
+
+    t0 = time.perf_counter()
+    full = {}
+    if selected:
+        full = {
+            n: (txt, used)
+            for n, txt, used in _ocr_pages_dpi(
+                pdf_bytes,
+                dpi,
+                lang,
+                page_cache_dir=page_cache_dir,
+                preprocess_profile=preprocess_profile,
+                page_numbers=selected,
+                workers=workers,
+                window=window,
+                raster=raster,
+                adaptive_dpi=adaptive_dpi,
+                adaptive_min_conf=adaptive_min_conf,
+            )
+        }
+    full_seconds = time.perf_counter() - t0
+
+    skipped = [n for n, _, _ in first if n not in full]
+    metrics.inc("ocr_targeted_pages_total", len(full), **{"pass": "full"})
+    metrics.inc("ocr_targeted_pages_total", len(skipped), **{"pass": "fast"})
+    # Economia estimada: custo médio de uma página no OCR completo × páginas puladas,
+    # menos o custo da passada rápida (sem páginas completas não há como estimar)
+    saved = (full_seconds / len(full)) * len(skipped) - fast_seconds if full else None
+    logger.info(
+        "[pdf_ocr] targeted OCR full=%d skipped=%d fast=%.2fs full=%.2fs",
+        len(full),
+        len(skipped),
+        fast_seconds,
+        full_seconds,
+    )
+    if report is not None:
+        report["targeted"] = {
+            "pages_full": sorted(full),
+            "pages_skipped": skipped,
+            "sections": {str(n): found for n, found in hits.items() if found},
+            "fast_seconds": round(fast_seconds, 3),
+            "full_seconds": round(full_seconds, 3),
+            "seconds_saved": round(saved, 3) if saved is not None else None,
+        }
+    return [
+        (n, *full[n]) if n in full else (n, txt, used)
+        for n, txt, used in first
+    ]
+
+
+def _ocr_regions(
+    pdf_bytes: bytes,
+    regions: Dict[int, List[pdf_regions.Region]],
+    dpi: int,
+    lang: str,
+    page_cache_dir: Optional[str] = None,
+    preprocess_profile: Optional[str] = None,
+    workers: int = 1,
+) -> Dict[int, List[str]]:
+    """OCR só das regiões pedidas, `{página: [texto por região, de cima para baixo]}`.
+
+    Cada região é rasterizada isoladamente (`pdftoppm -x/-y/-W/-H`), então o
+    restante da página não é renderizado nem reconhecido.
+    """
+    scale = dpi / 72.0
+    crops: List[np.ndarray] = []
+    owners: List[int] = []
+    with _pdf_on_disk(pdf_bytes) as pdf_path:
+        for n in sorted(regions):
+            for r in sorted(regions[n], key=lambda r: (r.y0, r.x0)):
+                box = (
+                    int(r.x0 * scale),
+                    int(r.y0 * scale),
+                    max(1, round((r.x1 - r.x0) * scale)),
+                    max(1, round((r.y1 - r.y0) * scale)),
+                )
+                with stage_timer("rasterize"):
+                    rendered = _render_pgm(
+                        pdf_bytes, dpi, first_page=n, last_page=n, crop=box, pdf_path=pdf_path
+                    )
+                # Um dono por imagem devolvida, para o zip com os textos não desalinhar
+                crops.extend(rendered)
+                owners.extend([n] * len(rendered))
+    metrics.inc("ocr_regions_total", len(crops))
+    texts = _map_pages(_page_ocr_fn(lang, page_cache_dir, preprocess_profile), crops, workers=workers)
+    out: Dict[int, List[str]] = {}
+    for n, txt in zip(owners, texts):
+        if txt:
+            out.setdefault(n, []).append(txt)
+    return out
+
+
+def _add_region_ocr(
+    pdf_bytes: bytes,
+    texts: List[str],
+    page_numbers: Iterable[int],
+    dpi: int,
+    lang: str,
+    page_cache_dir: Optional[str] = None,
+    preprocess_profile: Optional[str] = None,
+    workers: int = 1,
+) -> Dict[int, int]:
+    """Acrescenta ao texto nativo das páginas o OCR das imagens sem texto sobreposto.
+
+    `texts` (índice 0 = página 1) é alterado no lugar; devolve
+    `{página: regiões com OCR}`.
+    """
+    regions = pdf_regions.find_text_free_regions(pdf_bytes, page_numbers)
+    if not regions:
+        return {}
+    logger.info(
+        "[pdf_ocr] region OCR pages=%d regions=%d",
+        len(regions),
+        sum(len(r) for r in regions.values()),
+    )
+    found = _ocr_regions(
+        pdf_bytes,
+        regions,
+        dpi,
+        lang,
+        page_cache_dir=page_cache_dir,
+        preprocess_profile=preprocess_profile,
+        workers=workers,
+    )
+    for n, extra in found.items():
+        texts[n - 1] = "\n\n".join(t for t in [texts[n - 1], *extra] if t)
+    return {n: len(r) for n, r in regions.items()}
+
+
+class OcrProfile(NamedTuple):
+    dpi: int
+    preprocess: Optional[str]  # perfil do `_preprocess`; None = binarização simples
+
+
+# Perfis de OCR de ponta a ponta (resolução do raster + preparação da página).
+# Latência e acurácia de cada um: benchmarks/bench_ocr_profiles.py.
+OCR_PROFILES: Dict[str, OcrProfile] = {
+    "fast": OcrProfile(dpi=200, preprocess=None),
+    "balanced": OcrProfile(dpi=300, preprocess="balanced"),
+    "accurate": OcrProfile(dpi=400, preprocess="accurate"),
+}
+
+
+def resolve_ocr_profile(
+    ocr_profile: Optional[str], dpi: int, preprocess_profile: Optional[str]
+) -> Tuple[int, Optional[str]]:
+    """(dpi, preprocess_profile) efetivos; o perfil, quando informado, prevalece.
+
+    Levanta ValueError para perfis desconhecidos.
+    """
+    if ocr_profile is None:
+        return dpi, preprocess_profile
+    profile = OCR_PROFILES.get(ocr_profile)
+    if profile is None:
+        raise ValueError(
+            f"Perfil de OCR desconhecido: {ocr_profile!r} (opções: {', '.join(OCR_PROFILES)})"
+        )
+    return profile.dpi, profile.preprocess
+
+
+def ocr_all_pages_from_bytes(
+    pdf_bytes: bytes,
+    dpi: int = 400,
+    lang: str = "por+eng",
+    workers: int = 1,
+    raster_window: int = 0,
+    page_cache_dir: Optional[str] = None,
+    preprocess_profile: str = DEFAULT_PREPROCESS_PROFILE,
+    raster_backend: str = DEFAULT_RASTER_BACKEND,
+    ocr_profile: Optional[str] = None,
+) -> str:
+    """OCR de todas as páginas, sem leitura nativa.
+
+    Os padrões (400 dpi, perfil "accurate") equivalem a `ocr_profile="accurate"`.
+    """
+    dpi, preprocess_profile = resolve_ocr_profile(ocr_profile, dpi, preprocess_profile)
+    pages = _ocr_pages(
+        pdf_bytes,
+        dpi,
+        _page_ocr_fn(lang, page_cache_dir, preprocess_profile),
+        workers=workers,
+        window=raster_window,
+        raster=raster_backend,
+        fmt="png",
+        thread_count=2,
+    )
+    return "\n\n".join(f"---- página {i} ----\n{txt}" for i, txt in pages).strip()
+
+
+@dataclass(frozen=True)
+class ExtractOptions:
+    """Parâmetros de extração de um PDF (heurísticas, OCR e pós-processamento)."""
+
+    dpi: int = 300
+    lang: str = "por+eng"
+    min_tokens: int = 120
+    repeat_th: float = 0.30
+    repeat_pages_frac: float = 0.6
+    # Páginas desta extração em andamento no pool de OCR (1 = sequencial)
+    ocr_workers: int = 1
+    # Decisão nativo/OCR por página em vez de por arquivo
+    hybrid: bool = False
+    # Páginas rasterizadas por vez no OCR (0 = documento inteiro de uma vez)
+    raster_window: int = 0
+    # Cache de OCR por página (páginas idênticas reconhecidas uma vez)
+    page_cache_dir: Optional[str] = None
+    # Remove cabeçalhos/rodapés repetidos e contadores de página da saída
+    strip_boilerplate: bool = False
+    native_backend: str = native_text.DEFAULT_BACKEND
+    # Perfil do `_preprocess` (None = binarização simples)
+    preprocess_profile: Optional[str] = None
+    raster_backend: str = DEFAULT_RASTER_BACKEND
+    # Perfil de OCR (ver `OCR_PROFILES`); prevalece sobre `dpi` e `preprocess_profile`
+    ocr_profile: Optional[str] = None
+    # OCR primeiro neste dpi; refaz em `dpi` as páginas abaixo de `adaptive_min_conf`
+    adaptive_dpi: Optional[int] = None
+    adaptive_min_conf: float = ADAPTIVE_MIN_CONF
+    # OCR das imagens sem texto nativo sobreposto nas páginas lidas nativamente
+    region_ocr: bool = False
+    # OCR em duas passadas guiado por estas palavras-chave (ver `_ocr_pages_two_pass`)
+    section_keywords: Optional[List[str]] = None
+
+    def resolved(self) -> "ExtractOptions":
+        """Cópia com o `ocr_profile` aplicado a `dpi` e `preprocess_profile`."""
+        dpi, preprocess_profile = resolve_ocr_profile(self.ocr_profile, self.dpi, self.preprocess_profile)
+        return replace(self, dpi=dpi, preprocess_profile=preprocess_profile, ocr_profile=None)
+
+    def key_params(self) -> Dict[str, Any]:
+        """Parâmetros que determinam o texto extraído (chave do cache e do manifesto)."""
+        opts = self.resolved()
+        key_params: Dict[str, Any] = dict(
+            dpi=opts.dpi,
+            lang=opts.lang,
+            min_tokens=opts.min_tokens,
+            repeat_th=opts.repeat_th,
+            repeat_pages_frac=opts.repeat_pages_frac,
+            hybrid=opts.hybrid,
+        )
+        # Só entram na chave quando diferentes do padrão, preservando as entradas já gravadas
+        if opts.strip_boilerplate:
+            key_params["strip_boilerplate"] = True
+        # "auto" entra resolvido: o texto depende do backend efetivamente instalado
+        native_backend = native_text.resolve_backend(opts.native_backend)
+        if native_backend != native_text.DEFAULT_BACKEND:
+            key_params["native_backend"] = native_backend
+        if opts.preprocess_profile is not None:
+            key_params["preprocess_profile"] = opts.preprocess_profile
+        if opts.raster_backend != DEFAULT_RASTER_BACKEND:
+            key_params["raster_backend"] = opts.raster_backend
+        if opts.adaptive_dpi is not None:
+            key_params["adaptive_dpi"] = opts.adaptive_dpi
+            key_params["adaptive_min_conf"] = opts.adaptive_min_conf
+        if opts.region_ocr:
+            key_params["region_ocr"] = True
+        if opts.section_keywords:
+            key_params["section_keywords"] = sorted(opts.section_keywords)
+        return key_params
+
+
+def _options(options: Optional[ExtractOptions], params: Dict[str, Any]) -> ExtractOptions:
+    """`options` (ou os padrões) com os campos passados por nome sobrepostos."""
+    return replace(options or ExtractOptions(), **params)
+
+
+def extract_text(
+    pdf_identifier: str,
+    options: Optional[ExtractOptions] = None,
+    report: Optional[Dict[str, Any]] = None,
+    cache: Optional[TextCache] = None,
+    pdf_bytes: Optional[bytes] = None,
+    **params: Any,
 ) -> str:
-    pdf_bytes = load_pdf_bytes(pdf_identifier)
-    native_pages = extract_native_per_page_from_bytes(pdf_bytes)
-
-    force_ocr, avg_tok, rep_cov = should_force_ocr(
-        native_pages,
-        min_tokens=min_tokens,
-        repeat_threshold=repeat_th,
-        repeat_pages_frac=repeat_pages_frac,
+    """Extrai o texto de um PDF, decidindo entre leitura nativa e OCR.
+
+    Campos de `ExtractOptions` também podem ser passados por nome (`dpi=...`).
+    `report` recebe o modo usado e o caminho de cada página; com `cache`, o
+    texto é buscado/gravado por (conteúdo do PDF, `key_params`); `pdf_bytes`
+    evita ler `pdf_identifier` de novo.
+    """
+    opts = _options(options, params).resolved()
+    if cache is None:
+        return _extract_text_from_bytes(
+            pdf_bytes if pdf_bytes is not None else load_pdf_bytes(pdf_identifier), opts, report
+        )
+
+    # No GCS a identidade vem sempre do md5/generation, mesmo com bytes em mãos,
+    # para que a chave não dependa de o arquivo ter sido pré-carregado.
+    fingerprint = gcs_blob_fingerprint(pdf_identifier) if is_gcs_uri(pdf_identifier) else None
+    if fingerprint is None:
+        if pdf_bytes is None:
+            pdf_bytes = load_pdf_bytes(pdf_identifier)
+        fingerprint = bytes_fingerprint(pdf_bytes)
+    key = cache_key(fingerprint, opts.key_params())
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("[pdf_ocr] text cache hit file=%s chars=%d", pdf_identifier, len(cached))
+        metrics.inc("pdf_files_total", mode="cache")
+        if report is not None:
+            report["mode"] = "cache"
+        return cached
+
+    if pdf_bytes is None:
+        pdf_bytes = load_pdf_bytes(pdf_identifier)
+    text = _extract_text_from_bytes(pdf_bytes, opts, report)
+    cache.put(key, text)
+    return text
+
+
+def _ocr_kw(opts: ExtractOptions) -> Dict[str, Any]:
+    """Argumentos de `_ocr_pages_dpi`/`_ocr_pages_two_pass` vindos das opções."""
+    return dict(
+        page_cache_dir=opts.page_cache_dir,
+        preprocess_profile=opts.preprocess_profile,
+        workers=opts.ocr_workers,
+        window=opts.raster_window,
+        raster=opts.raster_backend,
+        adaptive_dpi=opts.adaptive_dpi,
+        adaptive_min_conf=opts.adaptive_min_conf,
+    )
+
+
+def _ocr_selected_pages(
+    pdf_bytes: bytes,
+    opts: ExtractOptions,
+    report: Optional[Dict[str, Any]],
+    page_numbers: Optional[List[int]] = None,
+) -> List[Tuple[int, str, int]]:
+    """OCR das páginas (todas, sem `page_numbers`) em uma ou duas passadas."""
+    if opts.section_keywords:
+        return _ocr_pages_two_pass(
+            pdf_bytes,
+            opts.dpi,
+            opts.lang,
+            opts.section_keywords,
+            page_numbers=page_numbers,
+            report=report,
+            **_ocr_kw(opts),
+        )
+    return _ocr_pages_dpi(pdf_bytes, opts.dpi, opts.lang, page_numbers=page_numbers, **_ocr_kw(opts))
+
+
+def _region_ocr(
+    pdf_bytes: bytes, opts: ExtractOptions, texts: List[str], page_numbers: Iterable[int]
+) -> Dict[int, int]:
+    return _add_region_ocr(
+        pdf_bytes,
+        texts,
+        page_numbers,
+        opts.dpi,
+        opts.lang,
+        page_cache_dir=opts.page_cache_dir,
+        preprocess_profile=opts.preprocess_profile,
+        workers=opts.ocr_workers,
     )
 
+
+def _extract_text_from_bytes(
+    pdf_bytes: bytes,
+    opts: ExtractOptions,
+    report: Optional[Dict[str, Any]] = None,
+) -> str:
+    native_pages = extract_native_per_page_from_bytes(pdf_bytes, backend=opts.native_backend)
+    if report is not None:
+        report["bytes"] = len(pdf_bytes)
+
+    if opts.hybrid:
+        return _extract_text_hybrid(pdf_bytes, native_pages, opts, report)
+
+    with stage_timer("decision"):
+        force_ocr, avg_tok, rep_cov = should_force_ocr(
+            native_pages,
+            min_tokens=opts.min_tokens,
+            repeat_threshold=opts.repeat_th,
+            repeat_pages_frac=opts.repeat_pages_frac,
+        )
+
     if force_ocr:
-        logger.info("[pdf_ocr] OCR forced for file")
+        logger.info("[pdf_ocr] OCR forced for file workers=%d", opts.ocr_workers)
         # OCR detalhado
-        images = convert_from_bytes(pdf_bytes, dpi=dpi)
-        result = []
-        for i, img in enumerate(images, start=1):
-            gray = img.convert("L")
-            bw = gray.point(lambda x: 0 if x < 200 else 255, "1")
-            txt = pytesseract.image_to_string(bw, lang=lang).strip()
-            result.append(f"---- página {i} ----\n{txt}")
+        pages = _ocr_selected_pages(pdf_bytes, opts, report)
+        texts = [txt for _, txt, _ in pages]
+        if opts.strip_boilerplate:
+            texts = _strip_pages(texts, opts.repeat_pages_frac, report)
+        result = _format_pages(texts)
         text = "\n\n".join(result).strip()
         logger.info("[pdf_ocr] OCR finished pages=%d chars=%d", len(result), len(text))
+        _count_file("ocr", ocr_pages=len(pages), native_pages=0)
+        if report is not None:
+            report["mode"] = "ocr"
+            report["pages"] = [{"page": n, "path": "ocr", "dpi": used} for n, _, used in pages]
         return text
 
     # Nativo OK
     logger.info("[pdf_ocr] Native extraction ok")
+    texts = [(page or "").strip() for page in native_pages]
+    region_counts: Dict[int, int] = {}
+    if opts.region_ocr:
+        region_counts = _region_ocr(pdf_bytes, opts, texts, range(1, len(texts) + 1))
+    if opts.strip_boilerplate:
+        texts = _strip_pages(texts, opts.repeat_pages_frac, report)
     result = []
-    for i, page in enumerate(native_pages, start=1):
-        if not (page or "").strip():
+    for i, page in enumerate(texts, start=1):
+        if not page:
             continue
-        result.append(f"---- página {i} ----\n{(page or '').strip()}")
+        result.append(f"---- página {i} ----\n{page}")
     text = "\n\n".join(result).strip()
     logger.info("[pdf_ocr] Native finished pages=%d chars=%d", len(result), len(text))
+    _count_file("native", ocr_pages=0, native_pages=len(native_pages))
+    if report is not None:
+        report["mode"] = "native"
+        report["pages"] = [
+            _native_page_entry(i, region_counts) for i in range(1, len(native_pages) + 1)
+        ]
+    return text
+
+
+def _native_page_entry(page: int, region_counts: Dict[int, int]) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"page": page, "path": "native"}
+    if page in region_counts:
+        entry["ocr_regions"] = region_counts[page]
+    return entry
+
+
+def _extract_text_hybrid(
+    pdf_bytes: bytes,
+    native_pages: List[str],
+    opts: ExtractOptions,
+    report: Optional[Dict[str, Any]] = None,
+) -> str:
+    with stage_timer("decision"):
+        decisions = page_ocr_decisions(
+            native_pages,
+            min_tokens=opts.min_tokens,
+            repeat_threshold=opts.repeat_th,
+            repeat_pages_frac=opts.repeat_pages_frac,
+        )
+    ocr_pages = [i for i, need in enumerate(decisions, start=1) if need]
+    ocr_texts: Dict[int, str] = {}
+    ocr_dpis: Dict[int, int] = {}
+    if ocr_pages:
+        logger.info(
+            "[pdf_ocr] hybrid OCR pages=%d/%d workers=%d",
+            len(ocr_pages),
+            len(native_pages),
+            opts.ocr_workers,
+        )
+        for n, txt, used in _ocr_selected_pages(pdf_bytes, opts, report, page_numbers=ocr_pages):
+            ocr_texts[n], ocr_dpis[n] = txt, used
+
+    paths = [
+        {"page": i, "path": "ocr", "dpi": ocr_dpis[i]} if i in ocr_texts else {"page": i, "path": "native"}
+        for i in range(1, len(native_pages) + 1)
+    ]
+    texts = [
+        ocr_texts[i] if i in ocr_texts else (page or "").strip()
+        for i, page in enumerate(native_pages, start=1)
+    ]
+    if opts.region_ocr:
+        region_counts = _region_ocr(
+            pdf_bytes, opts, texts, [i for i in range(1, len(native_pages) + 1) if i not in ocr_texts]
+        )
+        paths = [
+            _native_page_entry(p["page"], region_counts) if p["path"] == "native" else p
+            for p in paths
+        ]
+    if opts.strip_boilerplate:
+        texts = _strip_pages(texts, opts.repeat_pages_frac, report)
+    result: List[str] = []
+    for i, txt in enumerate(texts, start=1):
+        if not txt:
+            continue
+        result.append(f"---- página {i} ----\n{txt}")
+    text = "\n\n".join(result).strip()
+    logger.info(
+        "[pdf_ocr] Hybrid finished pages=%d ocr=%d chars=%d",
+        len(result),
+        len(ocr_texts),
+        len(text),
+    )
+    _count_file("hybrid", ocr_pages=len(ocr_texts), native_pages=len(native_pages) - len(ocr_texts))
+    if report is not None:
+        report["mode"] = "hybrid"
+        report["pages"] = paths
     return text
 
 
+PREFETCH_MAX_BYTES = 256 * 1024 * 1024
+# Teto de downloads simultâneos, qualquer que seja o `prefetch` do payload
+PREFETCH_MAX_WORKERS = int(os.environ.get("PREFETCH_MAX_WORKERS", "8"))
+# Reserva por download em andamento até o primeiro terminar (depois, a média dos baixados)
+PREFETCH_ESTIMATE_BYTES = 16 * 1024 * 1024
+
+
+def _prefetch_pdf_bytes(
+    pdf_identifiers: List[str],
+    prefetch: int,
+    max_bytes: int = PREFETCH_MAX_BYTES,
+) -> Iterator[Tuple[str, Optional[bytes], Optional[Exception]]]:
+    """Baixa até `prefetch` PDFs (e `max_bytes`) à frente; gera `(ident, bytes, erro)` em ordem.
+
+    Downloads em andamento reservam o tamanho médio dos já concluídos, então
+    `max_bytes` limita também quantos rodam ao mesmo tempo.
+    """
+    prefetch = max(1, min(prefetch, PREFETCH_MAX_WORKERS))
+    pending: deque = deque()
+    remaining = iter(pdf_identifiers)
+    seen = {"files": 0, "bytes": 0}
+
+    def estimate() -> int:
+        if not seen["files"]:
+            return PREFETCH_ESTIMATE_BYTES
+        return seen["bytes"] // seen["files"]
+
+    def reserved() -> int:
+        total = 0
+        for _, fut in pending:
+            if not fut.done():
+                total += estimate()
+            elif fut.exception() is None:
+                total += len(fut.result())
+        return total
+
+    def record(fut: Any) -> None:
+        if fut.exception() is None:
+            seen["bytes"] += len(fut.result())
+            seen["files"] += 1
+
+    with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="pdf-prefetch") as ex:
+
+        def top_up() -> None:
+            while len(pending) < prefetch:
+                if pending and reserved() >= max_bytes:
+                    logger.debug("[pdf_ocr] prefetch paused reserved>=%d", max_bytes)
+                    return
+                ident = next(remaining, None)
+                if ident is None:
+                    return
+                fut = ex.submit(load_pdf_bytes, ident)
+                fut.add_done_callback(record)
+                pending.append((ident, fut))
+
+        top_up()
+        while pending:
+            ident, fut = pending.popleft()
+            try:
+                data: Optional[bytes] = fut.result()
+                err: Optional[Exception] = None
+            except Exception as exc:
+                data, err = None, exc
+            # Dispara os próximos downloads antes de devolver o arquivo atual,
+            # para que a rede trabalhe enquanto o chamador extrai/OCR.
+            top_up()
+            yield ident, data, err
+
+
 def concat_many_pdfs_to_text(
     pdf_identifiers: List[str],
-    dpi: int,
-    lang: str,
-    min_tokens: int,
-    repeat_th: float,
-    repeat_pages_frac: float,
+    options: Optional[ExtractOptions] = None,
+    reports: Optional[Dict[str, Dict[str, Any]]] = None,
+    cache: Optional[TextCache] = None,
+    prefetch: int = 0,
+    prefetch_max_bytes: int = PREFETCH_MAX_BYTES,
+    on_file_done: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    texts: Optional[Dict[str, str]] = None,
+    **params: Any,
 ) -> str:
+    """Extrai e concatena vários PDFs, na ordem recebida (opções como em `extract_text`).
+
+    `prefetch > 0` baixa os próximos arquivos durante a extração do atual;
+    `on_file_done(ident, report)` é chamado ao fim de cada arquivo e `texts`
+    recebe o texto de cada arquivo extraído sem erro.
+    """
+    opts = _options(options, params)
     parts: List[str] = []
-    for ident in pdf_identifiers:
+    if prefetch > 0:
+        source = _prefetch_pdf_bytes(pdf_identifiers, prefetch, max_bytes=prefetch_max_bytes)
+    else:
+        source = ((ident, None, None) for ident in pdf_identifiers)
+    for ident, pdf_bytes, load_err in source:
         try:
             logger.info("[pdf_ocr] processing file=%s", ident)
+            if load_err is not None:
+                raise load_err
+            report: Optional[Dict[str, Any]] = None
+            if reports is not None:
+                report = reports.setdefault(ident, {})
             txt = extract_text(
-                pdf_identifier=ident,
-                dpi=dpi,
-                lang=lang,
-                min_tokens=min_tokens,
-                repeat_th=repeat_th,
-                repeat_pages_frac=repeat_pages_frac,
+                pdf_identifier=ident, options=opts, report=report, cache=cache, pdf_bytes=pdf_bytes
             )
             logger.info("[pdf_ocr] processed file=%s chars=%d", ident, len(txt))
+            if texts is not None:
+                texts[ident] = txt
         except Exception as exc:  # pragma: no cover
             logger.exception("[pdf_ocr] error processing file=%s", ident)
             txt = f"[erro] {ident}: {exc}"
+            if reports is not None:
+                reports.setdefault(ident, {})["error"] = str(exc)
 
-        header = f"---- {os.path.basename(ident)} ----"
-        parts.append(f"{header}\n{txt.strip()}")
+        parts.append(concat_part(ident, txt))
+        if on_file_done is not None:
+            on_file_done(ident, (reports or {}).get(ident, {}))
 
     return "\n\n".join(parts).strip()
+
+
+def concat_part(ident: str, text: str) -> str:
+    """Trecho de um arquivo no TXT concatenado (cabeçalho com o nome + texto)."""
+    header = f"---- {os.path.basename(ident)} ----"
+    return f"{header}\n{text.strip()}"
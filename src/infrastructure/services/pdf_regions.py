@@ -0,0 +1,113 @@
+"""
+Image regions of a PDF page that carry no native text.
+
+Walks the page content stream with PyPDF2's visitors: each image XObject drawn
+with `Do` is placed by the current transformation matrix, and each text run
+gives an origin point. Images large enough to matter with no text origin
+inside (scanned signature pages, stamped tables pasted as pictures) are the
+regions worth OCR on pages that are otherwise read natively.
+"""
+from __future__ import annotations
+
+import logging
+from io import BytesIO
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# Imagens menores que esta fração da área da página (logos, ícones) são ignoradas
+MIN_REGION_FRAC = 0.01
+
+
+class Region(NamedTuple):
+    """Retângulo em pontos, com origem no canto superior esquerdo da mediabox
+    (mesma orientação da página rasterizada)."""
+
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+    @property
+    def area(self) -> float:
+        return max(0.0, self.x1 - self.x0) * max(0.0, self.y1 - self.y0)
+
+    def contains(self, x: float, y: float) -> bool:
+        return self.x0 <= x <= self.x1 and self.y0 <= y <= self.y1
+
+
+def _apply(m: Sequence[float], x: float, y: float) -> Tuple[float, float]:
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def _image_names(page: Any) -> set:
+    """Nomes dos XObjects de imagem declarados nos recursos da página."""
+    try:
+        xobjects = page["/Resources"]["/XObject"].get_object()
+    except Exception:
+        return set()
+    names = set()
+    for name, ref in xobjects.items():
+        try:
+            if ref.get_object().get("/Subtype") == "/Image":
+                names.add(name)
+        except Exception:
+            continue
+    return names
+
+
+def page_regions(page: Any, min_area_frac: float = MIN_REGION_FRAC) -> List[Region]:
+    """Regiões de imagem da página sem nenhum texto nativo sobreposto.
+
+    Só considera imagens desenhadas direto no conteúdo da página (não dentro
+    de Form XObjects) e páginas sem `/Rotate`.
+    """
+    names = _image_names(page)
+    if not names or int(page.get("/Rotate", 0) or 0) % 360:
+        return []
+    box = page.mediabox
+    left, bottom = float(box.left), float(box.bottom)
+    width, height = float(box.width), float(box.height)
+    images: List[Region] = []
+    text_points: List[Tuple[float, float]] = []
+
+    def before(op: Any, args: Any, cm: Sequence[float], tm: Sequence[float]) -> None:
+        if op != b"Do" or not args or args[0] not in names:
+            return
+        corners = [_apply(cm, x, y) for x, y in ((0, 0), (1, 0), (0, 1), (1, 1))]
+        xs = [c[0] - left for c in corners]
+        ys = [height - (c[1] - bottom) for c in corners]
+        region = Region(max(0.0, min(xs)), max(0.0, min(ys)), min(width, max(xs)), min(height, max(ys)))
+        if region.area >= min_area_frac * width * height:
+            images.append(region)
+
+    def on_text(text: str, cm: Sequence[float], tm: Sequence[float], font: Any, size: Any) -> None:
+        if text.strip():
+            x, y = _apply(cm, tm[4], tm[5])
+            text_points.append((x - left, height - (y - bottom)))
+
+    page.extract_text(visitor_operand_before=before, visitor_text=on_text)
+    return [r for r in images if not any(r.contains(x, y) for x, y in text_points)]
+
+
+def find_text_free_regions(
+    pdf_bytes: bytes,
+    page_numbers: Optional[Iterable[int]] = None,
+    min_area_frac: float = MIN_REGION_FRAC,
+) -> Dict[int, List[Region]]:
+    """`{página: [regiões]}` (1-based) das páginas pedidas que têm regiões para OCR."""
+    out: Dict[int, List[Region]] = {}
+    with BytesIO(pdf_bytes) as bio:
+        reader = PdfReader(bio)
+        numbers = list(page_numbers) if page_numbers is not None else range(1, len(reader.pages) + 1)
+        for n in numbers:
+            try:
+                regions = page_regions(reader.pages[n - 1], min_area_frac=min_area_frac)
+            except Exception:
+                logger.exception("[pdf_regions] page analysis failed page=%d", n)
+                continue
+            if regions:
+                out[n] = regions
+    return out
@@ -0,0 +1,185 @@
+"""
+Per-prefix manifest for incremental reprocessing.
+
+`<pdfs_dir>/_manifest/manifest.json` records, for each PDF processed under the
+prefix, its fingerprint (the GCS generation, taken from the prefix listing
+when available), the extraction parameters and where its text was stored
+(`_manifest/texts/<chave>.txt`, keyed like the text cache). It also records the last concatenated TXT and the
+per-file texts it was built from, so a run where nothing changed can return
+that TXT (after checking it still exists) instead of writing a new one.
+
+Concurrent runs on the same prefix are not coordinated: the last one to save
+wins, and files it did not see are extracted again on the next run.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.infrastructure.services import gcs_pool
+
+logger = logging.getLogger(__name__)
+
+# 2: fingerprint pela generation do blob (antes, md5)
+MANIFEST_VERSION = 2
+MANIFEST_DIR = "_manifest"
+MANIFEST_NAME = "manifest.json"
+
+# (identificador do PDF, URI do texto) na ordem do TXT concatenado
+ConcatParts = List[Tuple[str, str]]
+
+
+class Manifest:
+    def __init__(
+        self,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+        concat: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.files: Dict[str, Dict[str, Any]] = dict(files or {})
+        self.concat = concat
+
+    def text_uri(self, ident: str, fingerprint: Optional[str], params: Dict[str, Any]) -> Optional[str]:
+        """URI do texto guardado para `ident`, se o conteúdo e os parâmetros não mudaram."""
+        entry = self.files.get(ident)
+        if entry is None or fingerprint is None:
+            return None
+        if entry.get("fingerprint") != fingerprint or entry.get("params") != params:
+            return None
+        return entry.get("text_uri")
+
+    def record(
+        self, ident: str, fingerprint: str, params: Dict[str, Any], text_uri: str, chars: int
+    ) -> None:
+        self.files[ident] = {
+            "fingerprint": fingerprint,
+            "params": params,
+            "text_uri": text_uri,
+            "chars": chars,
+        }
+
+    def concat_uri(self, parts: ConcatParts) -> Optional[str]:
+        """TXT concatenado da última execução, se montado exatamente destes textos."""
+        if not self.concat or [tuple(p) for p in self.concat.get("parts", [])] != list(parts):
+            return None
+        return self.concat.get("txt_uri")
+
+    def set_concat(self, txt_uri: str, parts: ConcatParts) -> None:
+        self.concat = {"txt_uri": txt_uri, "parts": [list(p) for p in parts]}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"v": MANIFEST_VERSION, "files": self.files, "concat": self.concat}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "Manifest":
+        # Versão diferente: começa do zero (tudo é extraído de novo)
+        if not data or data.get("v") != MANIFEST_VERSION:
+            return cls()
+        return cls(data.get("files"), data.get("concat"))
+
+
+class ManifestStore:
+    """Leitura/gravação do manifesto e dos textos por arquivo de um prefixo."""
+
+    def load(self) -> Manifest:
+        raw = self._read(MANIFEST_NAME)
+        try:
+            return Manifest.from_dict(json.loads(raw) if raw is not None else None)
+        except ValueError:
+            logger.warning("[prefix_manifest] invalid manifest ignored dir=%s", self.location)
+            return Manifest()
+
+    def save(self, manifest: Manifest) -> None:
+        self._write(MANIFEST_NAME, json.dumps(manifest.to_dict(), ensure_ascii=False))
+
+    def read_text(self, uri: str) -> Optional[str]:
+        """Texto guardado em `uri` (None se não existir mais)."""
+        return self._read_uri(uri)
+
+    def write_text(self, key: str, text: str) -> str:
+        return self._write(f"texts/{key}.txt", text)
+
+    def exists(self, uri: str) -> bool:
+        """Se o objeto em `uri` ainda existe (sem baixar o conteúdo)."""
+        return self._exists_uri(uri)
+
+    location = ""
+
+    def _read(self, name: str) -> Optional[str]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def _read_uri(self, uri: str) -> Optional[str]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def _write(self, name: str, text: str) -> str:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def _exists_uri(self, uri: str) -> bool:  # pragma: no cover - interface
+        raise NotImplementedError
+
+
+class LocalManifestStore(ManifestStore):
+    def __init__(self, pdfs_dir: str) -> None:
+        self.root = Path(pdfs_dir) / MANIFEST_DIR
+        self.location = str(self.root)
+
+    def _read(self, name: str) -> Optional[str]:
+        return self._read_uri(str(self.root / name))
+
+    def _read_uri(self, uri: str) -> Optional[str]:
+        try:
+            return Path(uri).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def _exists_uri(self, uri: str) -> bool:
+        return Path(uri).is_file()
+
+    def _write(self, name: str, text: str) -> str:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+        return str(path)
+
+
+class GcsManifestStore(ManifestStore):  # pragma: no cover - runtime only
+    def __init__(self, pdfs_dir: str) -> None:
+        from src.infrastructure.services.pdf_ocr import parse_gcs_uri
+
+        self.bucket_name, prefix = parse_gcs_uri(pdfs_dir)
+        self.prefix = f"{prefix}/{MANIFEST_DIR}" if prefix else MANIFEST_DIR
+        self.location = f"gs://{self.bucket_name}/{self.prefix}"
+
+    def _read(self, name: str) -> Optional[str]:
+        return self._read_uri(f"{self.location}/{name}")
+
+    def _read_uri(self, uri: str) -> Optional[str]:
+        from src.infrastructure.services.pdf_ocr import gcs_read_text
+
+        return gcs_read_text(uri)
+
+    def _exists_uri(self, uri: str) -> bool:
+        from src.infrastructure.services.pdf_ocr import parse_gcs_uri
+
+        bucket_name, key = parse_gcs_uri(uri)
+        # Um GET de metadados, sem baixar o objeto
+        return gcs_pool.get_client().bucket(bucket_name).get_blob(key) is not None
+
+    def _write(self, name: str, text: str) -> str:
+        key = f"{self.prefix}/{name}"
+        blob = gcs_pool.get_client().bucket(self.bucket_name).blob(key)
+        content_type = "application/json" if name.endswith(".json") else "text/plain; charset=utf-8"
+        blob.upload_from_string(text, content_type=content_type)
+        return f"gs://{self.bucket_name}/{key}"
+
+
+def open_manifest_store(pdfs_dir: str) -> ManifestStore:
+    """Store do manifesto de `pdfs_dir` (gs://bucket/prefix ou diretório local)."""
+    from src.infrastructure.services.pdf_ocr import is_gcs_uri
+
+    return GcsManifestStore(pdfs_dir) if is_gcs_uri(pdfs_dir) else LocalManifestStore(pdfs_dir)
@@ -0,0 +1,326 @@
+"""
+Content-addressed cache of extracted PDF text.
+
+Keys combine the PDF fingerprint (SHA-256 of the bytes or the GCS md5/generation)
+with every parameter that changes the extracted text (dpi, lang, heuristics...).
+Backends: local disk and GCS, both with size-based LRU eviction.
+
+Cache locations come only from server configuration (`TEXT_CACHE_DIR`), never
+from request payloads. Entries live in a dedicated namespace under the root and
+eviction only considers files named like cache keys inside it, so nothing else
+stored next to the cache is ever deleted. Eviction is amortized: each process
+keeps a running size estimate and only scans the namespace when the estimate
+crosses `max_bytes` (or every `SCAN_INTERVAL` seconds), evicting down to
+`LOW_WATER` of the limit.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.infrastructure.services import gcs_pool
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando a forma de gerar o texto mudar (invalida entradas antigas)
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+# Subdiretório/prefixo das entradas sob a raiz configurada
+TEXT_NAMESPACE = "pdf-text-cache"
+
+# Varredura completa só quando a estimativa de tamanho passa do limite (ou a
+# cada SCAN_INTERVAL segundos, para ver o que outros processos gravaram); a
+# eviction desce até LOW_WATER do limite
+LOW_WATER = 0.9
+SCAN_INTERVAL = 300.0
+# No GCS o `last_access` só é regravado em hits depois desse intervalo
+ATIME_RESOLUTION = 3600.0
+
+# Chaves aceitas: sem separadores de caminho nem pontos
+_KEY_RE = re.compile(r"^[0-9A-Za-z_-]{1,128}$")
+
+
+def cache_key(fingerprint: str, params: Dict[str, Any]) -> str:
+    """Chave estável para (fingerprint do PDF, parâmetros de extração)."""
+    payload = json.dumps(
+        {"v": CACHE_VERSION, "pdf": fingerprint, "params": params},
+        sort_keys=True,
+        ensure_ascii=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def bytes_fingerprint(pdf_bytes: bytes) -> str:
+    return "sha256:" + hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _checked_key(key: str) -> str:
+    if not _KEY_RE.match(key):
+        raise ValueError(f"Chave de cache inválida: {key!r}")
+    return key
+
+
+class TextCache:
+    """Interface base: `get`/`put` com contadores de hit/miss e eviction amortizada.
+
+    Subclasses implementam `_get`, `_put` (devolve os bytes gravados) e
+    `_evict(target)` (devolve entradas removidas e tamanho restante).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+        self.scans = 0
+        self._lock = threading.Lock()
+        # Tamanho estimado desde a última varredura (gravações deste processo somadas)
+        self._estimated = 0
+        self._scanned_at = float("-inf")
+        self._scanning = False
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self._get(_checked_key(key))
+        except Exception:
+            logger.exception("[text_cache] get failed key=%s", key)
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        logger.debug("[text_cache] get key=%s hit=%s", key, value is not None)
+        return value
+
+    def put(self, key: str, text: str) -> None:
+        try:
+            written = self._put(_checked_key(key), text)
+            evicted = self._maybe_evict(written)
+        except Exception:
+            logger.exception("[text_cache] put failed key=%s", key)
+            return
+        with self._lock:
+            self.puts += 1
+            self.evictions += evicted
+
+    def _maybe_evict(self, written: int) -> int:
+        """Varre e evicta só quando a estimativa passa do limite ou a última varredura é antiga."""
+        with self._lock:
+            self._estimated += written
+            due = (
+                self._estimated > self.max_bytes
+                or time.monotonic() - self._scanned_at >= SCAN_INTERVAL
+            )
+            if not due or self._scanning:
+                return 0
+            self._scanning = True
+        try:
+            evicted, total = self._evict(int(self.max_bytes * LOW_WATER))
+        finally:
+            with self._lock:
+                self._scanning = False
+        with self._lock:
+            self._estimated = total
+            self._scanned_at = time.monotonic()
+            self.scans += 1
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "puts": self.puts,
+                "evictions": self.evictions,
+            }
+
+    def _get(self, key: str) -> Optional[str]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def _put(self, key: str, text: str) -> int:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def _evict(self, target: int) -> Tuple[int, int]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+
+def _evict_oldest(
+    entries: List[Tuple[float, int, Any]], max_bytes: int, target: int, delete: Any
+) -> Tuple[int, int]:
+    """Remove as entradas mais antigas até `target` quando o total passa de `max_bytes`."""
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return 0, total
+    evicted = 0
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= target:
+            break
+        delete(entry)
+        total -= size
+        evicted += 1
+    return evicted, total
+
+
+class LocalDiskTextCache(TextCache):
+    """Um arquivo por chave em `root/<namespace>/<aa>/<chave>.txt`; LRU pelo mtime (atualizado no hit)."""
+
+    def __init__(
+        self, root: str, max_bytes: int = DEFAULT_MAX_BYTES, namespace: str = TEXT_NAMESPACE
+    ) -> None:
+        super().__init__(max_bytes=max_bytes)
+        self.root = Path(root) / namespace
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.txt"
+
+    def _get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        os.utime(path, None)
+        return text
+
+    def _put(self, key: str, text: str) -> int:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        data = text.encode("utf-8")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        out: List[Tuple[float, int, Path]] = []
+        for p in self.root.glob("*/*.txt"):
+            # Só arquivos gravados pelo cache: nome de chave dentro do shard certo
+            if not _KEY_RE.match(p.stem) or p.parent.name != p.stem[:2]:
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _evict(self, target: int) -> Tuple[int, int]:
+        def delete(p: Path) -> None:
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+        evicted, total = _evict_oldest(self._entries(), self.max_bytes, target, delete)
+        if evicted:
+            logger.info("[text_cache] local evicted=%d size=%d root=%s", evicted, total, self.root)
+        return evicted, total
+
+
+class GcsTextCache(TextCache):  # pragma: no cover - runtime only
+    """Objetos `gs://bucket/prefix/<namespace>/<chave>.txt`; LRU pelo metadado `last_access`."""
+
+    def __init__(
+        self, dir_uri: str, max_bytes: int = DEFAULT_MAX_BYTES, namespace: str = TEXT_NAMESPACE
+    ) -> None:
+        super().__init__(max_bytes=max_bytes)
+        from src.infrastructure.services.pdf_ocr import parse_gcs_uri
+
+        self.bucket_name, prefix = parse_gcs_uri(dir_uri)
+        self.prefix = f"{prefix}/{namespace}" if prefix else namespace
+
+    def _bucket(self):
+        return gcs_pool.get_client().bucket(self.bucket_name)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}.txt"
+
+    def _get(self, key: str) -> Optional[str]:
+        blob = self._bucket().get_blob(self._key(key))
+        if blob is None:
+            return None
+        text = blob.download_as_bytes().decode("utf-8")
+        # `last_access` grosso: um patch por entrada a cada ATIME_RESOLUTION, não por hit
+        last = float((blob.metadata or {}).get("last_access") or 0)
+        if time.time() - last >= ATIME_RESOLUTION:
+            blob.metadata = {"last_access": f"{time.time():.0f}"}
+            blob.patch()
+        return text
+
+    def _put(self, key: str, text: str) -> int:
+        blob = self._bucket().blob(self._key(key))
+        blob.metadata = {"last_access": f"{time.time():.0f}"}
+        data = text.encode("utf-8")
+        blob.upload_from_string(data, content_type="text/plain; charset=utf-8")
+        return len(data)
+
+    def _evict(self, target: int) -> Tuple[int, int]:
+        bucket = self._bucket()
+        list_prefix = self.prefix + "/"
+        entries = []
+        for b in bucket.client.list_blobs(bucket, prefix=list_prefix, delimiter="/"):
+            name = b.name[len(list_prefix):]
+            if not name.endswith(".txt") or not _KEY_RE.match(name[: -len(".txt")]):
+                continue
+            last = float((b.metadata or {}).get("last_access") or b.updated.timestamp())
+            entries.append((last, int(b.size or 0), b))
+        evicted, total = _evict_oldest(entries, self.max_bytes, target, lambda b: b.delete())
+        if evicted:
+            logger.info("[text_cache] gcs evicted=%d size=%d prefix=%s", evicted, total, self.prefix)
+        return evicted, total
+
+
+_caches: Dict[Tuple[str, int, str], TextCache] = {}
+_caches_lock = threading.Lock()
+
+
+def open_text_cache(
+    location: str, max_bytes: int = DEFAULT_MAX_BYTES, namespace: str = TEXT_NAMESPACE
+) -> TextCache:
+    """Instância compartilhada no processo para `location` (gs://... ou diretório local).
+
+    Reutilizar a instância mantém os contadores e a estimativa de tamanho entre requisições.
+    """
+    from src.infrastructure.services.pdf_ocr import is_gcs_uri
+
+    with _caches_lock:
+        cache = _caches.get((location, max_bytes, namespace))
+        if cache is None:
+            if is_gcs_uri(location):
+                cache = GcsTextCache(location, max_bytes=max_bytes, namespace=namespace)
+            else:
+                cache = LocalDiskTextCache(location, max_bytes=max_bytes, namespace=namespace)
+            _caches[(location, max_bytes, namespace)] = cache
+        return cache
+
+
+def text_cache_from_env() -> Optional[TextCache]:
+    """Cache de texto configurado no servidor: `TEXT_CACHE_DIR` e `TEXT_CACHE_MAX_BYTES` (None sem diretório)."""
+    location = os.environ.get("TEXT_CACHE_DIR")
+    if not location:
+        return None
+    return open_text_cache(location, int(os.environ.get("TEXT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+
+
+def _reset_after_fork() -> None:
+    global _caches_lock
+    _caches_lock = threading.Lock()
+    for cache in _caches.values():
+        cache._lock = threading.Lock()
+        cache._scanning = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -13,10 +13,7 @@ import re
 import requests
 import logging
 
-try:  # optional GCS
-    from google.cloud import storage  # type: ignore
-except Exception:  # pragma: no cover
-    storage = None  # type: ignore
+from src.infrastructure.services import gcs_pool
 
 
 def is_gcs_uri(s: str) -> bool:
@@ -33,11 +30,7 @@ def parse_gcs_uri(uri: str) -> Tuple[str, str]:
 
 
 def gcs_client():  # pragma: no cover
-    if storage is None:
-        raise RuntimeError(
-            "google-cloud-storage não instalado. pip install google-cloud-storage"
-        )
-    return storage.Client()
+    return gcs_pool.get_client()
 
 
 def gcs_write_json(gs_dir: str, filename: str, payload: Dict[str, Any]) -> str:  # pragma: no cover
@@ -1,7 +1,11 @@
 from src.controller.app import app
 from src.application.extrator_dados_debenture import ResourceExtratorDadosDebenture
+from src.application.metrics import ResourceMetrics
+from src.application.pdf_processor import ResourcePdfJob
 
 def create_routes(app_instance=None):
     """Creates Routes"""
     api = app if app_instance is None else app_instance
-    api.create_route(ResourceExtratorDadosDebenture, "/extrator_dados_debenture")
\ No newline at end of file
+    api.create_route(ResourceExtratorDadosDebenture, "/extrator_dados_debenture")
+    api.create_route(ResourcePdfJob, "/extrator_dados_debenture/jobs/<string:job_id>")
+    api.create_route(ResourceMetrics, "/metrics")
\ No newline at end of file
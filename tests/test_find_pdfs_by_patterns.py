@@ -9,14 +9,18 @@ class TestFindPdfsByPatterns(unittest.TestCase):
         from src.infrastructure.services import pdf_ocr as ocr
         self.ocr = ocr
 
-    # GCS branch: mocks is_gcs_uri True and gcs_list_pdfs results
+    # GCS branch: mocks the prefix listing that feeds the name index
     def test_gcs_branch_with_patterns_and_sort(self):
-        with mock.patch.object(self.ocr, "is_gcs_uri", return_value=True), \
-             mock.patch.object(self.ocr, "gcs_list_pdfs", return_value=[
-                 "gs://bkt/prefix/Álbum-contrato.pdf",
-                 "gs://bkt/prefix/EsCritura-2020.pdf",
-                 "gs://bkt/prefix/Manual-xyz.pdf",
-                 "gs://bkt/prefix/outro.pdf",
+        from src.infrastructure.services import name_index
+
+        name_index._indexes.clear()
+        self.addCleanup(name_index._indexes.clear)
+        with mock.patch.dict("os.environ", {"NAME_INDEX_DIR": ""}), \
+             mock.patch.object(self.ocr, "_gcs_list_pdf_blobs", return_value=[
+                 ("prefix/Álbum-contrato.pdf", 1),
+                 ("prefix/EsCritura-2020.pdf", 1),
+                 ("prefix/Manual-xyz.pdf", 1),
+                 ("prefix/outro.pdf", 1),
              ]):
             hits = self.ocr.find_pdfs_by_patterns(
                 "gs://bkt/prefix", ["escritura", "contrato", "manual"], recursive=True
@@ -0,0 +1,170 @@
+import unittest
+from unittest import mock
+
+
+class _Blob:
+    def __init__(self, name, generation=1):
+        self.name, self.generation = name, generation
+
+
+class _FakeClient:
+    """Bucket em memória: `objects` = {nome: generation}."""
+
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.list_calls = []
+        self.get_calls = []
+
+    def list_blobs(self, bucket, prefix="", delimiter=None, fields=None):
+        self.list_calls.append({"prefix": prefix, "delimiter": delimiter, "fields": fields})
+        for name in sorted(self.objects):
+            rest = name[len(prefix):]
+            if name.startswith(prefix) and not (delimiter and delimiter in rest):
+                yield _Blob(name, self.objects[name])
+
+    def bucket(self, name):
+        return self
+
+    def get_blob(self, key):
+        self.get_calls.append(key)
+        return _Blob(key, self.objects[key]) if key in self.objects else None
+
+
+class TestGcsListing(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import gcs_listing, metrics, pdf_ocr
+        self.mod = gcs_listing
+        self.ocr = pdf_ocr
+        self.metrics = metrics
+        metrics.reset()
+        gcs_listing.get_cache().clear()
+        self.client = _FakeClient({
+            "in/a.pdf": 1,
+            "in/b.PDF": 1,
+            "in/notas.txt": 1,
+            "in/sub/c.pdf": 1,
+        })
+        patcher = mock.patch.object(self.ocr, "gcs_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(gcs_listing.get_cache().clear)
+
+    def test_non_recursive_uses_delimiter_and_projection(self):
+        out = self.ocr.gcs_list_pdfs("gs://bk/in", recursive=False)
+        self.assertEqual(out, ["gs://bk/in/a.pdf", "gs://bk/in/b.PDF"])
+        call = self.client.list_calls[0]
+        self.assertEqual(call["prefix"], "in/")
+        self.assertEqual(call["delimiter"], "/")
+        self.assertIn("name", call["fields"])
+
+        recursive = self.ocr.gcs_list_pdfs("gs://bk/in")
+        self.assertEqual(recursive, ["gs://bk/in/a.pdf", "gs://bk/in/b.PDF", "gs://bk/in/sub/c.pdf"])
+        self.assertIsNone(self.client.list_calls[1]["delimiter"])
+
+    def test_listing_is_cached_until_ttl(self):
+        now = [0.0]
+        cache = self.mod.ListingCache(ttl=30, clock=lambda: now[0])
+        with mock.patch.object(self.mod, "_cache", cache):
+            self.ocr.gcs_list_pdfs("gs://bk/in")
+            self.ocr.gcs_list_pdfs("gs://bk/in")
+            self.assertEqual(len(self.client.list_calls), 1)
+            now[0] = 31.0
+            self.ocr.gcs_list_pdfs("gs://bk/in")
+            self.assertEqual(len(self.client.list_calls), 2)
+        self.assertEqual(self.metrics.get("gcs_list_cache_total", result="hit"), 1)
+
+    def test_file_names_resolve_by_direct_lookup(self):
+        out = self.ocr.gcs_list_pdfs("gs://bk/in", file_names=["b.PDF", "a.pdf", "notas.txt", "a.pdf"])
+        self.assertEqual(out, ["gs://bk/in/b.PDF", "gs://bk/in/a.pdf"])
+        self.assertEqual(sorted(self.client.get_calls), ["in/a.pdf", "in/b.PDF"])
+        self.assertEqual(self.client.list_calls, [])
+
+        # Nome fora do nível do prefixo: cai na listagem recursiva, por nome de arquivo
+        out = self.ocr.gcs_list_pdfs("gs://bk/in", file_names=["c.pdf", "x.pdf"])
+        self.assertEqual(out, ["gs://bk/in/sub/c.pdf"])
+        self.assertEqual(len(self.client.list_calls), 1)
+
+    def test_file_names_prefer_the_prefix_level(self):
+        self.client.objects["in/sub/a.pdf"] = 1
+        self.client.objects["in/sub/d.pdf"] = 1
+        self.client.objects["in/sub2/d.pdf"] = 1
+        # Encontrado em `in/a.pdf`: a cópia de mesmo nome na subpasta não entra
+        out = self.ocr.gcs_list_pdfs("gs://bk/in", file_names=["d.pdf", "a.pdf"])
+        # Ordem de `file_names`; nomes só em subpastas trazem todas as cópias, na ordem da listagem
+        self.assertEqual(out, ["gs://bk/in/sub/d.pdf", "gs://bk/in/sub2/d.pdf", "gs://bk/in/a.pdf"])
+
+    def test_pattern_search_sees_recent_uploads(self):
+        from src.infrastructure.services import name_index
+
+        name_index._indexes.clear()
+        self.addCleanup(name_index._indexes.clear)
+        with mock.patch.dict("os.environ", {}, clear=False) as env:
+            env.pop("NAME_INDEX_DIR", None)
+            self.assertEqual(self.ocr.find_pdfs_by_patterns("gs://bk/in", ["a"]), ["gs://bk/in/a.pdf"])
+            # Enviados depois: o índice e a listagem em cache ainda não os conhecem
+            self.client.objects["in/escritura.pdf"] = 1
+            self.client.objects["in/anexo.pdf"] = 1
+            # Busca sem resultados lista de novo
+            self.assertEqual(
+                self.ocr.find_pdfs_by_patterns("gs://bk/in", ["escritura"]), ["gs://bk/in/escritura.pdf"]
+            )
+            self.client.objects["in/apendice.pdf"] = 1
+            calls = len(self.client.list_calls)
+            self.assertEqual(self.ocr.find_pdfs_by_patterns("gs://bk/in", ["anexo"]), ["gs://bk/in/anexo.pdf"])
+            self.assertEqual(len(self.client.list_calls), calls)
+            # `refresh=True` não espera o índice
+            self.assertIn(
+                "gs://bk/in/apendice.pdf", self.ocr.find_pdfs_by_patterns("gs://bk/in", ["a"], refresh=True)
+            )
+
+    def test_generation_fingerprints_come_from_the_listing(self):
+        self.ocr.gcs_list_pdfs("gs://bk/in", recursive=False)
+        out = self.ocr.gcs_generation_fingerprints(
+            ["gs://bk/in/a.pdf", "gs://bk/in/sub/c.pdf", "gs://bk/in/x.pdf"]
+        )
+        self.assertEqual(out, {
+            "gs://bk/in/a.pdf": "gen:bk/in/a.pdf#1",
+            "gs://bk/in/sub/c.pdf": "gen:bk/in/sub/c.pdf#1",
+            "gs://bk/in/x.pdf": None,
+        })
+        # Só os caminhos fora da listagem em cache pedem metadados
+        self.assertEqual(sorted(self.client.get_calls), ["in/sub/c.pdf", "in/x.pdf"])
+        self.assertEqual(self.metrics.get("gcs_lookup_requests_total"), 2)
+
+    def test_generation_change_invalidates_listing(self):
+        self.ocr.gcs_list_pdfs("gs://bk/in")
+        self.client.objects["in/a.pdf"] = 2  # objeto substituído
+        self.ocr.gcs_list_pdfs("gs://bk/in", file_names=["a.pdf"])
+        self.ocr.gcs_list_pdfs("gs://bk/in")
+        self.assertEqual(len(self.client.list_calls), 2)
+        self.assertEqual(self.metrics.get("gcs_list_cache_invalidations_total"), 1)
+
+    def test_invalidate_only_covering_listings(self):
+        cache = self.mod.ListingCache(ttl=30)
+        cache.put(("bk", "in/", False), [("in/a.pdf", 1)])
+        cache.put(("bk", "in/", True), [("in/a.pdf", 1)])
+        cache.put(("bk", "out/", True), [])
+        self.assertEqual(cache.invalidate("bk", "in/resultado.txt"), 0)
+        self.assertEqual(cache.invalidate("bk", "in/sub/novo.pdf"), 1)
+        self.assertIsNotNone(cache.get(("bk", "in/", False)))
+        self.assertIsNone(cache.get(("bk", "in/", True)))
+        self.assertIsNotNone(cache.get(("bk", "out/", True)))
+
+    def test_observe_checks_generation_by_name(self):
+        cache = self.mod.ListingCache(ttl=30)
+        key = ("bk", "in/", True)
+        listing = [(f"in/{i}.pdf", i) for i in range(1000)]
+        cache.put(key, listing)
+        listing.clear()  # a entrada guarda a própria cópia
+        cache.observe("bk", "in/500.pdf", 500)
+        cache.observe("bk", "in/nota.txt", None)
+        self.assertEqual(len(cache.get(key)), 1000)
+        cache.observe("bk", "in/500.pdf", None)  # removido desde a listagem
+        self.assertIsNone(cache.get(key))
+        cache.put(key, [("in/a.pdf", 1)])
+        cache.observe("bk", "in/novo.pdf", 7)  # criado desde a listagem
+        self.assertIsNone(cache.get(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import unittest
+from unittest import mock
+
+
+class TestGcsPool(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import gcs_pool, metrics
+        self.mod = gcs_pool
+        self.metrics = metrics
+        self.mod._reset_after_fork()
+        self.metrics.reset()
+
+    def tearDown(self):
+        self.mod._reset_after_fork()
+
+    def test_client_is_shared_and_counted(self):
+        fake_storage = mock.MagicMock()
+        with mock.patch.object(self.mod, "storage", fake_storage), \
+             mock.patch.object(self.mod, "_build_client", side_effect=lambda: object()) as m_build:
+            c1 = self.mod.get_client()
+            c2 = self.mod.get_client()
+        self.assertIs(c1, c2)
+        self.assertEqual(m_build.call_count, 1)
+        self.assertEqual(self.metrics.get("gcs_client_created_total"), 1)
+        self.assertEqual(self.metrics.get("gcs_client_reused_total"), 1)
+
+    def test_client_rebuilt_in_forked_child(self):
+        fake_storage = mock.MagicMock()
+        with mock.patch.object(self.mod, "storage", fake_storage), \
+             mock.patch.object(self.mod, "_build_client", side_effect=lambda: object()) as m_build:
+            parent = self.mod.get_client()
+            # Simulate running in a different process (e.g. gunicorn worker)
+            with mock.patch.object(self.mod.os, "getpid", return_value=os.getpid() + 1):
+                child = self.mod.get_client()
+        self.assertIsNot(parent, child)
+        self.assertEqual(m_build.call_count, 2)
+
+    def test_helpers_use_shared_client(self):
+        from src.infrastructure.services import pdf_ocr, txt_to_api
+
+        sentinel = object()
+        with mock.patch.object(self.mod, "get_client", return_value=sentinel):
+            self.assertIs(pdf_ocr.gcs_client(), sentinel)
+            self.assertIs(txt_to_api.gcs_client(), sentinel)
+
+    def test_missing_dependency_raises(self):
+        with mock.patch.object(self.mod, "storage", None):
+            with self.assertRaises(RuntimeError):
+                self.mod.get_client()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+
+class TestJobStores(unittest.TestCase):
+    def _exercise(self, store):
+        store.create({"job_id": "j1", "status": "queued", "files_done": 0})
+        store.update("j1", status="running", files_done=2, result={"txt_uri": "gs://b/x.txt"})
+        job = store.get("j1")
+        self.assertEqual(job["status"], "running")
+        self.assertEqual(job["files_done"], 2)
+        self.assertEqual(job["result"], {"txt_uri": "gs://b/x.txt"})
+        self.assertIsNone(store.get("missing"))
+
+    def test_in_memory_store(self):
+        from src.application.pdf_processor.jobs import InMemoryJobStore
+        self._exercise(InMemoryJobStore())
+
+    def test_sqlite_store(self):
+        from src.application.pdf_processor.jobs import SqliteJobStore
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "jobs.db")
+            self._exercise(SqliteJobStore(path))
+            # A second instance (another worker) sees the same state
+            self.assertEqual(SqliteJobStore(path).get("j1")["files_done"], 2)
+
+    def test_expired_jobs_are_purged(self):
+        from src.application.pdf_processor.jobs import InMemoryJobStore, SqliteJobStore
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for store in (InMemoryJobStore(ttl=60), SqliteJobStore(os.path.join(tmpdir, "jobs.db"), ttl=60)):
+                with self.subTest(store=type(store).__name__):
+                    store.create({"job_id": "old", "status": "succeeded"})
+                    with mock.patch("time.time", return_value=time.time() + 120):
+                        store.create({"job_id": "new", "status": "queued"})
+                    self.assertIsNone(store.get("old"))
+                    self.assertIsNotNone(store.get("new"))
+
+    def test_orphaned_jobs_are_failed(self):
+        from src.application.pdf_processor import jobs
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = jobs.SqliteJobStore(os.path.join(tmpdir, "jobs.db"))
+            store.create({"job_id": "dead", "status": "running", "owner": "outra:1"})
+            store.create({"job_id": "alive", "status": "running", "owner": jobs._process_owner()})
+            store.create({"job_id": "done", "status": "succeeded", "owner": "outra:1"})
+            jobs.JobRunner(store, max_workers=1)
+            # O runner só vê a própria máquina: donos de outro host contam como vivos
+            self.assertEqual(store.get("dead")["status"], "running")
+            self.assertEqual(store.fail_orphans(lambda owner: owner != "outra:1"), 1)
+            self.assertEqual(store.get("dead")["status"], "failed")
+            self.assertEqual(store.get("alive")["status"], "running")
+            self.assertEqual(store.get("done")["status"], "succeeded")
+
+    def test_store_from_env_shares_state_across_workers(self):
+        from src.application.pdf_processor import jobs
+        with mock.patch.dict(os.environ, {"JOB_STORE_PATH": "", "WEB_CONCURRENCY": "1"}):
+            self.assertIsInstance(jobs.job_store_from_env(), jobs.InMemoryJobStore)
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                mock.patch.object(jobs, "DEFAULT_SQLITE_PATH", os.path.join(tmpdir, "jobs.db")), \
+                mock.patch.dict(os.environ, {"JOB_STORE_PATH": "", "WEB_CONCURRENCY": "2"}):
+            self.assertIsInstance(jobs.job_store_from_env(), jobs.SqliteJobStore)
+
+
+class TestJobRunner(unittest.TestCase):
+    def _wait(self, store, job_id, timeout=2.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = store.get(job_id)
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.01)
+        self.fail("job did not finish")
+
+    def test_runner_reports_progress_and_result(self):
+        from src.application.pdf_processor import jobs
+        from src.application.pdf_processor.service import PdfProcessConfig
+
+        seen = []
+
+        def fake_process(cfg, progress=None):
+            progress({"stage": "extracting", "files_total": 2, "files_done": 0, "pages_done": 0})
+            progress({"files_done": 1, "pages_done": 3})
+            seen.append(jobs_store.get(job_id)["eta_seconds"])
+            progress({"files_done": 2, "pages_done": 5})
+            return {"message": "Processamento concluído", "txt_uri": "gs://b/in/out.txt"}, 200
+
+        jobs_store = jobs.InMemoryJobStore()
+        runner = jobs.JobRunner(jobs_store, max_workers=1)
+        with mock.patch.object(jobs, "process_pdfs", side_effect=fake_process):
+            with mock.patch.object(runner._executor, "submit"):
+                job = runner.submit(PdfProcessConfig(pdfs_dir="gs://b/in"))
+            job_id = job["job_id"]
+            self.assertEqual(jobs_store.get(job_id)["status"], "queued")
+            runner._run(job_id, PdfProcessConfig(pdfs_dir="gs://b/in"))
+
+        done = jobs_store.get(job_id)
+        self.assertEqual(done["status"], "succeeded")
+        self.assertEqual(done["stage"], "done")
+        self.assertEqual(done["files_done"], 2)
+        self.assertEqual(done["pages_done"], 5)
+        self.assertEqual(done["txt_uri"], "gs://b/in/out.txt")
+        self.assertIsNotNone(seen[0])
+
+    def test_runner_records_failure(self):
+        from src.application.pdf_processor import jobs
+        from src.application.pdf_processor.service import PdfProcessConfig
+
+        store = jobs.InMemoryJobStore()
+        runner = jobs.JobRunner(store, max_workers=1)
+        with mock.patch.object(jobs, "process_pdfs", side_effect=RuntimeError("boom")):
+            job = runner.submit(PdfProcessConfig(pdfs_dir="gs://b/in"))
+            done = self._wait(store, job["job_id"])
+        self.assertEqual(done["status"], "failed")
+        self.assertEqual(done["error"], "boom")
+
+
+class TestJobResources(unittest.TestCase):
+    server = Flask("test_flask_app")
+
+    def test_async_post_and_status(self):
+        from src.application.pdf_processor import jobs, ResourcePdfProcessor, ResourcePdfJob
+
+        runner = jobs.JobRunner(jobs.InMemoryJobStore(), max_workers=1)
+        with mock.patch("src.application.pdf_processor.get_job_runner", return_value=runner), \
+             mock.patch.object(jobs, "process_pdfs", return_value=({"txt_uri": "gs://b/in/t.txt"}, 200)):
+            with self.server.test_request_context(json={"pdfs_dir": "gs://b/in", "async": True}):
+                body, status = ResourcePdfProcessor().post()
+            self.assertEqual(status, 202)
+            self.assertEqual(body["status"], "queued")
+            runner._executor.shutdown(wait=True)
+
+            job, status = ResourcePdfJob().get(body["job_id"])
+            self.assertEqual(status, 200)
+            self.assertEqual(job["txt_uri"], "gs://b/in/t.txt")
+
+            _, status = ResourcePdfJob().get("unknown")
+            self.assertEqual(status, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import signal
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import metrics
+        self.metrics = metrics
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_observe_is_cumulative(self):
+        m = self.metrics
+        m.observe("lat_seconds", 0.3, buckets=(0.1, 1.0), stage="ocr")
+        m.observe("lat_seconds", 5.0, buckets=(0.1, 1.0), stage="ocr")
+        self.assertEqual(m.get("lat_seconds_bucket", stage="ocr", le="0.1"), 0)
+        self.assertEqual(m.get("lat_seconds_bucket", stage="ocr", le="1"), 1)
+        self.assertEqual(m.get("lat_seconds_bucket", stage="ocr", le="+Inf"), 2)
+        self.assertEqual(m.get("lat_seconds_count", stage="ocr"), 2)
+        self.assertAlmostEqual(m.get("lat_seconds_sum", stage="ocr"), 5.3)
+
+    def test_timer_records_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.metrics.timer("op_seconds", stage="x"):
+                raise ValueError("falhou")
+        self.assertEqual(self.metrics.get("op_seconds_count", stage="x"), 1)
+
+    def test_histograms_travel_with_drained_counters(self):
+        # Processos do pool repassam histogramas junto com os contadores
+        self.metrics.observe("lat_seconds", 0.2, buckets=(1.0,))
+        drained = self.metrics.drain_counters()
+        self.assertEqual(self.metrics.get("lat_seconds_count"), 0)
+        self.metrics.merge_counters(drained)
+        self.metrics.merge_counters(drained)
+        self.assertEqual(self.metrics.get("lat_seconds_bucket", le="1"), 2)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requer fork")
+    def test_lock_held_at_fork_does_not_deadlock_child(self):
+        with self.metrics._lock:
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover - processo filho
+                signal.alarm(5)
+                self.metrics.inc("child_total")
+                os._exit(0 if self.metrics.get("child_total") == 1 else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+    def test_render_prometheus(self):
+        m = self.metrics
+        m.inc("pdf_files_total", mode="ocr")
+        m.set_gauge("pdf_ocr_forced_ratio", 0.25)
+        m.observe("pdf_stage_seconds", 0.5, buckets=(1.0,), stage='a"b')
+        out = m.render_prometheus()
+        self.assertIn('# TYPE pdf_files_total counter\npdf_files_total{mode="ocr"} 1\n', out)
+        self.assertIn("# TYPE pdf_ocr_forced_ratio gauge\npdf_ocr_forced_ratio 0.25\n", out)
+        self.assertIn("# TYPE pdf_stage_seconds histogram\n", out)
+        self.assertIn('pdf_stage_seconds_bucket{le="1",stage="a\\"b"} 1\n', out)
+        self.assertIn('pdf_stage_seconds_bucket{le="+Inf",stage="a\\"b"} 1\n', out)
+        self.assertIn('pdf_stage_seconds_sum{stage="a\\"b"} 0.5\n', out)
+        self.assertNotIn("# TYPE pdf_stage_seconds_bucket", out)
+        self.assertEqual(out.count("# TYPE"), 3)
+
+    def test_render_aggregates_worker_files(self):
+        import json
+        import tempfile
+
+        m = self.metrics
+        dead_pid = 2 ** 22 + 1  # acima do pid_max padrão: nenhum processo vivo
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                mock.patch.dict(os.environ, {"METRICS_MULTIPROC_DIR": tmpdir}):
+            # Worker já encerrado: contadores entram na soma, gauges não
+            with open(os.path.join(tmpdir, f"metrics-{dead_pid}.json"), "w") as fh:
+                json.dump({
+                    "pid": dead_pid,
+                    "counters": [["pdf_files_total", [["mode", "ocr"]], 2.0]],
+                    "gauges": [["ocr_pool_inflight", [], 7.0]],
+                }, fh)
+            m.inc("pdf_files_total", mode="ocr")
+            m.set_gauge("ocr_pool_inflight", 1)
+            out = m.render_prometheus()
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, f"metrics-{os.getpid()}.json")))
+            m.clear_multiproc_dir()
+            self.assertEqual(os.listdir(tmpdir), [])
+        self.assertIn('pdf_files_total{mode="ocr"} 3\n', out)
+        self.assertIn(f'ocr_pool_inflight{{pid="{os.getpid()}"}} 1\n', out)
+        self.assertNotIn("} 7", out)
+
+
+class TestResourceMetrics(unittest.TestCase):
+    server = Flask("test_flask_app")
+
+    def test_get_prometheus_text(self):
+        from src.application.metrics import ResourceMetrics
+        from src.infrastructure.services import metrics
+
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        metrics.inc("pdf_pages_total", 3, path="native")
+        with self.server.test_request_context():
+            res = ResourceMetrics().get()
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.content_type.startswith("text/plain; version=0.0.4"))
+        self.assertIn('pdf_pages_total{path="native"} 3', res.get_data(as_text=True))
+
+
+class TestProcessTimings(unittest.TestCase):
+    @mock.patch("src.application.pdf_processor.service.ocr.gcs_write_text", return_value="gs://bucket/in/out.txt")
+    @mock.patch("src.application.pdf_processor.service.ocr.find_pdfs_by_patterns", return_value=["gs://bucket/in/a.pdf"])
+    def test_txt_name_uses_processing_time(self, _m_list, m_write):
+        from src.application.pdf_processor import service
+
+        def concat(**kwargs):
+            kwargs["reports"]["gs://bucket/in/a.pdf"] = {"mode": "ocr", "bytes": 2000, "pages": [{}] * 4}
+            return "texto"
+
+        # início, fim da listagem, fim da extração, fim do upload
+        clock = mock.Mock()
+        clock.perf_counter.side_effect = [100.0, 101.0, 103.0, 103.5]
+        with mock.patch.object(service.ocr, "concat_many_pdfs_to_text", side_effect=concat), \
+                mock.patch.object(service, "time", clock):
+            body, status = service.process_pdfs(service.PdfProcessConfig(pdfs_dir="gs://bucket/in"))
+        self.assertEqual(status, 200)
+        self.assertTrue(m_write.call_args.args[1].endswith("-3.00s.txt"))
+        self.assertEqual(
+            body["timings"],
+            {
+                "list_seconds": 1.0,
+                "extract_seconds": 2.0,
+                "upload_seconds": 0.5,
+                "total_seconds": 3.5,
+                "pages": 4,
+                "pages_per_second": 2.0,
+                "bytes_per_second": 1000.0,
+                "ocr_forced_ratio": 1.0,
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+def _normalize(name):
+    from src.infrastructure.services.pdf_ocr import _strip_accents_lower
+
+    return _strip_accents_lower(Path(name).stem)
+
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import name_index
+        self.mod = name_index
+        name_index._indexes.clear()
+        self.addCleanup(name_index._indexes.clear)
+
+    def _index(self, listing):
+        index = self.mod.NameIndex(("bkt", "p", True))
+        index.apply_listing(listing, _normalize)
+        return index
+
+    def test_search_matches_any_pattern_accent_insensitive(self):
+        index = self._index([
+            ("p/Escritura-Emissão.pdf", 1),
+            ("p/a/contrato.pdf", 1),
+            ("p/outro.pdf", 1),
+        ])
+        # Autômato (quando instalado) e alternância de regex dão o mesmo resultado
+        for automaton in (self.mod.ahocorasick, None):
+            with self.subTest(automaton=automaton is not None):
+                with mock.patch.object(self.mod, "ahocorasick", automaton):
+                    self.assertEqual(
+                        index.search(["emissao", "contr"]),
+                        ["p/Escritura-Emissão.pdf", "p/a/contrato.pdf"],
+                    )
+                    self.assertEqual(index.search(["nada"]), [])
+
+    def test_patterns_do_not_match_across_names(self):
+        # "ab" + "\n" + "cd": "bc" não pode casar na junção dos nomes
+        index = self._index([("p/ab.pdf", 1), ("p/cd.pdf", 1)])
+        self.assertEqual(index.search(["bc"]), [])
+
+    def test_empty_pattern_matches_all(self):
+        index = self._index([("p/b.pdf", 1), ("p/a.pdf", 1)])
+        self.assertEqual(index.search([""]), ["p/a.pdf", "p/b.pdf"])
+
+    def test_apply_listing_normalizes_only_changed_names(self):
+        calls = []
+
+        def normalize(name):
+            calls.append(name)
+            return _normalize(name)
+
+        index = self.mod.NameIndex(("bkt", "p", True))
+        self.assertEqual(index.apply_listing([("p/a.pdf", 1), ("p/b.pdf", 1)], normalize), 2)
+        calls.clear()
+        changed = index.apply_listing([("p/a.pdf", 1), ("p/b.pdf", 2), ("p/c.pdf", 1)], normalize)
+        self.assertEqual(changed, 2)
+        self.assertEqual(calls, ["p/b.pdf", "p/c.pdf"])
+        self.assertEqual(index.apply_listing([("p/c.pdf", 1)], normalize), 2)
+        self.assertEqual(index.search(["a", "b", "c"]), ["p/c.pdf"])
+
+    def test_get_index_refreshes_only_when_stale(self):
+        lister = mock.Mock(return_value=[("p/a.pdf", 1)])
+        key = ("bkt", "p", True)
+        self.mod.get_index(key, lister, _normalize, refresh_after=60)
+        self.mod.get_index(key, lister, _normalize, refresh_after=60)
+        self.assertEqual(lister.call_count, 1)
+        lister.return_value = [("p/a.pdf", 1), ("p/b.pdf", 1)]
+        index = self.mod.get_index(key, lister, _normalize, refresh_after=0)
+        self.assertEqual(lister.call_count, 2)
+        self.assertEqual(sorted(index.entries), ["p/a.pdf", "p/b.pdf"])
+
+    def test_local_store_persists_between_processes(self):
+        key = ("bkt", "p", False)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = self.mod.LocalIndexStore(tmpdir)
+            self.mod.get_index(key, lambda: [("p/Contrato.pdf", 7)], _normalize, store=store)
+            saved = list(Path(tmpdir).glob("name-index-*.json"))
+            self.assertEqual(len(saved), 1)
+
+            # Novo processo: memória vazia, índice vem do disco sem listar
+            self.mod._indexes.clear()
+            lister = mock.Mock(side_effect=AssertionError("não deveria listar"))
+            index = self.mod.get_index(key, lister, _normalize, store=store, refresh_after=60)
+            self.assertEqual(index.entries, {"p/Contrato.pdf": (7, "contrato")})
+            self.assertEqual(index.search(["contrato"]), ["p/Contrato.pdf"])
+
+            # Chave diferente (outro prefixo) não reaproveita o arquivo
+            self.mod._indexes.clear()
+            other = self.mod.get_index(("bkt", "q", False), lambda: [], _normalize, store=store)
+            self.assertEqual(other.entries, {})
+
+    def test_unchanged_refresh_does_not_rewrite_store(self):
+        store = mock.Mock()
+        store.load.return_value = None
+        key = ("bkt", "p", True)
+        self.mod.get_index(key, lambda: [("p/a.pdf", 1)], _normalize, store=store, refresh_after=0)
+        self.mod.get_index(key, lambda: [("p/a.pdf", 1)], _normalize, store=store, refresh_after=0)
+        self.assertEqual(store.save.call_count, 1)
+
+
+    def test_slow_refresh_blocks_only_its_own_key(self):
+        listing_started, release = threading.Event(), threading.Event()
+
+        def slow_lister():
+            listing_started.set()
+            release.wait(5)
+            return [("a/novo.pdf", 2)]
+
+        key_a, key_b = ("bkt", "a", True), ("bkt", "b", True)
+        old = self.mod.get_index(key_a, lambda: [("a/velho.pdf", 1)], _normalize)
+        worker = threading.Thread(target=self.mod.get_index, args=(key_a, slow_lister, _normalize),
+                                  kwargs={"refresh_after": 0})
+        worker.start()
+        self.assertTrue(listing_started.wait(5))
+        try:
+            # Outro prefixo não espera a listagem de "a"
+            other = self.mod.get_index(key_b, lambda: [("b/x.pdf", 1)], _normalize)
+            self.assertEqual(list(other.entries), ["b/x.pdf"])
+        finally:
+            release.set()
+            worker.join(5)
+        # O índice antigo não muda; o novo substitui o anterior
+        self.assertEqual(old.search(["velho"]), ["a/velho.pdf"])
+        self.assertEqual(self.mod._indexes[key_a].search(["novo"]), ["a/novo.pdf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
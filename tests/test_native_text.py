@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+
+
+def _text_pdf(pages):
+    """PDF mínimo com uma linha de texto (Helvetica) por item de `pages`."""
+    n = len(pages)
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(n))
+    font_id = 3 + 2 * n
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {n} >>"]
+    for i, line in enumerate(pages):
+        content = f"BT /F1 12 Tf 72 720 Td ({line}) Tj ET"
+        objs.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        objs.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objs.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out, offsets = b"%PDF-1.4\n", []
+    for k, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += f"{k} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{off:010d} 00000 n \n".encode() for off in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+class TestNativeText(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import native_text
+        self.mod = native_text
+        self.pdf = _text_pdf(["Primeira pagina da escritura", "Segunda pagina do contrato"])
+
+    def test_pypdf2_default(self):
+        pages = self.mod.extract_pages_text(self.pdf)
+        self.assertEqual([p.strip() for p in pages], ["Primeira pagina da escritura", "Segunda pagina do contrato"])
+
+    def test_resolve_backend_errors(self):
+        with self.assertRaises(ValueError):
+            self.mod.resolve_backend("inexistente")
+        with mock.patch.object(self.mod, "pdfium", None):
+            with self.assertRaises(RuntimeError):
+                self.mod.resolve_backend("pdfium")
+            self.assertEqual(self.mod.resolve_backend("auto"), "pypdf2")
+            self.assertNotIn("pdfium", self.mod.available_backends())
+
+    def test_installed_backends_agree(self):
+        for name in self.mod.available_backends():
+            with self.subTest(backend=name):
+                pages = self.mod.extract_pages_text(self.pdf, backend=name)
+                self.assertEqual(
+                    [p.strip() for p in pages], ["Primeira pagina da escritura", "Segunda pagina do contrato"]
+                )
+
+    def test_failing_page_does_not_drop_the_document(self):
+        expected = ["Primeira pagina da escritura", ""]
+        if self.mod.is_available("pdfium"):
+            real_get = self.mod.pdfium.PdfDocument.__getitem__
+
+            def get_page(doc, i):
+                if i == 1:
+                    raise RuntimeError("página corrompida")
+                return real_get(doc, i)
+
+            with mock.patch.object(self.mod.pdfium.PdfDocument, "__getitem__", get_page):
+                self.assertEqual([p.strip() for p in self.mod.extract_pages_text(self.pdf, "pdfium")], expected)
+        if self.mod.is_available("pdfminer"):
+            real_process = self.mod.PDFPageInterpreter.process_page
+            calls = []
+
+            def process_page(interp, page):
+                calls.append(page)
+                if len(calls) == 2:
+                    raise ValueError("stream inválido")
+                return real_process(interp, page)
+
+            with mock.patch.object(self.mod.PDFPageInterpreter, "process_page", process_page):
+                self.assertEqual([p.strip() for p in self.mod.extract_pages_text(self.pdf, "pdfminer")], expected)
+
+    def test_cache_key_uses_resolved_backend(self):
+        from src.infrastructure.services.pdf_ocr import ExtractOptions
+
+        with mock.patch.object(self.mod, "resolve_backend", return_value="pdfium"):
+            self.assertEqual(ExtractOptions(native_backend="auto").key_params()["native_backend"], "pdfium")
+        with mock.patch.object(self.mod, "resolve_backend", return_value="pypdf2"):
+            self.assertNotIn("native_backend", ExtractOptions(native_backend="auto").key_params())
+
+    def test_pdf_ocr_delegates_backend(self):
+        from src.infrastructure.services import pdf_ocr
+
+        with mock.patch.dict(self.mod.BACKENDS, {"pdfminer": lambda b: ["via pdfminer"]}), \
+             mock.patch.object(self.mod, "is_available", return_value=True):
+            self.assertEqual(
+                pdf_ocr.extract_native_per_page_from_bytes(self.pdf, backend="pdfminer"), ["via pdfminer"]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+
+class _FakeApi:
+    created = []
+
+    def __init__(self, lang="eng", oem=3, path=None):
+        self.lang, self.oem = lang, oem
+        self.variables, self.psm, self.image = {}, None, None
+        _FakeApi.created.append(self)
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def SetImage(self, image):
+        self.image = image
+
+    def SetImageBytes(self, data, width, height, bpp, bpl):
+        self.image = (len(data), width, height, bpp, bpl)
+
+    def GetUTF8Text(self):
+        return f"texto {self.lang} psm={self.psm}"
+
+    def AllWordConfidences(self):
+        return [80, 90]
+
+    def Clear(self):
+        self.image = None
+
+    def End(self):
+        self.ended = True
+
+
+class TestOcrEngine(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import metrics, ocr_engine
+        self.mod = ocr_engine
+        self.metrics = metrics
+        self.metrics.reset()
+        self.mod._engines.clear()
+        _FakeApi.created = []
+        self.fake = mock.Mock(PyTessBaseAPI=_FakeApi)
+
+    def tearDown(self):
+        self.mod._engines.clear()
+
+    def test_parse_config(self):
+        lang, oem, psm, variables = self.mod.parse_config(
+            None, "--oem 1 --psm 6 -l por+eng -c preserve_interword_spaces=1 -c tessedit_do_invert=0"
+        )
+        self.assertEqual((lang, oem, psm), ("por+eng", 1, 6))
+        self.assertEqual(variables, {"preserve_interword_spaces": "1", "tessedit_do_invert": "0"})
+        self.assertEqual(self.mod.parse_config("por", ""), ("por", 3, 3, {}))
+
+    def test_resolve_engine(self):
+        with mock.patch.object(self.mod, "tesserocr", None):
+            self.assertEqual(self.mod.resolve_engine("auto"), "pytesseract")
+            with self.assertRaises(RuntimeError):
+                self.mod.resolve_engine("tesserocr")
+        with mock.patch.object(self.mod, "tesserocr", self.fake):
+            self.assertEqual(self.mod.resolve_engine("auto"), "tesserocr")
+        with self.assertRaises(ValueError):
+            self.mod.resolve_engine("outro")
+
+    def test_tesserocr_instances_are_pooled(self):
+        with mock.patch.object(self.mod, "tesserocr", self.fake), \
+             mock.patch.dict("os.environ", {"OCR_ENGINE": "tesserocr"}):
+            config = "--oem 1 --psm 4 -l por -c preserve_interword_spaces=1"
+            page = np.full((8, 8), 255, np.uint8)
+            for _ in range(3):
+                self.assertEqual(self.mod.image_to_string(page, config=config), "texto por psm=4")
+            self.assertEqual(self.mod.image_to_string(Image.new("L", (8, 8)), lang="eng"), "texto eng psm=3")
+
+        self.assertEqual(len(_FakeApi.created), 2)
+        self.assertEqual(_FakeApi.created[0].oem, 1)
+        self.assertEqual(_FakeApi.created[0].variables, {"preserve_interword_spaces": "1"})
+        self.assertEqual(self.metrics.get("ocr_engine_pages_total", engine="tesserocr"), 4)
+        self.assertEqual(self.metrics.get("ocr_engine_instances_created_total", engine="tesserocr"), 2)
+
+    def test_tesserocr_instances_are_capped(self):
+        with mock.patch.object(self.mod, "tesserocr", self.fake):
+            engine = self.mod.TesserocrEngine(limit=2)
+            page = Image.new("L", (8, 8))
+            for lang in ("por", "eng", "spa", "por"):
+                engine.image_to_string(page, lang=lang)
+        # A terceira configuração fecha uma ociosa; "por" volta a ser criada depois
+        self.assertEqual([api.lang for api in _FakeApi.created], ["por", "eng", "spa", "por"])
+        self.assertEqual(sum(getattr(api, "ended", False) for api in _FakeApi.created), 2)
+        self.assertEqual(engine._live, 2)
+        self.assertEqual(self.metrics.get("ocr_engine_instances_closed_total", engine="tesserocr"), 2)
+
+    def test_tesserocr_waits_for_a_free_instance(self):
+        import threading
+
+        with mock.patch.object(self.mod, "tesserocr", self.fake):
+            engine = self.mod.TesserocrEngine(limit=1)
+            held = engine._acquire(("por", 3, ()))
+            got = []
+            t = threading.Thread(target=lambda: got.append(engine._acquire(("por", 3, ()))))
+            t.start()
+            t.join(0.1)
+            self.assertEqual(got, [])
+            engine._release(("por", 3, ()), held)
+            t.join(1.0)
+        self.assertEqual(got, [held])
+        self.assertEqual(len(_FakeApi.created), 1)
+
+    def test_tesserocr_gray_array_uses_image_bytes(self):
+        seen = []
+        with mock.patch.object(self.mod, "tesserocr", self.fake), \
+             mock.patch.dict("os.environ", {"OCR_ENGINE": "tesserocr"}), \
+             mock.patch.object(_FakeApi, "GetUTF8Text", lambda api: seen.append(api.image) or ""):
+            self.mod.image_to_string(np.zeros((4, 6), np.uint8)[:, ::2], lang="por")
+            self.mod.image_to_string(Image.new("L", (3, 3)), lang="por")
+        self.assertEqual(seen[0], (12, 3, 4, 1, 3))
+        self.assertIsInstance(seen[1], Image.Image)
+
+    def test_text_from_data(self):
+        data = {
+            "text": ["", "Cláusula", "1", "", "Prazo", "x"],
+            "conf": [-1, 90, 80, -1, 70, -1],
+            "block_num": [1, 1, 1, 1, 2, 2],
+            "par_num": [1, 1, 1, 1, 1, 1],
+            "line_num": [0, 1, 1, 2, 1, 1],
+        }
+        text, conf = self.mod.text_from_data(data)
+        self.assertEqual(text, "Cláusula 1\n\nPrazo")
+        self.assertAlmostEqual(conf, 80.0)
+        self.assertEqual(self.mod.text_from_data({"text": [], "conf": [], "block_num": [],
+                                                  "par_num": [], "line_num": []}), ("", 0.0))
+
+    def test_tesserocr_text_conf(self):
+        with mock.patch.object(self.mod, "tesserocr", self.fake), \
+             mock.patch.dict("os.environ", {"OCR_ENGINE": "tesserocr"}):
+            text, conf = self.mod.image_to_text_conf(Image.new("L", (8, 8)), lang="por")
+        self.assertEqual(text, "texto por psm=3")
+        self.assertAlmostEqual(conf, 85.0)
+
+    @mock.patch("pytesseract.image_to_string", return_value="via binario")
+    def test_falls_back_to_pytesseract(self, m_ocr):
+        broken = mock.Mock(PyTessBaseAPI=mock.Mock(side_effect=RuntimeError("traineddata ausente")))
+        with mock.patch.object(self.mod, "tesserocr", broken), \
+             mock.patch.dict("os.environ", {"OCR_ENGINE": "auto"}):
+            self.assertEqual(self.mod.image_to_string("img", lang="por"), "via binario")
+        m_ocr.assert_called_once_with("img", lang="por")
+        self.assertEqual(self.metrics.get("ocr_engine_fallbacks_total", engine="tesserocr"), 1)
+        self.assertEqual(self.metrics.get("ocr_engine_pages_total", engine="pytesseract"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
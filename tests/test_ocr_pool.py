@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+
+def _crash_once(marker):
+    # Derruba o processo do pool na primeira chamada
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "ok"
+
+
+def _always_crash(_item):
+    os._exit(1)
+
+
+class TestOcrPool(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import metrics, ocr_pool
+        self.mod = ocr_pool
+        self.metrics = metrics
+        self.metrics.reset()
+
+    def test_physical_cores_is_positive(self):
+        self.assertGreaterEqual(self.mod.physical_cores(), 1)
+        self.assertLessEqual(self.mod.physical_cores(), os.cpu_count() or 1)
+
+    def test_pool_size_budget(self):
+        with mock.patch.object(self.mod, "physical_cores", return_value=8):
+            with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "4"}, clear=False):
+                os.environ.pop("OCR_POOL_SIZE", None)
+                self.assertEqual(self.mod.pool_size(), 2)
+            with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "16"}, clear=False):
+                self.assertEqual(self.mod.pool_size(), 1)
+            with mock.patch.dict(os.environ, {"OCR_POOL_SIZE": "3"}, clear=False):
+                self.assertEqual(self.mod.pool_size(), 3)
+
+    def test_map_ordered_and_queue_metrics(self):
+        items = [-4, 2, -9, 7, -1, 3]
+        self.assertEqual(self.mod.map_ordered(abs, items, max_in_flight=2), [4, 2, 9, 7, 1, 3])
+        self.assertEqual(self.metrics.get("ocr_pool_tasks_total"), len(items))
+        # Done callbacks run on the executor thread; give it a moment to settle
+        for _ in range(50):
+            if self.metrics.get("ocr_pool_inflight") == 0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.metrics.get("ocr_pool_inflight"), 0)
+        self.assertEqual(self.metrics.get("ocr_pool_queue_depth"), 0)
+
+    def test_counters_from_pool_tasks_reach_parent(self):
+        from functools import partial
+
+        self.mod.map_ordered(partial(self.metrics.inc, "child_counter"), [1, 2, 3], max_in_flight=2)
+        self.assertEqual(self.metrics.get("child_counter"), 6)
+        self.assertEqual(self.metrics.get("ocr_pool_tasks_total"), 3)
+
+    def test_inline_runs_share_the_pool_budget(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work(_item):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        with mock.patch.object(self.mod, "_slots", threading.BoundedSemaphore(2)):
+            threads = [threading.Thread(target=self.mod.run_inline, args=(work, i)) for i in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(peak[0], 2)
+
+    def test_broken_pool_is_replaced(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = os.path.join(tmpdir, "crashed")
+            first = self.mod.get_pool()
+            self.assertEqual(self.mod.submit(_crash_once, marker).result(timeout=30), "ok")
+            self.assertIsNot(self.mod.get_pool(), first)
+            self.assertGreaterEqual(self.metrics.get("ocr_pool_restarts_total"), 1)
+
+        from concurrent.futures.process import BrokenProcessPool
+
+        with self.assertRaises(BrokenProcessPool):
+            self.mod.submit(_always_crash, 1).result(timeout=30)
+        # Só a tarefa afetada falha: o pool seguinte atende normalmente
+        self.assertEqual(self.mod.map_ordered(abs, [-1, -2]), [1, 2])
+
+    def test_inline_runs_apply_thread_limits(self):
+        with mock.patch.dict(os.environ, {"OMP_THREAD_LIMIT": "8"}), \
+                mock.patch.object(self.mod, "_inline_limited", False):
+            self.assertEqual(self.mod.run_inline(lambda _i: os.getenv("OMP_THREAD_LIMIT"), None), "1")
+        try:
+            import cv2
+        except ImportError:  # pragma: no cover - cv2 ausente
+            return
+        self.assertEqual(cv2.getNumThreads(), 1)
+
+    def test_workers_limit_thread_env(self):
+        self.assertEqual(self.mod.get_pool().submit(os.getenv, "OMP_THREAD_LIMIT").result(), "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
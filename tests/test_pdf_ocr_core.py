@@ -159,6 +159,121 @@ class TestPdfOcrCore(unittest.TestCase):
         self.assertGreater(avg_tok4, 3)
         self.assertLess(rep_cov4, 0.5)
 
+    def test_page_ocr_decisions(self):
+        from src.infrastructure.services.pdf_ocr import page_ocr_decisions, page_repetition_coverage
+
+        good = "Este documento possui conteudo significativo e variado sem repeticoes."
+        pages = [good, "", "\x07\x07\x07 ## ## ## ## ##", good + " Mais texto legivel aqui."]
+        decisions = page_ocr_decisions(pages, min_tokens=3, repeat_threshold=0.9, repeat_pages_frac=0.9)
+        self.assertEqual(decisions, [False, True, True, False])
+
+        header = "Linha Repetida Muito Longa"
+        rep_pages = [
+            f"{header}\nconteudo A",
+            f"{header}\nconteudo B",
+            f"{header}\nconteudo C",
+            "conteudo diverso sem repeticao",
+        ]
+        cov = page_repetition_coverage(rep_pages, min_line_len=6, top_k=12, repeat_pages_frac=0.5)
+        self.assertAlmostEqual(cov[0], len(header) / (len(header) + len("conteudo A")), places=6)
+        self.assertEqual(cov[3], 0.0)
+
+
+    def test_repetition_coverage_matches_reference(self):
+        import random
+        import re
+        from src.infrastructure.services.pdf_ocr import page_repetition_coverage, repetition_coverage
+
+        def ref_norm(s):
+            s = re.sub(r"\s+", " ", s.strip())
+            s = re.sub(r"\b([A-Z0-9]{16,})\b", "", s)
+            s = re.sub(r"\bP(?:ag\.?|ágina)\s*\d+\s*/\s*\d+\b", "", s, flags=re.I)
+            return s.strip()
+
+        def ref_top(pages, min_line_len, top_k, frac):
+            n_pages = max(1, len(pages))
+            page_lines, line_to_pages = [], {}
+            for p in pages:
+                lines = [l for l in map(ref_norm, p.splitlines()) if len(l) >= min_line_len]
+                page_lines.append(lines)
+                for l in set(lines):
+                    line_to_pages[l] = line_to_pages.get(l, 0) + 1
+            min_pages = max(1, int(frac * n_pages))
+            repeated = [(l, c) for l, c in line_to_pages.items() if c >= min_pages]
+            repeated.sort(key=lambda x: (x[1], len(x[0])), reverse=True)
+            return n_pages, page_lines, [l for l, _ in repeated[:top_k]]
+
+        def ref_cov(pages, min_line_len, top_k, frac):
+            n_pages, page_lines, top = ref_top(pages, min_line_len, top_k, frac)
+            total = sum(len(l) for lines in page_lines for l in lines)
+            if total == 0 or not top:
+                return 0.0
+            return min(1.0, sum(len(l) for l in top) * n_pages / total)
+
+        def ref_page_cov(pages, min_line_len, top_k, frac):
+            _, page_lines, top = ref_top(pages, min_line_len, top_k, frac)
+            top, out = set(top), []
+            for lines in page_lines:
+                total = sum(len(l) for l in lines)
+                rep = sum(len(l) for l in set(lines) if l in top)
+                out.append(min(1.0, rep / total) if total and top else 0.0)
+            return out
+
+        rnd = random.Random(42)
+        pool = [
+            "Cabeçalho Empresa S.A.", "Rodapé confidencial", "Página 3 / 10", "Pag. 1 / 2",
+            "  espaços\t  demais  ", "ID ABCDEF0123456789XYZ fim", "curta", "Linha A igual",
+            "Linha B igual", "\u00a0nbsp\u2003em space ", "texto único qualquer",
+        ]
+        for _ in range(200):
+            pages = [
+                "\n".join(rnd.choice(pool) + (str(rnd.randint(0, 3)) if rnd.random() < 0.3 else "")
+                           for _ in range(rnd.randint(0, 8)))
+                for _ in range(rnd.randint(1, 12))
+            ]
+            for top_k in (1, 3, 12):
+                for frac in (0.3, 0.6, 1.0):
+                    self.assertAlmostEqual(
+                        repetition_coverage(pages, 6, top_k, frac), ref_cov(pages, 6, top_k, frac), places=12
+                    )
+                    self.assertEqual(
+                        page_repetition_coverage(pages, 6, top_k, frac), ref_page_cov(pages, 6, top_k, frac)
+                    )
+
+    def test_repetition_coverage_sample_pages(self):
+        from src.infrastructure.services.pdf_ocr import repetition_coverage
+
+        header = "Cabecalho repetido do documento"
+        pages = [f"{header}\nconteudo distinto numero {i}" for i in range(100)]
+        full = repetition_coverage(pages, min_line_len=6, top_k=10, repeat_pages_frac=0.6)
+        sampled = repetition_coverage(pages, min_line_len=6, top_k=10, repeat_pages_frac=0.6, sample_pages=10)
+        self.assertGreater(sampled, 0.0)
+        self.assertAlmostEqual(sampled, full, places=2)
+        # Amostra maior que o documento equivale ao cálculo exato
+        self.assertEqual(repetition_coverage(pages, sample_pages=500), repetition_coverage(pages))
+
+
+    def test_strip_boilerplate(self):
+        from src.infrastructure.services.pdf_ocr import strip_boilerplate
+
+        pages = [
+            "Empresa XYZ Ltda\nconteudo A\nPágina 1 de 3",
+            "Empresa  XYZ Ltda \nconteudo B\nPage 2 of 3",
+            "Empresa XYZ Ltda\nconteudo C\nPag. 3 / 3",
+        ]
+        cleaned, saved = strip_boilerplate(pages, repeat_pages_frac=0.6)
+        self.assertEqual(cleaned, ["conteudo A", "conteudo B", "conteudo C"])
+        self.assertEqual(saved, sum(len(p.encode()) for p in pages) - len("conteudo A") * 3)
+
+        # Documento de uma página: nada é repetido, só o contador sai
+        single, saved_single = strip_boilerplate(["Linha qualquer longa\nPágina 1 / 1"])
+        self.assertEqual(single, ["Linha qualquer longa"])
+        self.assertEqual(saved_single, len("\nPágina 1 / 1".encode()))
+
+        # Números soltos e contadores dentro do texto são preservados
+        kept, _ = strip_boilerplate(["Total 3 / 10 do valor", "2025"])
+        self.assertEqual(kept, ["Total 3 / 10 do valor", "2025"])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -66,6 +66,50 @@ class TestPdfOcrMetrics(unittest.TestCase):
         expected_uniq = len(set("".join(pages)))
         self.assertEqual(uniq, expected_uniq)
 
+    def test_allowed_table_matches_regex_for_every_codepoint(self):
+        import sys
+        from src.infrastructure.services import pdf_ocr
+
+        table = pdf_ocr._DROP_ALLOWED
+        mismatches = [
+            c for c in range(sys.maxunicode + 1)
+            if (c in table) != bool(pdf_ocr._ALLOWED_CHARS_RE.fullmatch(chr(c)))
+        ]
+        self.assertEqual(mismatches, [])
+
+    def test_page_features_bit_identical_to_reference(self):
+        import random
+        import re
+        from src.infrastructure.services.pdf_ocr import page_features, avg_tokens_per_page
+
+        rnd = random.Random(1234)
+        alphabet = "abcXYZ áéíõçÇ 0123 _\n\t/.,;:!?()-#@$%&*\x00\x07\u00a0\u2003€ªº§ /12 /7 "
+        pages = ["", "   ", "Página 1 / 2\nHello", "snake_case __init__ 1_000"]
+        for _ in range(200):
+            pages.append("".join(rnd.choice(alphabet) for _ in range(rnd.randint(1, 400))))
+
+        for p in pages:
+            f = page_features(p)
+            toks = re.findall(r"\w+", p, flags=re.UNICODE)
+            self.assertEqual(f.tokens, len(toks))
+            self.assertEqual(f.printable, self._printable_ratio(p))
+            self.assertEqual(f.alnum, self._alpha_num_ratio(p))
+            self.assertEqual(f.mean_word_len, self._mean_word_len(toks))
+            self.assertEqual(f.slash_frac, self._slash_seq_frac(p))
+            self.assertEqual(len(f.chars), self._unique_chars(p))
+
+        # Document-level aggregation matches the original per-function loop
+        ref = []
+        for p in pages:
+            toks = re.findall(r"\w+", p, flags=re.UNICODE)
+            ref.append((self._printable_ratio(p), self._alpha_num_ratio(p), self._mean_word_len(toks), self._slash_seq_frac(p)))
+        expected = tuple(sum(col) / len(ref) for col in zip(*ref)) + (self._unique_chars("".join(pages)),)
+        self.assertEqual(self.text_quality_metrics(pages), expected)
+        self.assertEqual(
+            avg_tokens_per_page(pages),
+            sum(len(re.findall(r"\w+", p)) for p in pages) / len(pages),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
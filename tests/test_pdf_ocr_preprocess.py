@@ -1,4 +1,5 @@
 import unittest
+from pathlib import Path
 from unittest import mock
 import numpy as np
 from PIL import Image
@@ -41,7 +42,275 @@ class TestPdfOcrPreprocess(unittest.TestCase):
         self.assertEqual(out.shape, (64, 64))
         self.assertEqual(out.dtype, np.uint8)
 
-    @mock.patch('src.infrastructure.services.pdf_ocr.pytesseract.image_to_string')
+    def _text_page(self, noise=0.0, angle=0.0, scale=1):
+        import cv2
+        h, w = 400 * scale, 300 * scale
+        page = np.full((h, w), 245, np.uint8)
+        for y in range(30 * scale, h - 20 * scale, 20 * scale):
+            cv2.putText(page, "Clausula primeira", (10 * scale, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5 * scale, 20, scale)
+        if angle:
+            m = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+            page = cv2.warpAffine(page, m, (w, h), borderMode=cv2.BORDER_REPLICATE)
+        if noise:
+            rng = np.random.default_rng(0)
+            page = np.clip(page + rng.normal(0, noise, page.shape), 0, 255).astype(np.uint8)
+        return Image.fromarray(page)
+
+    def test_preprocess_accurate_matches_original_pipeline(self):
+        import cv2
+        pil = self._text_page(noise=4.0, angle=1.5)
+        img = cv2.equalizeHist(np.array(pil.convert("L")))
+        img = self.mod._deskew(img)
+        img = cv2.fastNlMeansDenoising(img, h=7, templateWindowSize=7, searchWindowSize=21)
+        bin_img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+        blur = cv2.GaussianBlur(bin_img, (0, 0), sigmaX=1.0)
+        expected = cv2.dilate(cv2.addWeighted(bin_img, 1.5, blur, -0.5, 0), np.ones((1, 1), np.uint8), iterations=1)
+        self.assertTrue(np.array_equal(self.mod._preprocess(pil), expected))
+
+    def test_preprocess_balanced_skips_stages_on_clean_pages(self):
+        from src.infrastructure.services import metrics
+        metrics.reset()
+
+        clean = {}
+        self.mod._preprocess(self._text_page(), profile="balanced", timings=clean)
+        self.assertNotIn("denoise", clean)
+        self.assertNotIn("deskew", clean)
+        self.assertIn("estimate_noise", clean)
+        self.assertIn("threshold", clean)
+
+        noisy = {}
+        self.mod._preprocess(self._text_page(noise=10.0), profile="balanced", timings=noisy)
+        self.assertIn("denoise", noisy)
+
+        skewed = {}
+        self.mod._preprocess(self._text_page(angle=3.0, scale=3), profile="balanced", timings=skewed)
+        self.assertIn("deskew", skewed)
+
+        fast = {}
+        self.mod._preprocess(self._text_page(noise=10.0, angle=3.0), profile="fast", timings=fast)
+        self.assertEqual(sorted(fast), ["equalize", "threshold"])
+
+        self.assertEqual(metrics.get("ocr_preprocess_pages_total", profile="balanced"), 3)
+        self.assertEqual(metrics.get("ocr_preprocess_stage_total", stage="denoise", profile="balanced"), 1)
+        self.assertGreater(metrics.get("ocr_preprocess_seconds_total", stage="threshold", profile="fast"), 0)
+
+    def test_accurate_deskews_at_full_resolution(self):
+        layout = self.mod.PageLayout(skew=-2.0, ink_frac=0.05, components=200, blank=False)
+        page = np.array(self._text_page(angle=3.0))
+        with mock.patch.object(self.mod, "_deskew", wraps=self.mod._deskew) as m_deskew, \
+                mock.patch.object(self.mod, "_rotate", wraps=self.mod._rotate) as m_rotate:
+            self.mod._preprocess(page, profile="accurate", layout=layout)
+            self.assertEqual(m_deskew.call_count, 1)
+            m_rotate.assert_not_called()
+            # "balanced" reaproveita o ângulo da análise de layout
+            self.mod._preprocess(page, profile="balanced", layout=layout)
+            self.assertEqual(m_deskew.call_count, 1)
+            self.assertEqual(m_rotate.call_args.args[1], -2.0)
+
+    def test_analyze_layout(self):
+        blank = self.mod._analyze_layout(np.full((400, 300), 240, np.uint8))
+        self.assertTrue(blank.blank)
+        self.assertEqual(blank.components, 0)
+
+        text = self.mod._analyze_layout(np.array(self._text_page(scale=3)))
+        self.assertFalse(text.blank)
+        self.assertGreater(text.components, 100)
+        self.assertGreater(text.ink_frac, self.mod.BLANK_INK_FRAC)
+        self.assertAlmostEqual(text.skew, 0.0, delta=0.5)
+
+        skewed = self.mod._analyze_layout(np.array(self._text_page(angle=3.0, scale=3)))
+        self.assertLess(skewed.skew, -1.0)
+
+    def test_faded_and_inverted_pages_are_not_blank(self):
+        text = np.array(self._text_page(scale=3)).astype(np.float32)
+        # Tinta desbotada: texto 205 sobre fundo 235 (diferença menor que o antigo corte fixo de 50)
+        faded = (235 - (245 - text) * 30 / 225).astype(np.uint8)
+        layout = self.mod._analyze_layout(faded)
+        self.assertFalse(layout.blank)
+        self.assertFalse(layout.inverted)
+        self.assertGreater(layout.components, 100)
+
+        inverted = self.mod._analyze_layout(255 - text.astype(np.uint8))
+        self.assertFalse(inverted.blank)
+        self.assertTrue(inverted.inverted)
+        self.assertGreater(inverted.components, 100)
+
+    def test_blank_verdict_is_confirmed_at_full_resolution(self):
+        from src.infrastructure.services import metrics
+        metrics.reset()
+        # Linhas de 1 px em tom claro: a cópia reduzida as dilui até sumirem
+        page = np.full((3000, 2400), 240, np.uint8)
+        page[::40, 100:2300] = 215
+        with mock.patch.object(self.mod, "_ink_mask", wraps=self.mod._ink_mask) as m_ink:
+            layout = self.mod._analyze_layout(page)
+        self.assertFalse(layout.blank)
+        self.assertEqual(m_ink.call_count, 2)
+        self.assertEqual(metrics.get("ocr_blank_unconfirmed_total"), 1)
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string', return_value="texto")
+    @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
+    def test_blank_pages_skip_ocr_and_layout_picks_psm(self, m_convert, m_ocr):
+        from src.infrastructure.services import metrics
+        metrics.reset()
+        m_convert.return_value = [self._text_page(), Image.new('L', (300, 400), color=250)]
+
+        with mock.patch.object(self.mod, '_choose_psm', wraps=self.mod._choose_psm) as m_psm:
+            out = self.mod.ocr_all_pages_from_bytes(b"%PDF-1.4 fake", preprocess_profile="balanced")
+        self.assertEqual(m_ocr.call_count, 1)
+        self.assertEqual(out, "---- página 1 ----\ntexto\n\n---- página 2 ----")
+        self.assertEqual(metrics.get("ocr_blank_pages_total"), 1)
+        # Densidade vem da análise de layout (manchas de tinta na cópia reduzida)
+        self.assertGreater(m_psm.call_args.args[0], 0)
+
+    def test_estimate_noise(self):
+        self.assertLess(self.mod._estimate_noise(np.array(self._text_page())), 1.0)
+        sigma = self.mod._estimate_noise(np.array(self._text_page(noise=8.0)))
+        self.assertGreater(sigma, self.mod.NOISE_SIGMA_MIN)
+        self.assertLess(sigma, 12.0)
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string', return_value="txt")
+    @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes', return_value=[""])
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr', return_value=(True, 0.0, 0.0))
+    def test_extract_text_preprocess_profile(self, m_force, m_native, m_convert, m_ocr):
+        m_convert.return_value = [self._text_page()]
+        with mock.patch.object(self.mod, '_preprocess', wraps=self.mod._preprocess) as m_pre:
+            self.mod.extract_text("/x.pdf", dpi=200, lang="por", min_tokens=10, repeat_th=0.5,
+                                  repeat_pages_frac=0.6, pdf_bytes=b"%PDF", preprocess_profile="fast")
+            m_pre.assert_called_once()
+            self.assertEqual(m_pre.call_args.kwargs["profile"], "fast")
+            self.assertIn("--psm", m_ocr.call_args.kwargs["config"])
+            m_pre.reset_mock()
+            self.mod.extract_text("/x.pdf", dpi=200, lang="por", min_tokens=10, repeat_th=0.5,
+                                  repeat_pages_frac=0.6, pdf_bytes=b"%PDF")
+            m_pre.assert_not_called()
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes', return_value=["", ""])
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr', return_value=(True, 0.0, 0.0))
+    def test_extract_text_adaptive_dpi_retries_low_confidence_pages(self, m_force, m_native):
+        from src.infrastructure.services import metrics
+        metrics.reset()
+
+        def render(pdf_bytes, dpi, first_page=None, last_page=None, **kw):
+            # A largura identifica a página (1 ou 2) e o dpi da renderização
+            pages = [Image.new('L', (dpi, 20), 255), Image.new('L', (dpi + 1, 20), 255)]
+            return pages[first_page - 1:last_page] if first_page else pages
+
+        def image_to_text_conf(image, **kw):
+            width = image.size[0]
+            conf = 40 if width == 151 else 90  # página 2 ilegível em 150 dpi
+            return f"w{width}", conf
+
+        report = {}
+        with mock.patch.object(self.mod, 'convert_from_bytes', side_effect=render) as m_convert, \
+                mock.patch.object(self.mod.ocr_engine, 'image_to_text_conf', side_effect=image_to_text_conf), \
+                mock.patch.object(self.mod.ocr_engine, 'image_to_string',
+                                  side_effect=lambda image, **kw: f"w{image.size[0]}"):
+            out = self.mod.extract_text("/x.pdf", dpi=300, lang="por", min_tokens=10, repeat_th=0.5,
+                                        repeat_pages_frac=0.6, pdf_bytes=b"%PDF", report=report,
+                                        adaptive_dpi=150, adaptive_min_conf=70)
+        self.assertEqual(out, "---- página 1 ----\nw150\n\n---- página 2 ----\nw301")
+        self.assertEqual([c.kwargs["dpi"] for c in m_convert.call_args_list], [150, 300])
+        self.assertEqual(
+            report["pages"],
+            [{"page": 1, "path": "ocr", "dpi": 150}, {"page": 2, "path": "ocr", "dpi": 300}],
+        )
+        self.assertEqual(metrics.get("ocr_adaptive_pages_total", dpi=150), 1)
+        self.assertEqual(metrics.get("ocr_adaptive_pages_total", dpi=300), 1)
+
+    def test_adaptive_dpi_does_not_retry_pages_without_words(self):
+        page = Image.new('L', (20, 20), 255)
+        with mock.patch.object(self.mod.ocr_engine, 'image_to_text_conf', return_value=("  ", 0.0)):
+            self.assertEqual(self.mod._ocr_page(page, "por", min_conf=70), "")
+        with mock.patch.object(self.mod.ocr_engine, 'image_to_text_conf', return_value=("r1sc0", 20.0)):
+            self.assertIsNone(self.mod._ocr_page(page, "por", min_conf=70))
+
+    def test_match_sections(self):
+        text = "CLÁUSULA 5 – DA\nREMUNERAÇÃO e garantias"
+        self.assertEqual(
+            self.mod.match_sections(text, ["remuneração", "Garantias", "vencimento", "da remuneracao"]),
+            ["remuneração", "Garantias", "da remuneracao"],
+        )
+
+    def test_match_sections_requires_headings(self):
+        from src.application.pdf_processor.service import SECTION_KEYWORDS_DEFAULTS
+
+        keywords = [kw for kws in SECTION_KEYWORDS_DEFAULTS.values() for kw in kws]
+        body = (
+            "as Debêntures farão jus à remuneração e a Emissora prestará garantia\n"
+            "conforme a avaliação do agente, até a data de vencimento."
+        )
+        self.assertEqual(self.mod.match_sections(body, keywords), [])
+        self.assertEqual(self.mod.match_sections("4.10. Remuneração. As Debêntures", keywords), ["remuneracao"])
+        self.assertEqual(self.mod.match_sections("DAS GARANTIAS\ntexto", keywords), ["garantia"])
+        # Numeração sem pontuação antes de palavra maiúscula também é título
+        self.assertEqual(self.mod.match_sections("4.1 Remuneração\nAs Debêntures", keywords), ["remuneracao"])
+        self.assertEqual(self.mod.match_sections("12 meses de remuneração", keywords), [])
+        # Palavra inteira: "aval" não casa com "avaliação"
+        self.assertEqual(self.mod.match_sections("CLÁUSULA 9 – DA AVALIAÇÃO", ["aval"]), [])
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes', return_value=[""] * 4)
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr', return_value=(True, 0.0, 0.0))
+    def test_extract_text_two_pass_ocrs_only_section_pages(self, m_force, m_native):
+        fast_texts = {1: "capa", 2: "Cláusula da REMUNERAÇÃO das debêntures", 3: "continua", 4: "anexo"}
+
+        def render(pdf_bytes, dpi, first_page=None, last_page=None, **kw):
+            # Altura identifica a página, largura o dpi
+            pages = [Image.new('L', (dpi, 10 + n), 255) for n in range(1, 5)]
+            return pages[first_page - 1:last_page] if first_page else pages
+
+        def image_to_string(image, **kw):
+            dpi, page = image.size[0], image.size[1] - 10
+            return fast_texts[page] if dpi == 200 else f"completo {page}"
+
+        report = {}
+        with mock.patch.object(self.mod, 'convert_from_bytes', side_effect=render) as m_convert, \
+                mock.patch.object(self.mod.ocr_engine, 'image_to_string', side_effect=image_to_string):
+            out = self.mod.extract_text("/x.pdf", dpi=300, lang="por", min_tokens=10, repeat_th=0.5,
+                                        repeat_pages_frac=0.6, pdf_bytes=b"%PDF", report=report,
+                                        section_keywords=["remuneração", "vencimento"])
+        self.assertEqual(
+            out,
+            "---- página 1 ----\ncapa\n\n---- página 2 ----\ncompleto 2\n\n"
+            "---- página 3 ----\ncompleto 3\n\n---- página 4 ----\nanexo",
+        )
+        # Passada rápida no documento inteiro; completa só na página com a seção e na seguinte
+        self.assertEqual(
+            [(c.kwargs["dpi"], c.kwargs.get("first_page"), c.kwargs.get("last_page")) for c in m_convert.call_args_list],
+            [(200, None, None), (300, 2, 3)],
+        )
+        targeted = report["targeted"]
+        self.assertEqual(targeted["pages_full"], [2, 3])
+        self.assertEqual(targeted["pages_skipped"], [1, 4])
+        self.assertEqual(targeted["sections"], {"2": ["remuneração"]})
+        self.assertIsNotNone(targeted["seconds_saved"])
+        self.assertEqual([p["dpi"] for p in report["pages"]], [200, 300, 300, 200])
+
+    def test_resolve_ocr_profile(self):
+        self.assertEqual(self.mod.resolve_ocr_profile(None, 300, None), (300, None))
+        self.assertEqual(self.mod.resolve_ocr_profile("fast", 300, "accurate"), (200, None))
+        self.assertEqual(self.mod.resolve_ocr_profile("accurate", 300, None), (400, "accurate"))
+        with self.assertRaises(ValueError):
+            self.mod.resolve_ocr_profile("turbo", 300, None)
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string', return_value="txt")
+    @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes', return_value=[""])
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr', return_value=(True, 0.0, 0.0))
+    def test_extract_text_ocr_profile_sets_dpi_and_preprocess(self, m_force, m_native, m_convert, m_ocr):
+        m_convert.return_value = [self._text_page()]
+        with mock.patch.object(self.mod, '_preprocess', wraps=self.mod._preprocess) as m_pre:
+            self.mod.extract_text("/x.pdf", dpi=300, lang="por", min_tokens=10, repeat_th=0.5,
+                                  repeat_pages_frac=0.6, pdf_bytes=b"%PDF", ocr_profile="balanced")
+            self.assertEqual(m_convert.call_args.kwargs["dpi"], 300)
+            self.assertEqual(m_pre.call_args.kwargs["profile"], "balanced")
+            m_pre.reset_mock()
+            self.mod.extract_text("/x.pdf", dpi=300, lang="por", min_tokens=10, repeat_th=0.5,
+                                  repeat_pages_frac=0.6, pdf_bytes=b"%PDF", ocr_profile="fast")
+            self.assertEqual(m_convert.call_args.kwargs["dpi"], 200)
+            m_pre.assert_not_called()
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string')
     @mock.patch('src.infrastructure.services.pdf_ocr.cv2.connectedComponents')
     @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
     def test_ocr_all_pages_from_bytes(self, m_convert, m_conn, m_ocr):
@@ -55,7 +324,62 @@ class TestPdfOcrPreprocess(unittest.TestCase):
         self.assertIn("---- página 1 ----\nfoo", out)
         self.assertIn("---- página 2 ----\nbar", out)
 
-    @mock.patch('src.infrastructure.services.pdf_ocr.pytesseract.image_to_string')
+    def test_map_pages_preserves_order(self):
+        items = [-5, 3, -1, 7, -2]
+        self.assertEqual(self.mod._map_pages(abs, items, workers=1), [5, 3, 1, 7, 2])
+        self.assertEqual(self.mod._map_pages(abs, items, workers=3), [5, 3, 1, 7, 2])
+        self.assertEqual(self.mod._map_pages(abs, [], workers=3), [])
+
+    def test_iter_rendered_releases_previous_window(self):
+        import gc
+        import weakref
+
+        class Page:
+            pass
+
+        refs = []
+
+        def render(pdf_bytes, dpi, raster, first_page, last_page, **kw):
+            gc.collect()
+            # Nenhuma página da janela anterior pode continuar viva
+            self.assertTrue(all(r() is None for r in refs))
+            pages = [Page() for _ in range(first_page, last_page + 1)]
+            refs.extend(weakref.ref(pg) for pg in pages)
+            return pages
+
+        with mock.patch.object(self.mod, "_render", side_effect=render):
+            seen = []
+            for batch in self.mod._iter_rendered(b"%PDF", 100, range(1, 6), window=2):
+                seen.extend(n for n, _ in batch)
+                del batch
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+
+    def test_page_runs(self):
+        self.assertEqual(self.mod._page_runs([1, 2, 3, 5, 6, 9]), [[1, 2, 3], [5, 6], [9]])
+        self.assertEqual(self.mod._page_runs(range(1, 6), window=2), [[1, 2], [3, 4], [5]])
+        self.assertEqual(self.mod._page_runs([]), [])
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string')
+    @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
+    @mock.patch('src.infrastructure.services.pdf_ocr.pdfinfo_from_bytes', return_value={"Pages": 3})
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes', return_value=[""])
+    @mock.patch('src.infrastructure.services.pdf_ocr.load_pdf_bytes', return_value=b"%PDF-1.4 fake")
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr', return_value=(True, 0.0, 0.0))
+    def test_extract_text_forced_ocr_streaming_windows(self, m_force, m_load, m_native, m_info, m_convert, m_ocr):
+        m_convert.side_effect = lambda data, dpi, first_page, last_page: [
+            Image.new('L', (8, 8), color=200) for _ in range(first_page, last_page + 1)
+        ]
+        m_ocr.side_effect = ["p1", "p2", "p3"]
+
+        out = self.mod.extract_text("/local/file.pdf", dpi=300, lang="por", min_tokens=10,
+                                    repeat_th=0.5, repeat_pages_frac=0.6, raster_window=2)
+        self.assertEqual(
+            [c.kwargs for c in m_convert.call_args_list],
+            [{"dpi": 300, "first_page": 1, "last_page": 2}, {"dpi": 300, "first_page": 3, "last_page": 3}],
+        )
+        self.assertEqual(out, "---- página 1 ----\np1\n\n---- página 2 ----\np2\n\n---- página 3 ----\np3")
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string')
     @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
     @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes')
     @mock.patch('src.infrastructure.services.pdf_ocr.load_pdf_bytes')
@@ -84,6 +408,91 @@ class TestPdfOcrPreprocess(unittest.TestCase):
         self.assertIn("---- página 3 ----\nbeta", out)
         self.assertNotIn("página 2", out)
 
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes')
+    @mock.patch('src.infrastructure.services.pdf_ocr.load_pdf_bytes')
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr')
+    def test_extract_text_strip_boilerplate(self, m_force, m_load, m_native):
+        m_force.return_value = (False, 50.0, 0.05)
+        m_load.return_value = b"%PDF-1.4 fake"
+        header = "BANCO EXEMPLO S.A. - CONFIDENCIAL"
+        m_native.return_value = [
+            f"{header}\nCláusula {i} conteúdo próprio\nPágina {i} / 3" for i in range(1, 4)
+        ]
+
+        report = {}
+        out = self.mod.extract_text(
+            "/local/file.pdf", dpi=300, lang="por+eng", min_tokens=10, repeat_th=0.5,
+            repeat_pages_frac=0.6, report=report, strip_boilerplate=True,
+        )
+        self.assertNotIn(header, out)
+        self.assertNotIn("Página 2 / 3", out)
+        self.assertIn("---- página 2 ----\nCláusula 2 conteúdo próprio", out)
+        expected = sum(len(f"{header}\n".encode()) + len(f"\nPágina {i} / 3".encode()) for i in range(1, 4))
+        self.assertEqual(report["boilerplate_bytes_saved"], expected)
+
+        plain = self.mod.extract_text(
+            "/local/file.pdf", dpi=300, lang="por+eng", min_tokens=10, repeat_th=0.5, repeat_pages_frac=0.6,
+        )
+        self.assertIn(header, plain)
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string')
+    @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes')
+    @mock.patch('src.infrastructure.services.pdf_ocr.load_pdf_bytes')
+    def test_extract_text_hybrid_ocr_only_failing_pages(self, m_load, m_native, m_convert, m_ocr):
+        good = "Este documento possui conteudo significativo e variado sem repeticoes."
+        m_load.return_value = b"%PDF-1.4 fake"
+        m_native.return_value = [good, "", "", good + " Outra pagina legivel."]
+        m_convert.return_value = [Image.new('L', (16, 16), color=200), Image.new('L', (16, 16), color=200)]
+        m_ocr.side_effect = ["scan 2", "scan 3"]
+
+        report = {}
+        out = self.mod.extract_text(
+            "/local/file.pdf", dpi=300, lang="por", min_tokens=3,
+            repeat_th=0.9, repeat_pages_frac=0.9, hybrid=True, report=report,
+        )
+        # Pages 2-3 form one contiguous range -> a single render call
+        m_convert.assert_called_once_with(b"%PDF-1.4 fake", dpi=300, first_page=2, last_page=3)
+        self.assertEqual(
+            out,
+            f"---- página 1 ----\n{good}\n\n"
+            "---- página 2 ----\nscan 2\n\n"
+            "---- página 3 ----\nscan 3\n\n"
+            f"---- página 4 ----\n{good} Outra pagina legivel.",
+        )
+        self.assertEqual(report["mode"], "hybrid")
+        self.assertEqual([p["path"] for p in report["pages"]], ["native", "ocr", "ocr", "native"])
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string')
+    @mock.patch('src.infrastructure.services.pdf_ocr.convert_from_bytes')
+    def test_page_cache_ocrs_identical_pages_once(self, m_convert, m_ocr):
+        import tempfile
+
+        annex = Image.new('L', (32, 32), color=255)
+        annex.paste(0, (4, 4, 20, 12))
+        other = Image.new('L', (32, 32), color=255)
+        other.paste(0, (8, 16, 28, 24))
+        m_convert.return_value = [annex, other, annex.copy()]
+        m_ocr.side_effect = ["anexo", "outra"]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = self.mod.ocr_all_pages_from_bytes(b"%PDF-1.4 fake", page_cache_dir=tmpdir)
+            self.assertEqual(m_ocr.call_count, 2)
+            self.assertIn("---- página 3 ----\nanexo", out)
+
+            # A second document sharing the annex only OCRs its new pages
+            m_convert.return_value = [annex.copy()]
+            out2 = self.mod.ocr_all_pages_from_bytes(b"%PDF-1.4 other", page_cache_dir=tmpdir)
+            self.assertEqual(m_ocr.call_count, 2)
+            self.assertEqual(out2, "---- página 1 ----\nanexo")
+
+            # Entradas no namespace próprio; só a primeira gravação do processo varre o diretório
+            self.assertEqual(len(list((Path(tmpdir) / self.mod.PAGE_CACHE_NAMESPACE).glob("*/*.txt"))), 2)
+            cache = self.mod.open_text_cache(
+                tmpdir, self.mod.PAGE_CACHE_MAX_BYTES, namespace=self.mod.PAGE_CACHE_NAMESPACE
+            )
+            self.assertEqual((cache.puts, cache.scans), (2, 1))
+
     @mock.patch('src.infrastructure.services.pdf_ocr.extract_text', return_value='content text')
     def test_concat_many_pdfs_to_text(self, m_ex):
         files = ["gs://bucket/a.pdf", "/tmp/b.pdf"]
@@ -92,6 +501,165 @@ class TestPdfOcrPreprocess(unittest.TestCase):
         self.assertIn("---- a.pdf ----\ncontent text", out)
         self.assertIn("---- b.pdf ----\ncontent text", out)
 
+    def test_concat_many_pdfs_to_text_prefetch_keeps_order(self):
+        import threading
+        import time
+
+        started = []
+        lock = threading.Lock()
+
+        def slow_load(ident):
+            with lock:
+                started.append(ident)
+            # Later files download faster, order must still follow the input
+            time.sleep(0.03 if ident.endswith("a.pdf") else 0.0)
+            if ident.endswith("c.pdf"):
+                raise IOError("falha de rede")
+            return ident.encode()
+
+        def fake_extract(pdf_identifier, pdf_bytes=None, **kwargs):
+            return f"bytes={pdf_bytes.decode()}"
+
+        files = ["gs://bucket/a.pdf", "gs://bucket/b.pdf", "gs://bucket/c.pdf", "gs://bucket/d.pdf"]
+        with mock.patch.object(self.mod, 'load_pdf_bytes', side_effect=slow_load), \
+             mock.patch.object(self.mod, 'extract_text', side_effect=fake_extract):
+            out = self.mod.concat_many_pdfs_to_text(
+                files, dpi=200, lang='por', min_tokens=10, repeat_th=0.5, repeat_pages_frac=0.6, prefetch=2,
+            )
+        self.assertEqual(sorted(started), files)
+        self.assertEqual(
+            out,
+            "---- a.pdf ----\nbytes=gs://bucket/a.pdf\n\n"
+            "---- b.pdf ----\nbytes=gs://bucket/b.pdf\n\n"
+            "---- c.pdf ----\n[erro] gs://bucket/c.pdf: falha de rede\n\n"
+            "---- d.pdf ----\nbytes=gs://bucket/d.pdf",
+        )
+
+    def test_parse_pgm_stream_views_share_buffer(self):
+        a = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        b = np.full((2, 5), 200, dtype=np.uint8)
+        buf = b"P5\n4 3\n255\n" + a.tobytes() + b"P5\n# comentario\n5 2\n255\n" + b.tobytes()
+
+        pages = self.mod._parse_pgm_stream(buf)
+        self.assertEqual(len(pages), 2)
+        np.testing.assert_array_equal(pages[0], a)
+        np.testing.assert_array_equal(pages[1], b)
+        for page in pages:
+            self.assertFalse(page.flags.writeable)
+            self.assertFalse(page.flags.owndata)
+        with self.assertRaises(ValueError):
+            self.mod._parse_pgm_stream(b"P6\n1 1\n255\n\x00\x00\x00")
+
+    def test_render_pgm_runs_pdftoppm_gray(self):
+        page = np.zeros((2, 3), dtype=np.uint8)
+        proc = mock.Mock(stdout=b"P5\n3 2\n255\n" + page.tobytes())
+        with mock.patch.object(self.mod.subprocess, 'run', return_value=proc) as m_run:
+            pages = self.mod._render_pgm(b"%PDF-1.4 fake", 300, first_page=2, last_page=4)
+        cmd = m_run.call_args.args[0]
+        self.assertEqual(cmd[:8], ["pdftoppm", "-gray", "-r", "300", "-f", "2", "-l", "4"])
+        self.assertTrue(cmd[-1].endswith(".pdf"))
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(pages[0].shape, (2, 3))
+
+        with mock.patch.object(self.mod.subprocess, 'run', side_effect=FileNotFoundError):
+            with self.assertRaises(RuntimeError):
+                self.mod._render_pgm(b"%PDF-1.4 fake", 300)
+
+    def test_threshold_on_array_matches_pil(self):
+        img = self._text_page()
+        from_pil, _ = self.mod._prepare_threshold(img.convert('RGB'), "por", None)
+        from_array, _ = self.mod._prepare_threshold(np.array(img), "por", None)
+        np.testing.assert_array_equal(np.array(from_pil, dtype=np.uint8) * 255, from_array)
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string', return_value="texto")
+    def test_pgm_raster_skips_pil_copies(self, m_ocr):
+        from src.infrastructure.services import metrics
+        gray = np.array(self._text_page())
+
+        metrics.reset()
+        with mock.patch.object(self.mod, '_render_pgm', return_value=[gray]) as m_pgm, \
+                mock.patch.object(self.mod, 'convert_from_bytes') as m_convert:
+            out = self.mod.ocr_all_pages_from_bytes(
+                b"%PDF-1.4 fake", preprocess_profile="balanced", raster_backend="pgm"
+            )
+        self.assertEqual(out, "---- página 1 ----\ntexto")
+        m_pgm.assert_called_once()
+        m_convert.assert_not_called()
+        self.assertIsInstance(m_ocr.call_args.args[0], np.ndarray)
+        self.assertEqual(metrics.get("ocr_raster_pages_total", backend="pgm"), 1)
+        for stage in ("decode", "encode", "grayscale", "to_numpy"):
+            self.assertEqual(metrics.get("ocr_raster_copies_total", stage=stage), 0)
+        pgm_copies = sum(
+            v for k, v in metrics.snapshot().items() if k.startswith("ocr_raster_copies_total")
+        )
+
+        metrics.reset()
+        with mock.patch.object(self.mod, 'convert_from_bytes', return_value=[self._text_page().convert('RGB')]):
+            self.mod.ocr_all_pages_from_bytes(b"%PDF-1.4 fake", preprocess_profile="balanced")
+        pil_copies = sum(
+            v for k, v in metrics.snapshot().items() if k.startswith("ocr_raster_copies_total")
+        )
+        self.assertLess(pgm_copies, pil_copies)
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string', return_value="ocr")
+    @mock.patch('src.infrastructure.services.pdf_ocr.extract_native_per_page_from_bytes', return_value=[""])
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr', return_value=(True, 0.0, 0.0))
+    def test_extract_text_raster_backend_pgm(self, m_force, m_native, m_ocr):
+        page = np.full((40, 60), 255, dtype=np.uint8)
+        page[10:30, 10:50] = 0
+        with mock.patch.object(self.mod, '_render_pgm', return_value=[page]) as m_pgm:
+            out = self.mod.extract_text("/x.pdf", dpi=200, lang="por", min_tokens=10, repeat_th=0.5,
+                                        repeat_pages_frac=0.6, pdf_bytes=b"%PDF", raster_backend="pgm")
+        self.assertEqual(out, "---- página 1 ----\nocr")
+        m_pgm.assert_called_once()
+
+    def test_prefetch_respects_memory_budget(self):
+        import time
+
+        loaded = []
+
+        def load(ident):
+            # 'a' finishes last, so 'b' and 'c' are already buffered when it is consumed
+            if ident == "a":
+                time.sleep(0.05)
+            loaded.append(ident)
+            return b"x" * 10
+
+        with mock.patch.object(self.mod, 'load_pdf_bytes', side_effect=load):
+            gen = self.mod._prefetch_pdf_bytes(["a", "b", "c", "d"], prefetch=3, max_bytes=5)
+            first = next(gen)
+            self.assertEqual(first[0], "a")
+            # Buffered bytes exceed the budget, so 'd' is not started yet
+            self.assertNotIn("d", loaded)
+            self.assertEqual([i for i, _, _ in gen], ["b", "c", "d"])
+
+    def test_prefetch_budget_limits_concurrent_downloads(self):
+        import threading
+        import time
+
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def load(_ident):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.005)
+            with lock:
+                active[0] -= 1
+            return b"x" * 500
+
+        idents = [str(i) for i in range(40)]
+        with mock.patch.object(self.mod, 'load_pdf_bytes', side_effect=load):
+            # 2000 bytes / 500 por arquivo: no máximo 4 reservados, mesmo com prefetch=400
+            out = [i for i, _, _ in self.mod._prefetch_pdf_bytes(idents, prefetch=400, max_bytes=2000)]
+            self.assertEqual(out, idents)
+            self.assertLessEqual(peak[0], 4)
+            peak[0] = 0
+            # Sem limite de memória, vale o teto do servidor
+            list(self.mod._prefetch_pdf_bytes(idents, prefetch=400, max_bytes=10 ** 9))
+            self.assertLessEqual(peak[0], self.mod.PREFETCH_MAX_WORKERS)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,7 +12,7 @@ class TestPdfProcessorResource(unittest.TestCase):
 
     @mock.patch("src.application.pdf_processor.service.ocr.gcs_write_text", return_value="gs://bucket/in/concat-abc.txt")
     @mock.patch("src.application.pdf_processor.service.ocr.concat_many_pdfs_to_text", return_value="lorem ipsum")
-    @mock.patch("src.application.pdf_processor.service.ocr.gcs_list_pdfs", return_value=["gs://bucket/in/escritura.pdf"])    
+    @mock.patch("src.application.pdf_processor.service.ocr.find_pdfs_by_patterns", return_value=["gs://bucket/in/escritura.pdf"])    
     def test_post_happy_path(self, m_list, m_concat, m_write_txt):
         with self.server.test_request_context(json={
             "pdfs_dir": "gs://bucket/in",
@@ -23,6 +23,26 @@ class TestPdfProcessorResource(unittest.TestCase):
             self.assertIn("txt_uri", body)
             self.assertNotIn("payload_uri", body)
 
+    @mock.patch("src.application.pdf_processor.service.ocr.gcs_write_text", return_value="gs://bucket/in/concat-abc.txt")
+    @mock.patch("src.application.pdf_processor.service.ocr.find_pdfs_by_patterns", return_value=["gs://bucket/in/escritura.pdf"])
+    def test_post_targeted_ocr_reports_skipped_pages(self, m_list, m_write_txt):
+        def concat(**kwargs):
+            kwargs["reports"]["gs://bucket/in/escritura.pdf"] = {
+                "mode": "ocr",
+                "targeted": {"pages_full": [2, 3], "pages_skipped": [1, 4, 5], "seconds_saved": 4.5},
+            }
+            return "texto"
+
+        with mock.patch("src.application.pdf_processor.service.ocr.concat_many_pdfs_to_text",
+                        side_effect=concat) as m_concat, \
+                self.server.test_request_context(json={"pdfs_dir": "gs://bucket/in", "targeted_ocr": True}):
+            body, status = self.ResourcePdfProcessor().post()
+        self.assertEqual(status, 200)
+        self.assertIn("remuneracao", m_concat.call_args.kwargs["options"].section_keywords)
+        self.assertEqual(
+            body["targeted_ocr"], {"files": 1, "pages_full": 2, "pages_skipped": 3, "seconds_saved": 4.5}
+        )
+
     def test_post_validation_errors(self):
         from src.application.pdf_processor import ResourcePdfProcessor
 
@@ -31,4 +51,123 @@ class TestPdfProcessorResource(unittest.TestCase):
         }):
             res = ResourcePdfProcessor()
             body, status = res.post()
-            self.assertEqual(status, 400)
\ No newline at end of file
+            self.assertEqual(status, 400)
+
+    def test_post_unknown_native_backend(self):
+        with self.server.test_request_context(json={
+            "pdfs_dir": "gs://bucket/in",
+            "native_backend": "inexistente",
+        }):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("inexistente", body["error"])
+
+    def test_post_unknown_preprocess_profile(self):
+        with self.server.test_request_context(json={
+            "pdfs_dir": "gs://bucket/in",
+            "preprocess_profile": "turbo",
+        }):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("preprocess_profile", body["error"])
+
+    def test_post_non_string_preprocess_profile(self):
+        for value in (["x"], {"a": 1}, 3):
+            with self.subTest(value=value), self.server.test_request_context(
+                json={"pdfs_dir": "gs://bucket/in", "preprocess_profile": value}
+            ):
+                body, status = self.ResourcePdfProcessor().post()
+                self.assertEqual(status, 400)
+                self.assertIn("preprocess_profile", body["error"])
+
+    def test_post_unknown_raster_backend(self):
+        with self.server.test_request_context(json={
+            "pdfs_dir": "gs://bucket/in",
+            "raster_backend": "tiff",
+        }):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("raster_backend", body["error"])
+
+    def test_post_unknown_ocr_profile(self):
+        with self.server.test_request_context(json={
+            "pdfs_dir": "gs://bucket/in",
+            "ocr_profile": "turbo",
+        }):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("ocr_profile", body["error"])
+
+    def test_post_non_string_ocr_profile(self):
+        for value in ({}, ["fast"], True):
+            with self.subTest(value=value), self.server.test_request_context(
+                json={"pdfs_dir": "gs://bucket/in", "ocr_profile": value}
+            ):
+                body, status = self.ResourcePdfProcessor().post()
+                self.assertEqual(status, 400)
+                self.assertIn("ocr_profile", body["error"])
+
+    def test_post_invalid_adaptive_min_conf(self):
+        with self.server.test_request_context(json={
+            "pdfs_dir": "gs://bucket/in",
+            "adaptive_dpi": 150,
+            "adaptive_min_conf": 120,
+        }):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("adaptive_min_conf", body["error"])
+
+    @mock.patch("src.application.pdf_processor.service.ocr.gcs_write_text", return_value="gs://bucket/in/concat-abc.txt")
+    @mock.patch("src.application.pdf_processor.service.ocr.concat_many_pdfs_to_text", return_value="lorem ipsum")
+    @mock.patch("src.application.pdf_processor.service.ocr.find_pdfs_by_patterns", return_value=["gs://bucket/in/escritura.pdf"])
+    def test_post_string_flags(self, m_list, m_concat, m_write_txt):
+        with self.server.test_request_context(json={
+            "pdfs_dir": "gs://bucket/in",
+            "hybrid_ocr": "false",
+            "region_ocr": "1",
+            "async": "0",
+        }):
+            body, status = self.ResourcePdfProcessor().post()
+        self.assertEqual(status, 200)
+        options = m_concat.call_args.kwargs["options"]
+        self.assertFalse(options.hybrid)
+        self.assertTrue(options.region_ocr)
+
+    def test_post_invalid_flag(self):
+        for payload in ({"strip_boilerplate": "talvez"}, {"async": "yes"}, {"incremental": 2}, {"dpi": "alto"}):
+            with self.subTest(payload=payload), self.server.test_request_context(
+                json={"pdfs_dir": "gs://bucket/in", **payload}
+            ):
+                body, status = self.ResourcePdfProcessor().post()
+                self.assertEqual(status, 400)
+                self.assertIn(next(iter(payload)), body["error"])
+
+    def test_post_cache_location_comes_from_server(self):
+        with self.server.test_request_context(json={"pdfs_dir": "gs://bucket/in", "cache_dir": "/etc"}):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("cache_dir", body["error"])
+        with mock.patch.dict("os.environ", {"TEXT_CACHE_DIR": ""}), \
+                self.server.test_request_context(json={"pdfs_dir": "gs://bucket/in", "text_cache": True}):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("TEXT_CACHE_DIR", body["error"])
+        with self.server.test_request_context(json={"pdfs_dir": "gs://bucket/in", "page_cache_dir": "/"}):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("page_cache_dir", body["error"])
+        with mock.patch.dict("os.environ", {"PAGE_CACHE_DIR": ""}), \
+                self.server.test_request_context(json={"pdfs_dir": "gs://bucket/in", "page_cache": True}):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("PAGE_CACHE_DIR", body["error"])
+
+    def test_post_invalid_section_keywords(self):
+        with self.server.test_request_context(json={
+            "pdfs_dir": "gs://bucket/in",
+            "targeted_ocr": True,
+            "section_keywords": "remuneração",
+        }):
+            body, status = self.ResourcePdfProcessor().post()
+            self.assertEqual(status, 400)
+            self.assertIn("section_keywords", body["error"])
@@ -0,0 +1,98 @@
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+
+def _mixed_pdf(content):
+    """PDF de uma página (612x792) com a fonte F1 e a imagem Im1 (4x4 cinza) nos recursos."""
+    objs = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        "/Resources << /Font << /F1 5 0 R >> /XObject << /Im1 6 0 R >> >> /Contents 4 0 R >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        "<< /Type /XObject /Subtype /Image /Width 4 /Height 4 /ColorSpace /DeviceGray "
+        f"/BitsPerComponent 8 /Length 16 >>\nstream\n{chr(128) * 16}\nendstream",
+    ]
+    out, offsets = b"%PDF-1.4\n", []
+    for k, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += f"{k} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{off:010d} 00000 n \n".encode() for off in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+# Texto nativo no topo; assinatura (imagem) embaixo; imagem de fundo sob o texto; ícone
+MIXED = _mixed_pdf(
+    "BT /F1 12 Tf 72 720 Td (Texto nativo da escritura com clausulas suficientes) Tj ET "
+    "q 200 0 0 100 72 100 cm /Im1 Do Q "
+    "q 400 0 0 100 60 680 cm /Im1 Do Q "
+    "q 5 0 0 5 0 0 cm /Im1 Do Q"
+)
+
+
+class TestPdfRegions(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import pdf_regions
+        self.mod = pdf_regions
+
+    def test_finds_images_without_native_text(self):
+        regions = self.mod.find_text_free_regions(MIXED)
+        # Só a assinatura: a imagem de fundo tem texto por cima e o ícone é pequeno demais
+        self.assertEqual(regions, {1: [self.mod.Region(72.0, 592.0, 272.0, 692.0)]})
+
+    def test_pages_without_images(self):
+        pdf = _mixed_pdf("BT /F1 12 Tf 72 720 Td (Somente texto) Tj ET")
+        self.assertEqual(self.mod.find_text_free_regions(pdf), {})
+        self.assertEqual(self.mod.find_text_free_regions(MIXED, page_numbers=[]), {})
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string', return_value="Assinatura do diretor")
+    @mock.patch('src.infrastructure.services.pdf_ocr.should_force_ocr', return_value=(False, 200.0, 0.0))
+    def test_extract_text_region_ocr_merges_with_native_text(self, m_force, m_ocr):
+        from src.infrastructure.services import pdf_ocr
+
+        crop = np.full((50, 100), 255, dtype=np.uint8)
+        crop[20:30, 10:90] = 0
+        report = {}
+        with mock.patch.object(pdf_ocr, '_render_pgm', return_value=[crop]) as m_render, \
+                mock.patch.object(pdf_ocr, 'convert_from_bytes') as m_convert:
+            out = pdf_ocr.extract_text("/x.pdf", dpi=144, lang="por", min_tokens=10, repeat_th=0.5,
+                                       repeat_pages_frac=0.6, pdf_bytes=MIXED, report=report,
+                                       region_ocr=True)
+        self.assertEqual(
+            out,
+            "---- página 1 ----\nTexto nativo da escritura com clausulas suficientes\n\nAssinatura do diretor",
+        )
+        # Só a região é rasterizada (144 dpi = 2 px por ponto), nunca a página inteira
+        m_convert.assert_not_called()
+        self.assertEqual(m_render.call_args.kwargs["crop"], (144, 1184, 400, 200))
+        self.assertEqual(report["pages"], [{"page": 1, "path": "native", "ocr_regions": 1}])
+
+    @mock.patch('src.infrastructure.services.pdf_ocr.ocr_engine.image_to_string')
+    def test_ocr_regions_writes_pdf_once_and_keeps_owners_aligned(self, m_ocr):
+        from src.infrastructure.services import pdf_ocr
+
+        crop = np.full((20, 40), 255, dtype=np.uint8)
+        crop[5:15, 5:35] = 0
+        # A região da página 1 volta em duas imagens; cada uma precisa de um dono
+        rendered = {1: [crop, crop.copy()], 2: [crop.copy()]}
+        m_ocr.side_effect = ["p1a", "p1b", "p2"]
+        region = self.mod.Region(0.0, 0.0, 20.0, 10.0)
+        with mock.patch.object(
+            pdf_ocr, '_render_pgm', side_effect=lambda _b, _dpi, first_page, **kw: rendered[first_page]
+        ) as m_render:
+            out = pdf_ocr._ocr_regions(MIXED, {1: [region], 2: [region]}, dpi=144, lang="por")
+        self.assertEqual(out, {1: ["p1a", "p1b"], 2: ["p2"]})
+        paths = {c.kwargs["pdf_path"] for c in m_render.call_args_list}
+        self.assertEqual(len(paths), 1)
+        self.assertFalse(os.path.exists(paths.pop()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import prefix_manifest
+        self.mod = prefix_manifest
+
+    def test_text_uri_requires_same_fingerprint_and_params(self):
+        m = self.mod.Manifest()
+        m.record("gs://b/a.pdf", "md5:1", {"dpi": 300}, "uri-a", 10)
+        self.assertEqual(m.text_uri("gs://b/a.pdf", "md5:1", {"dpi": 300}), "uri-a")
+        self.assertIsNone(m.text_uri("gs://b/a.pdf", "md5:2", {"dpi": 300}))
+        self.assertIsNone(m.text_uri("gs://b/a.pdf", "md5:1", {"dpi": 400}))
+        self.assertIsNone(m.text_uri("gs://b/a.pdf", None, {"dpi": 300}))
+        self.assertIsNone(m.text_uri("gs://b/outro.pdf", "md5:1", {"dpi": 300}))
+
+    def test_local_store_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = self.mod.LocalManifestStore(tmpdir)
+            self.assertEqual(store.load().files, {})
+            uri = store.write_text("k1", "texto")
+            self.assertEqual(store.read_text(uri), "texto")
+            m = self.mod.Manifest()
+            m.record("a.pdf", "md5:1", {"dpi": 300, "section_keywords": ["x"]}, uri, 5)
+            m.set_concat("concat.txt", [("a.pdf", uri)])
+            store.save(m)
+
+            loaded = store.load()
+            self.assertEqual(loaded.text_uri("a.pdf", "md5:1", {"dpi": 300, "section_keywords": ["x"]}), uri)
+            self.assertEqual(loaded.concat_uri([("a.pdf", uri)]), "concat.txt")
+            self.assertIsNone(loaded.concat_uri([("a.pdf", uri), ("b.pdf", "u")]))
+
+    def test_other_version_starts_empty(self):
+        m = self.mod.Manifest.from_dict({"v": 0, "files": {"a.pdf": {}}})
+        self.assertEqual(m.files, {})
+
+
+class TestIncrementalProcessing(unittest.TestCase):
+    PDFS = ["gs://bucket/in/a.pdf", "gs://bucket/in/b.pdf"]
+
+    def setUp(self):
+        from src.application.pdf_processor import service
+        from src.infrastructure.services.prefix_manifest import LocalManifestStore
+        self.service = service
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.fingerprints = {p: f"md5:{p[-5]}1" for p in self.PDFS}
+        self.extracted = []
+        self.written = []
+        ocr = "src.application.pdf_processor.service.ocr"
+        for target, kw in (
+            (f"{ocr}.find_pdfs_by_patterns", {"return_value": list(self.PDFS)}),
+            (f"{ocr}.gcs_generation_fingerprints", {"side_effect": lambda paths: {p: self.fingerprints[p] for p in paths}}),
+            (f"{ocr}.concat_many_pdfs_to_text", {"side_effect": self._concat}),
+            (f"{ocr}.gcs_write_text", {"side_effect": self._write}),
+            (
+                "src.application.pdf_processor.service.open_manifest_store",
+                {"side_effect": lambda _d: LocalManifestStore(self.tmp.name)},
+            ),
+        ):
+            patcher = mock.patch(target, **kw)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _concat(self, pdf_identifiers, texts, **kwargs):
+        self.extracted.append(list(pdf_identifiers))
+        for ident in pdf_identifiers:
+            texts[ident] = f"texto {ident[-5]} {self.fingerprints[ident]}"
+        return ""
+
+    def _write(self, _dir, name, text):
+        # TXT gravado de verdade: o modo incremental confere se o anterior ainda existe
+        self.written.append(text)
+        path = Path(self.tmp.name) / f"{name}-{len(self.written)}"
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+
+    def _run(self, **kw):
+        cfg = self.service.PdfProcessConfig(pdfs_dir="gs://bucket/in", incremental=True, **kw)
+        body, status = self.service.process_pdfs(cfg)
+        self.assertEqual(status, 200)
+        return body
+
+    def test_only_changed_files_are_extracted(self):
+        first = self._run()
+        self.assertEqual(self.extracted, [self.PDFS])
+        self.assertEqual(first["incremental"], {"files_reused": 0, "files_extracted": 2, "txt_reused": False})
+
+        # Nada mudou: nenhuma extração e nenhum TXT novo
+        second = self._run()
+        self.assertEqual(len(self.extracted), 1)
+        self.assertEqual(len(self.written), 1)
+        self.assertEqual(second["txt_uri"], first["txt_uri"])
+        self.assertTrue(second["incremental"]["txt_reused"])
+
+        # b.pdf mudou: só ele é extraído e o TXT é remontado com o texto guardado de a.pdf
+        self.fingerprints["gs://bucket/in/b.pdf"] = "md5:b2"
+        third = self._run()
+        self.assertEqual(self.extracted[-1], ["gs://bucket/in/b.pdf"])
+        self.assertEqual(third["incremental"], {"files_reused": 1, "files_extracted": 1, "txt_reused": False})
+        self.assertNotEqual(third["txt_uri"], first["txt_uri"])
+        self.assertEqual(
+            self.written[-1],
+            "---- a.pdf ----\ntexto a md5:a1\n\n---- b.pdf ----\ntexto b md5:b2",
+        )
+
+    def test_missing_previous_txt_is_rebuilt(self):
+        first = self._run()
+        Path(first["txt_uri"]).unlink()
+        second = self._run()
+        # Os textos guardados continuam válidos: nada é extraído, só o TXT é regravado
+        self.assertEqual(len(self.extracted), 1)
+        self.assertEqual(len(self.written), 2)
+        self.assertNotEqual(second["txt_uri"], first["txt_uri"])
+        self.assertEqual(second["incremental"], {"files_reused": 2, "files_extracted": 0, "txt_reused": False})
+        self.assertEqual(self._run()["txt_uri"], second["txt_uri"])
+
+    def test_changed_params_extract_again(self):
+        self._run()
+        self._run(dpi=400)
+        self.assertEqual(self.extracted, [self.PDFS, self.PDFS])
+
+
+if __name__ == "__main__":
+    unittest.main()
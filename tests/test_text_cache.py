@@ -0,0 +1,111 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+class TestTextCache(unittest.TestCase):
+    def setUp(self):
+        from src.infrastructure.services import text_cache
+        self.mod = text_cache
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cache_key_depends_on_params_and_fingerprint(self):
+        k1 = self.mod.cache_key("sha256:aa", {"dpi": 300, "lang": "por"})
+        k2 = self.mod.cache_key("sha256:aa", {"lang": "por", "dpi": 300})
+        k3 = self.mod.cache_key("sha256:aa", {"dpi": 200, "lang": "por"})
+        k4 = self.mod.cache_key("sha256:bb", {"dpi": 300, "lang": "por"})
+        self.assertEqual(k1, k2)
+        self.assertNotEqual(k1, k3)
+        self.assertNotEqual(k1, k4)
+
+    def test_local_get_put_and_counters(self):
+        cache = self.mod.LocalDiskTextCache(self.tmp.name)
+        self.assertIsNone(cache.get("abcd"))
+        cache.put("abcd", "texto extraído")
+        self.assertEqual(cache.get("abcd"), "texto extraído")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "puts": 1, "evictions": 0})
+
+    def test_local_lru_eviction_by_size(self):
+        cache = self.mod.LocalDiskTextCache(self.tmp.name, max_bytes=25)
+        cache.put("k1", "x" * 10)
+        cache.put("k2", "y" * 10)
+        # Touch k1 so k2 becomes the least recently used entry
+        past = time.time() - 100
+        os.utime(cache._path("k2"), (past, past))
+        os.utime(cache._path("k1"), (past + 50, past + 50))
+        cache.put("k3", "z" * 10)
+        self.assertEqual(cache.get("k2"), None)
+        self.assertEqual(cache.get("k1"), "x" * 10)
+        self.assertEqual(cache.get("k3"), "z" * 10)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_only_touches_cache_entries(self):
+        root = Path(self.tmp.name)
+        (root / "relatorio.txt").write_text("fora do namespace " * 10)
+        cache = self.mod.LocalDiskTextCache(self.tmp.name, max_bytes=25)
+        foreign = [cache.root / "no" / "notas.v1.txt", cache.root / "zz" / "abc.txt"]
+        for f in foreign:
+            f.parent.mkdir(parents=True, exist_ok=True)
+            f.write_text("x" * 100)
+            os.utime(f, (0, 0))
+        for k in ("k1", "k2", "k3", "k4"):
+            cache.put(k, "y" * 10)
+        self.assertTrue((root / "relatorio.txt").exists())
+        self.assertTrue(all(f.exists() for f in foreign))
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_invalid_keys_are_rejected(self):
+        cache = self.mod.LocalDiskTextCache(self.tmp.name)
+        cache.put("../fora", "x")
+        self.assertIsNone(cache.get("../fora"))
+        self.assertFalse((Path(self.tmp.name) / "fora.txt").exists())
+        self.assertEqual(cache.stats()["puts"], 0)
+
+    def test_eviction_scans_are_amortized(self):
+        cache = self.mod.LocalDiskTextCache(self.tmp.name, max_bytes=100)
+        with mock.patch.object(cache, "_evict", wraps=cache._evict) as m_evict:
+            for i in range(9):
+                cache.put(f"k{i}", "x" * 10)
+            # Só a primeira gravação do processo varre o diretório
+            self.assertEqual(m_evict.call_count, 1)
+            cache.put("k9", "x" * 10)
+            cache.put("k10", "x" * 10)
+            self.assertEqual(m_evict.call_count, 2)
+        # Desce até LOW_WATER do limite, não só até o limite
+        self.assertLessEqual(sum(size for _, size, _ in cache._entries()), 90)
+
+    def test_text_cache_from_env(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(self.mod.text_cache_from_env())
+        with mock.patch.dict(os.environ, {"TEXT_CACHE_DIR": self.tmp.name, "TEXT_CACHE_MAX_BYTES": "1234"}):
+            cache = self.mod.text_cache_from_env()
+        self.assertEqual(cache.max_bytes, 1234)
+        self.assertEqual(cache.root, Path(self.tmp.name) / self.mod.TEXT_NAMESPACE)
+
+    def test_extract_text_uses_cache(self):
+        import src.infrastructure.services.pdf_ocr as pdf_ocr
+
+        cache = self.mod.LocalDiskTextCache(self.tmp.name)
+        kwargs = dict(dpi=300, lang="por", min_tokens=10, repeat_th=0.5, repeat_pages_frac=0.6, cache=cache)
+        with mock.patch.object(pdf_ocr, "load_pdf_bytes", return_value=b"%PDF-1.4 same"), \
+             mock.patch.object(pdf_ocr, "_extract_text_from_bytes", return_value="conteudo") as m_extract:
+            self.assertEqual(pdf_ocr.extract_text("/local/a.pdf", **kwargs), "conteudo")
+            report = {}
+            self.assertEqual(pdf_ocr.extract_text("/local/b.pdf", report=report, **kwargs), "conteudo")
+            self.assertEqual(m_extract.call_count, 1)
+            self.assertEqual(report["mode"], "cache")
+            # Different parameters -> different key -> miss
+            pdf_ocr.extract_text("/local/a.pdf", **dict(kwargs, dpi=200))
+            self.assertEqual(m_extract.call_count, 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()